@@ -25,14 +25,18 @@ load_dotenv()
 
 # Import models and services
 from models import db
+from models.migrations import upgrade_database
+from models.storage import configure_storage, engine_options
 from config import Config
 
 # Create Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
+app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
 
 # Initialize extensions
 db.init_app(app)
+configure_storage(app)
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
 
@@ -57,7 +61,7 @@ app.register_blueprint(results_routes.bp)
 app.register_blueprint(schedule_routes.bp)
 
 # Initialize services
-from services import DataService
+from services import DataService, ScannerService, ScheduleService, CacheWarmer, SharedCache, RetentionService, AnalyticsService
 
 # Global data service instance
 data_service = None
@@ -65,14 +69,80 @@ data_service = None
 # Initialize services
 data_service = None
 
-def initialize_services():
+def initialize_services(scheduler=True):
+    """Create the shared services; scheduler=False (CLI commands) never starts the background jobs"""
     global data_service
     if data_service is None:
+        shared_cache = None
+        if app.config['CACHE_L2_PATH']:
+            # Anchored like the SQLite database, not to whatever the working directory is
+            shared_cache = SharedCache(
+                os.path.join(app.instance_path, app.config['CACHE_L2_PATH']),
+                max_bytes=app.config['CACHE_L2_MAX_MB'] * 1024 * 1024
+            )
+
         data_service = DataService(
             api_key=app.config['OPENALGO_API_KEY'] or 'demo-key',
-            host=app.config['OPENALGO_HOST'] or 'http://127.0.0.1:5000'
+            host=app.config['OPENALGO_HOST'] or 'http://127.0.0.1:5000',
+            compact_cache=app.config['COMPACT_CACHE'],
+            cache_budgets={
+                'hist': app.config['CACHE_HISTORY_MAX_MB'] * 1024 * 1024,
+                'quote': app.config['CACHE_QUOTE_MAX_MB'] * 1024 * 1024
+            },
+            shared_cache=shared_cache
         )
         app.data_service = data_service
+        data_service.cache.start_sweeper(
+            interval=app.config['CACHE_SWEEP_INTERVAL'],
+            budget=app.config['CACHE_SWEEP_BUDGET']
+        )
+
+        # Warm the history cache ahead of the day's scheduled scans
+        app.cache_warmer = CacheWarmer(
+            data_service,
+            app=app,
+            max_workers=app.config['CACHE_WARMUP_WORKERS']
+        )
+
+        # Archives are under the instance folder as well; absolute paths are kept as they are
+        app.analytics_service = AnalyticsService(
+            app=app,
+            archive_dir=os.path.join(app.instance_path, app.config['ANALYTICS_ARCHIVE_DIR']),
+            batch_size=app.config['ANALYTICS_EXPORT_BATCH_RUNS']
+        )
+
+        app.retention_service = RetentionService(
+            app=app,
+            retention_days=app.config['RESULT_RETENTION_DAYS'],
+            archive_dir=(os.path.join(app.instance_path, app.config['RESULT_ARCHIVE_DIR'])
+                         if app.config['RESULT_ARCHIVE_DIR'] else None),
+            batch_size=app.config['RESULT_RETENTION_BATCH_SIZE'],
+            analytics_service=app.analytics_service,
+            export_grace_days=app.config['RESULT_EXPORT_GRACE_DAYS']
+        )
+
+        # Every process gets the services; only one runs their schedules, so
+        # jobs don't fire once per worker and race on the archives and purges
+        app.schedule_service = None
+        if scheduler and app.config['ENABLE_SCHEDULER']:
+            app.schedule_service = ScheduleService(ScannerService(data_service))
+            app.schedule_service.add_cache_warmup(
+                app.cache_warmer,
+                run_time=app.config['CACHE_WARMUP_TIME'],
+                window_minutes=app.config['CACHE_WARMUP_WINDOW_MINUTES']
+            )
+            app.schedule_service.add_analytics_export(
+                app.analytics_service,
+                interval_minutes=app.config['ANALYTICS_EXPORT_INTERVAL_MINUTES']
+            )
+            app.schedule_service.add_result_retention(
+                app.retention_service,
+                run_time=app.config['RESULT_RETENTION_TIME']
+            )
+        elif scheduler:
+            logging.getLogger(__name__).info(
+                "ENABLE_SCHEDULER is off: cache warm-up, analytics export and retention won't run automatically"
+            )
 
 # Initialize on first request using before_request
 @app.before_request
@@ -128,9 +198,15 @@ def inject_config():
 @app.cli.command()
 def init_db():
     """Initialize the database."""
-    db.create_all()
+    upgrade_database()
     print('Database initialized!')
 
+@app.cli.command()
+def upgrade_db():
+    """Apply schema changes to an existing database."""
+    upgrade_database()
+    print('Database upgraded!')
+
 @app.cli.command()
 def seed_db():
     """Seed the database with sample data."""
@@ -138,16 +214,64 @@ def seed_db():
     seed_database()
     print('Database seeded!')
 
+@app.cli.command()
+def warm_cache():
+    """Prefetch history for upcoming scheduled scans."""
+    initialize_services(scheduler=False)
+    status = app.cache_warmer.run(window_minutes=app.config['CACHE_WARMUP_WINDOW_MINUTES'])
+    print(f"Warm-up {status['state']}: {status['fetched']} fetched, "
+          f"{status['already_cached']} already cached, {status['failed']} failed "
+          f"({status['coverage'] or 0:.1f}% coverage)")
+
+@app.cli.command()
+def purge_results():
+    """Archive and delete scan results and runs past the retention window."""
+    initialize_services(scheduler=False)
+    status = app.retention_service.run()
+    print(f"Retention {status['state']}: {status['rows_deleted']} results, "
+          f"{status['metric_rows_deleted']} metric rows and {status['runs_deleted']} runs deleted "
+          f"in {status['batches']} batches, "
+          f"{status['archive_files']} archive files ({status['archive_bytes'] / 1024 / 1024:.1f} MB)")
+    if status['rows_held']:
+        print(f"{status['rows_held']} expired results kept until their runs are exported to analytics")
+    if status['bytes_reclaimed'] is not None:
+        print(f"Reclaimed {status['bytes_reclaimed'] / 1024 / 1024:.1f} MB of database pages")
+    if status['error']:
+        print(f"Error: {status['error']}")
+
+@app.cli.command()
+def export_analytics():
+    """Export completed runs to the analytics archive."""
+    initialize_services(scheduler=False)
+    status = app.analytics_service.export()
+    print(f"Analytics export {status['state']}: {status['runs_exported']} runs and "
+          f"{status['results_exported']} results in {status['files']} files "
+          f"({status['bytes'] / 1024 / 1024:.1f} MB)")
+    if status['error']:
+        print(f"Error: {status['error']}")
+
 @app.cli.command()
 def clear_cache():
     """Clear all cached data."""
+    # The shared tier outlives this process, so clear it even from the CLI
+    initialize_services(scheduler=False)
     if data_service:
+        stats = data_service.cache.get_stats()
+        print(f"Cache: {stats['total_keys']} keys, {stats['cache_size_bytes'] / 1024 / 1024:.1f} MB, "
+              f"hit rate {stats['hit_rate']:.1f}%")
+        for namespace, ns_stats in stats['namespaces'].items():
+            print(f"  {namespace}: {ns_stats['keys']} keys, {ns_stats['size_bytes'] / 1024 / 1024:.1f} MB, "
+                  f"{ns_stats['hits']} hits, {ns_stats['misses']} misses, "
+                  f"{ns_stats['evictions']} evictions, {ns_stats['expirations']} expirations")
+        if 'l2' in stats['tiers']:
+            l2_stats = stats['tiers']['l2']
+            print(f"  shared tier ({l2_stats['path']}): hit rate {l2_stats['hit_rate']:.1f}%")
         data_service.cache.clear()
     print('Cache cleared!')
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        upgrade_database()
 
     # Run with SocketIO
     socketio.run(
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Multi-threaded stress benchmark for CacheService
+Measures read throughput and get_or_compute behaviour as threads are added
+"""
+
+import sys
+import os
+import time
+import random
+import threading
+import argparse
+
+# Add project directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.cache_service import CacheService
+
+def run_readers(cache, keys, num_threads, duration, write_ratio):
+    """Hammer the cache from num_threads threads and return total operations"""
+    counts = [0] * num_threads
+    stop = threading.Event()
+
+    def worker(idx):
+        rng = random.Random(idx)
+        ops = 0
+        while not stop.is_set():
+            for _ in range(1000):
+                key = keys[rng.randrange(len(keys))]
+                if rng.random() < write_ratio:
+                    cache.set(key, {'ltp': rng.random()}, ttl=60)
+                else:
+                    cache.get(key)
+            ops += 1000
+        counts[idx] = ops
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return sum(counts)
+
+def check_single_flight(num_threads):
+    """Many threads missing the same key should run the callback once"""
+    cache = CacheService()
+    calls = []
+    barrier = threading.Barrier(num_threads)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'value'
+
+    def worker():
+        barrier.wait()
+        assert cache.get_or_compute('hist_SBIN_NSE_D', compute) == 'value'
+
+    threads = [threading.Thread(target=worker) for _ in range(num_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return len(calls)
+
+def main():
+    parser = argparse.ArgumentParser(description='CacheService stress benchmark')
+    parser.add_argument('--keys', type=int, default=10000)
+    parser.add_argument('--duration', type=float, default=2.0, help='Seconds per run')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--write-ratio', type=float, default=0.05)
+    args = parser.parse_args()
+
+    keys = [f"quote_SYM{i}_NSE" for i in range(args.keys)]
+
+    print("=" * 60)
+    print("CacheService Stress Benchmark")
+    print("=" * 60)
+    print(f"Keys: {args.keys}, write ratio: {args.write_ratio:.0%}, {args.duration}s per run\n")
+
+    print(f"{'threads':>8} {'1 shard ops/s':>16} {'16 shards ops/s':>16} {'speedup':>8}")
+    for num_threads in args.threads:
+        results = []
+        for num_shards in (1, 16):
+            cache = CacheService(num_shards=num_shards)
+            cache.set_many({key: {'ltp': 0.0} for key in keys}, ttl=60)
+            ops = run_readers(cache, keys, num_threads, args.duration, args.write_ratio)
+            results.append(ops / args.duration)
+
+        print(f"{num_threads:>8} {results[0]:>16,.0f} {results[1]:>16,.0f} {results[1] / results[0]:>7.2f}x")
+
+    calls = check_single_flight(32)
+    print(f"\nget_or_compute: 32 concurrent misses ran the callback {calls} time(s)")
+    print("\nNote: under the GIL pure-Python reads don't run in parallel; sharding")
+    print("removes lock contention so throughput holds as threads are added.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Storage benchmark: result write throughput and read latency while scans write concurrently
+Compares the default SQLite setup with the tuned WAL profile, or measures a PostgreSQL URL
+
+Readers and writers share one process and its GIL. In WAL mode reads no longer
+wait for writes, so readers complete more queries and take CPU from writers;
+large batches can then show fewer rows/s than the default profile. Run with
+--readers 0 to measure write throughput alone.
+"""
+
+import sys
+import os
+import time
+import random
+import tempfile
+import threading
+import argparse
+
+# Add project directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+from config import Config
+from models import db, Scanner, ScanHistory, ScanResult
+from models.storage import configure_storage, engine_options, writer_session
+
+def create_app(uri, tuned):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    if tuned:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    if tuned:
+        configure_storage(app)
+    return app
+
+def make_results(batch_size, rng):
+    return [
+        {
+            'symbol': f'SYM{i}',
+            'signal': rng.choice(['BUY', 'SELL']),
+            'metrics': {'close': rng.uniform(100, 2000), 'rsi': rng.uniform(0, 100), 'volume_ratio': rng.uniform(0, 5)}
+        }
+        for i in range(batch_size)
+    ]
+
+def run(app, tuned, writers, readers, scans_per_writer, batch_size):
+    with app.app_context():
+        db.create_all()
+        scanner = Scanner(name='benchmark', code='pass')
+        db.session.add(scanner)
+        db.session.commit()
+        scanner_id = scanner.id
+        history_ids = []
+        for _ in range(writers * scans_per_writer):
+            history = ScanHistory(scanner_id=scanner_id)
+            history.start()
+            db.session.add(history)
+            db.session.flush()
+            history_ids.append(history.id)
+        db.session.commit()
+
+    write_errors = []
+    read_errors = []
+    latencies = []
+    done = threading.Event()
+
+    def writer(idx):
+        rng = random.Random(idx)
+        with app.app_context():
+            for n in range(scans_per_writer):
+                history_id = history_ids[idx * scans_per_writer + n]
+                results = make_results(batch_size, rng)
+                try:
+                    if tuned:
+                        with writer_session():
+                            ScanResult.bulk_create(scanner_id, 'NSE', results, scan_history_id=history_id)
+                    else:
+                        ScanResult.bulk_create(scanner_id, 'NSE', results, scan_history_id=history_id)
+                        db.session.commit()
+                except OperationalError as e:
+                    db.session.rollback()
+                    write_errors.append(str(e.orig))
+
+    def reader(idx):
+        rng = random.Random(1000 + idx)
+        with app.app_context():
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    ScanResult.get_by_history(rng.choice(history_ids))
+                    ScanResult.query.order_by(ScanResult.id.desc()).limit(50).all()
+                    latencies.append(time.perf_counter() - start)
+                except OperationalError as e:
+                    db.session.rollback()
+                    read_errors.append(str(e.orig))
+                db.session.remove()
+
+    reader_threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    writer_threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for t in reader_threads:
+        t.start()
+
+    start = time.perf_counter()
+    for t in writer_threads:
+        t.start()
+    for t in writer_threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    done.set()
+    for t in reader_threads:
+        t.join()
+
+    with app.app_context():
+        rows = ScanResult.query.count()
+        db.engine.dispose()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else float('nan')
+    return {
+        'rows': rows,
+        'rows_per_sec': rows / elapsed,
+        'read_p50_ms': pct(0.50),
+        'read_p95_ms': pct(0.95),
+        'reads': len(latencies),
+        'write_errors': len(write_errors),
+        'read_errors': len(read_errors)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Storage benchmark')
+    parser.add_argument('--database-url', help='Benchmark this database (e.g. postgresql://...) instead of temporary SQLite files')
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--scans', type=int, default=25, help='Scans per writer thread')
+    parser.add_argument('--batch-size', type=int, default=50, help='Results per scan')
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print("Storage Benchmark")
+    print("=" * 72)
+    print(f"{args.writers} writers x {args.scans} scans x {args.batch_size} results, {args.readers} readers\n")
+
+    if args.database_url:
+        profiles = [('configured', args.database_url, True)]
+    else:
+        tmpdir = tempfile.mkdtemp(prefix='fluxscan_bench_')
+        profiles = [
+            ('sqlite default', f"sqlite:///{os.path.join(tmpdir, 'default.db')}", False),
+            ('sqlite tuned', f"sqlite:///{os.path.join(tmpdir, 'tuned.db')}", True)
+        ]
+
+    print(f"{'profile':<16} {'rows/s':>10} {'read p50':>10} {'read p95':>10} {'reads':>8} {'write err':>10} {'read err':>9}")
+    for name, uri, tuned in profiles:
+        stats = run(create_app(uri, tuned), tuned, args.writers, args.readers, args.scans, args.batch_size)
+        print(f"{name:<16} {stats['rows_per_sec']:>10,.0f} {stats['read_p50_ms']:>8.1f}ms {stats['read_p95_ms']:>8.1f}ms "
+              f"{stats['reads']:>8} {stats['write_errors']:>10} {stats['read_errors']:>9}")
+
+if __name__ == '__main__':
+    main()
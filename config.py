@@ -16,6 +16,13 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///fluxscan.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    # SQLite storage profile (ignored on PostgreSQL)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_MMAP_SIZE_MB = int(os.environ.get('SQLITE_MMAP_SIZE_MB', 256))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 30000))
 
     # OpenAlgo - PRIORITIZE .env file over system environment
     OPENALGO_API_KEY = env_file_values.get('OPENALGO_API_KEY') or os.environ.get('OPENALGO_API_KEY')
@@ -50,10 +57,50 @@ class Config:
     # Cache
     CACHE_TYPE = 'simple'
     CACHE_DEFAULT_TIMEOUT = 300
+    # Store cached OHLCV frames with float32 prices and packed volume (about 42% smaller).
+    # Up to 32 MB of recently rebuilt full-precision frames then come out of CACHE_HISTORY_MAX_MB
+    COMPACT_CACHE = os.environ.get('COMPACT_CACHE', 'false').lower() in ('1', 'true', 'yes')
+    # In-memory cache budgets per namespace, in MB. Each is a cache-wide total shared by
+    # all shards (least recently used entries go first), so one entry may use all of it
+    CACHE_HISTORY_MAX_MB = int(os.environ.get('CACHE_HISTORY_MAX_MB', 512))
+    CACHE_QUOTE_MAX_MB = int(os.environ.get('CACHE_QUOTE_MAX_MB', 32))
+    # Background expiry: seconds between sweeps, deadlines examined per shard per sweep
+    CACHE_SWEEP_INTERVAL = float(os.environ.get('CACHE_SWEEP_INTERVAL', 1.0))
+    CACHE_SWEEP_BUDGET = int(os.environ.get('CACHE_SWEEP_BUDGET', 1000))
+    # Shared on-disk cache tier used by every process on the host (empty to disable).
+    # Relative paths are under the Flask instance folder. Entries are pickles, so
+    # the file must only be writable by the app's own user
+    CACHE_L2_PATH = os.environ.get('CACHE_L2_PATH', 'fluxscan_cache.db')
+    CACHE_L2_MAX_MB = int(os.environ.get('CACHE_L2_MAX_MB', 2048))
+
+    # Run the background jobs (cache warm-up, analytics export, retention) in this process.
+    # Off by default, so none of them runs automatically until one process enables it;
+    # without it, run flask warm-cache / export-analytics / purge-results from cron.
+    # With several worker processes, enable it in exactly one of them
+    ENABLE_SCHEDULER = os.environ.get('ENABLE_SCHEDULER', 'false').lower() in ('1', 'true', 'yes')
+
+    # Pre-open cache warm-up
+    CACHE_WARMUP_TIME = os.environ.get('CACHE_WARMUP_TIME', '09:00')
+    CACHE_WARMUP_WINDOW_MINUTES = int(os.environ.get('CACHE_WARMUP_WINDOW_MINUTES', 45))
+    CACHE_WARMUP_WORKERS = int(os.environ.get('CACHE_WARMUP_WORKERS', 4))
 
     # Results
     RESULTS_PER_PAGE = int(os.environ.get('RESULTS_PER_PAGE', 50))
-    MAX_EXPORT_ROWS = int(os.environ.get('MAX_EXPORT_ROWS', 10000))
+    # Exports are streamed, so this only caps the download size (0 for no limit)
+    MAX_EXPORT_ROWS = int(os.environ.get('MAX_EXPORT_ROWS', 0))
+    # Results, and runs left without results, older than this are archived to Parquet and purged daily
+    RESULT_RETENTION_DAYS = int(os.environ.get('RESULT_RETENTION_DAYS', 30))
+    RESULT_RETENTION_TIME = os.environ.get('RESULT_RETENTION_TIME', '02:30')
+    RESULT_RETENTION_BATCH_SIZE = int(os.environ.get('RESULT_RETENTION_BATCH_SIZE', 5000))
+    # Days past retention that results of completed runs wait for their analytics export
+    RESULT_EXPORT_GRACE_DAYS = int(os.environ.get('RESULT_EXPORT_GRACE_DAYS', 7))
+    # Where purged results are archived, relative to the instance folder (empty to purge without archiving)
+    RESULT_ARCHIVE_DIR = os.environ.get('RESULT_ARCHIVE_DIR', 'archive')
+
+    # Analytics archive: completed runs exported to partitioned Parquet, relative to the instance folder
+    ANALYTICS_ARCHIVE_DIR = os.environ.get('ANALYTICS_ARCHIVE_DIR', os.path.join('archive', 'analytics'))
+    ANALYTICS_EXPORT_INTERVAL_MINUTES = int(os.environ.get('ANALYTICS_EXPORT_INTERVAL_MINUTES', 15))
+    ANALYTICS_EXPORT_BATCH_RUNS = int(os.environ.get('ANALYTICS_EXPORT_BATCH_RUNS', 200))
 
     # WebSocket
     SOCKETIO_ASYNC_MODE = 'eventlet'
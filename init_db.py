@@ -5,6 +5,7 @@ Creates all tables and loads initial scanner templates
 """
 
 from app import app, db
+from models.migrations import upgrade_database
 from models import Scanner, ScannerTemplate, Watchlist, Settings
 from scanners.templates.momentum import macd, rsi
 import sys
@@ -14,7 +15,7 @@ def init_database():
     with app.app_context():
         # Create all tables
         print("Creating database tables...")
-        db.create_all()
+        upgrade_database()
         print("Tables created successfully!")
 
         # Load scanner templates if not exist
@@ -1,9 +1,12 @@
 from .base import db
 from .scanner import Scanner
 from .watchlist import Watchlist
+from .watchlist_symbol import WatchlistSymbol
 from .scan_result import ScanResult
+from .scan_result_metric import ScanResultMetric
 from .schedule import ScanSchedule
 from .scan_history import ScanHistory
+from .scan_stats_daily import ScanStatsDaily
 from .settings import Settings
 from .scanner_template import ScannerTemplate
 
@@ -11,9 +14,12 @@ __all__ = [
     'db',
     'Scanner',
     'Watchlist',
+    'WatchlistSymbol',
     'ScanResult',
+    'ScanResultMetric',
     'ScanSchedule',
     'ScanHistory',
+    'ScanStatsDaily',
     'Settings',
     'ScannerTemplate'
 ]
\ No newline at end of file
@@ -0,0 +1,229 @@
+"""
+In-place schema upgrades for databases created by older versions
+
+db.create_all() only creates missing tables, so columns and indexes added
+to existing tables are applied here. Every step is idempotent.
+"""
+
+from sqlalchemy import bindparam, func, inspect, insert, select, text
+from .base import db
+from .scan_result import ScanResult
+from .scan_result_metric import ScanResultMetric
+from .watchlist import Watchlist
+from .watchlist_symbol import WatchlistSymbol
+from .scan_history import ScanHistory
+from .scan_stats_daily import ScanStatsDaily
+from datetime import date
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+def upgrade_database():
+    """Bring an existing database up to the current models"""
+    existing_tables = set(inspect(db.engine).get_table_names())
+    db.create_all()
+    _add_scan_history_id()
+    _add_exported_at()
+    _add_derived_fields()
+    _create_missing_indexes(ScanResult.__table__)
+    _create_missing_indexes(ScanHistory.__table__)
+    if 'scan_results' in existing_tables and 'scan_result_metrics' not in existing_tables:
+        _backfill_result_metrics()
+    if 'watchlists' in existing_tables and 'watchlist_symbols' not in existing_tables:
+        _move_watchlist_symbols()
+    if 'scan_history' in existing_tables and 'scan_stats_daily' not in existing_tables:
+        _build_daily_stats()
+
+def _columns(table_name):
+    return {column['name'] for column in inspect(db.engine).get_columns(table_name)}
+
+def _add_scan_history_id():
+    if 'scan_history_id' in _columns('scan_results'):
+        return
+
+    logger.info("Adding scan_results.scan_history_id")
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE scan_results ADD COLUMN scan_history_id INTEGER REFERENCES scan_history (id)"
+        ))
+        # Older rows were matched to runs by time, so attribute each one to the
+        # latest run of its scanner that had started by the row's timestamp
+        updated = conn.execute(text("""
+            UPDATE scan_results SET scan_history_id = (
+                SELECT h.id FROM scan_history h
+                WHERE h.scanner_id = scan_results.scanner_id
+                  AND h.started_at <= scan_results.timestamp
+                ORDER BY h.started_at DESC
+                LIMIT 1
+            )
+            WHERE scan_history_id IS NULL
+        """)).rowcount
+    logger.info(f"Backfilled scan_history_id on {updated} results")
+
+def _add_exported_at():
+    if 'exported_at' in _columns('scan_history'):
+        return
+
+    # Left NULL so that the analytics export picks up every existing run
+    logger.info("Adding scan_history.exported_at")
+    with db.engine.begin() as conn:
+        conn.execute(text("ALTER TABLE scan_history ADD COLUMN exported_at TIMESTAMP"))
+
+def _add_derived_fields(batch_size=1000):
+    """Add scan_results.derived and scan_history.summary, filled in for existing rows"""
+    if 'derived' in _columns('scan_results') and 'summary' in _columns('scan_history'):
+        return
+
+    logger.info("Adding scan_results.derived and scan_history.summary")
+    with db.engine.begin() as conn:
+        if 'derived' not in _columns('scan_results'):
+            conn.execute(text("ALTER TABLE scan_results ADD COLUMN derived TEXT"))
+        if 'summary' not in _columns('scan_history'):
+            conn.execute(text("ALTER TABLE scan_history ADD COLUMN summary TEXT"))
+
+    table = ScanResult.__table__
+    last_id = 0
+    derived = 0
+    while True:
+        with db.engine.begin() as conn:
+            batch = conn.execute(
+                select(table.c.id, table.c.signal, table.c.metrics)
+                .where(table.c.id > last_id, table.c.derived.is_(None))
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).fetchall()
+            if not batch:
+                break
+
+            updates = []
+            for result_id, signal, metrics in batch:
+                try:
+                    values = json.loads(metrics) if metrics else {}
+                except ValueError:
+                    values = {}
+                fields = ScanResult.derive_fields(signal, values if isinstance(values, dict) else {})
+                updates.append({'result_id': result_id, 'fields': json.dumps(fields)})
+            conn.execute(
+                table.update().where(table.c.id == bindparam('result_id')).values(derived=bindparam('fields')),
+                updates
+            )
+            derived += len(batch)
+            last_id = batch[-1][0]
+
+    history = ScanHistory.__table__
+    summarized = 0
+    with db.engine.begin() as conn:
+        run_ids = conn.execute(
+            select(table.c.scan_history_id).where(table.c.scan_history_id.isnot(None)).distinct()
+        ).scalars().all()
+        for run_id in run_ids:
+            rows = conn.execute(
+                select(table.c.symbol, table.c.signal, table.c.derived)
+                .where(table.c.scan_history_id == run_id)
+                .order_by(table.c.id)
+            )
+            summary = ScanHistory.summarize(
+                dict(json.loads(row.derived), symbol=row.symbol, signal=row.signal) for row in rows
+            )
+            conn.execute(history.update().where(history.c.id == run_id).values(summary=json.dumps(summary)))
+            summarized += 1
+
+    logger.info(f"Derived display fields of {derived} results and summaries of {summarized} runs")
+
+def _create_missing_indexes(table):
+    existing = {index['name'] for index in inspect(db.engine).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            logger.info(f"Creating index {index.name}")
+            index.create(db.engine)
+
+def _backfill_result_metrics(batch_size=1000):
+    """Copy numeric metrics of existing results out of their JSON into scan_result_metrics"""
+    table = ScanResult.__table__
+    last_id = 0
+    copied = 0
+    while True:
+        with db.engine.begin() as conn:
+            batch = conn.execute(
+                select(table.c.id, table.c.metrics)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).fetchall()
+            if not batch:
+                break
+
+            rows = []
+            for result_id, metrics in batch:
+                try:
+                    values = json.loads(metrics) if metrics else {}
+                except ValueError:
+                    continue
+                if isinstance(values, dict):
+                    rows.extend(ScanResultMetric.rows_for(result_id, values))
+            if rows:
+                conn.execute(insert(ScanResultMetric.__table__), rows)
+            copied += len(rows)
+            last_id = batch[-1][0]
+
+    logger.info(f"Backfilled {copied} result metrics")
+
+def _move_watchlist_symbols():
+    """Copy each watchlist's JSON symbol list into watchlist_symbols and blank the JSON"""
+    table = Watchlist.__table__
+    moved = 0
+    with db.engine.begin() as conn:
+        for watchlist_id, symbols, exchange in conn.execute(
+            select(table.c.id, table.c.symbols, table.c.exchange)
+        ).fetchall():
+            try:
+                data = json.loads(symbols) if symbols else []
+            except ValueError:
+                logger.warning(f"Watchlist {watchlist_id} has unreadable symbols, skipping")
+                continue
+
+            rows = [
+                dict(item, watchlist_id=watchlist_id)
+                for item in Watchlist.normalize_symbols(data, exchange or 'NSE')
+            ]
+            if rows:
+                conn.execute(insert(WatchlistSymbol.__table__), rows)
+            conn.execute(table.update().where(table.c.id == watchlist_id).values(symbols='[]'))
+            moved += len(rows)
+
+    logger.info(f"Moved {moved} watchlist symbols into watchlist_symbols")
+
+def _build_daily_stats():
+    """Fill scan_stats_daily from the existing history and results"""
+    history = ScanHistory.__table__
+    results = ScanResult.__table__
+    finished = func.date(func.coalesce(history.c.completed_at, history.c.started_at))
+    result_day = func.date(results.c.timestamp)
+
+    def as_date(day):
+        return date.fromisoformat(day) if isinstance(day, str) else day
+
+    with db.engine.begin() as conn:
+        for day, status, scans, symbols, signals, elapsed in conn.execute(
+            select(
+                finished, history.c.status, func.count(),
+                func.sum(history.c.symbols_scanned), func.sum(history.c.signals_found),
+                func.sum(history.c.execution_time_ms)
+            ).where(history.c.status.in_(('completed', 'failed', 'cancelled'))).group_by(finished, history.c.status)
+        ).fetchall():
+            if day is None:
+                continue
+            if status == 'completed':
+                ScanStatsDaily.increment(
+                    as_date(day), executor=conn, scans_completed=scans, symbols_scanned=symbols or 0,
+                    signals_found=signals or 0, execution_time_ms=elapsed or 0
+                )
+            else:
+                ScanStatsDaily.increment(as_date(day), executor=conn, **{f'scans_{status}': scans})
+
+        for day, count in conn.execute(select(result_day, func.count()).group_by(result_day)).fetchall():
+            if day is not None:
+                ScanStatsDaily.increment(as_date(day), executor=conn, results=count)
+
+    logger.info("Built scan_stats_daily from existing history")
@@ -0,0 +1,95 @@
+"""
+Keyset (cursor) pagination
+
+Pages are fetched with WHERE (sort keys) past the cursor, ORDER BY the keys
+and LIMIT, so every page costs the same index range scan however deep it
+is. There is no COUNT(*) and no OFFSET. The last key must be unique (the
+primary key) so that rows with equal sort values are neither skipped nor
+repeated.
+"""
+
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.types import DateTime
+from datetime import datetime
+import base64
+import json
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        # None when there is nothing further in that direction
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+def encode_cursor(values, direction='next'):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps({'k': values, 'd': direction}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, keys):
+    """(values, direction) of a cursor made for these keys; ValueError if it is malformed"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values, direction = data['k'], data['d']
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+    if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError('Invalid cursor')
+
+    decoded = []
+    for (column, _), value in zip(keys, values):
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        decoded.append(value)
+    return decoded, direction
+
+def _past(keys, values):
+    """Condition for rows after values in the order given by keys"""
+    if all(descending == keys[0][1] for _, descending in keys):
+        columns = tuple_(*(column for column, _ in keys))
+        bound = tuple_(*values)
+        return columns < bound if keys[0][1] else columns > bound
+
+    # Mixed directions: (a past x) OR (a = x AND b past y) OR ...
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, column < values[i] if descending else column > values[i]))
+    return or_(*clauses)
+
+def keyset_paginate(query, keys, cursor=None, limit=50):
+    """One page of an ORM query ordered by keys, a list of (column, descending)
+
+    The query must not be ordered already. Returns a KeysetPage whose cursors
+    are passed back as cursor to fetch the neighbouring pages.
+    """
+    values, direction = decode_cursor(cursor, keys) if cursor else (None, 'next')
+    backwards = direction == 'prev'
+    # Walking backwards reads the same keys in reverse order
+    walk = [(column, descending != backwards) for column, descending in keys]
+
+    page_query = query.add_columns(*(column for column, _ in keys))
+    if values is not None:
+        page_query = page_query.filter(_past(walk, values))
+    page_query = page_query.order_by(*(column.desc() if descending else column.asc() for column, descending in walk))
+
+    rows = page_query.limit(limit + 1).all()
+    more = len(rows) > limit
+    if backwards and not more:
+        # Reached the start: serve a full first page rather than a short one
+        return keyset_paginate(query, keys, None, limit)
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage([])
+
+    first, last = rows[0][1:], rows[-1][1:]
+    has_next = more or backwards
+    has_prev = backwards or values is not None
+    return KeysetPage(
+        [row[0] for row in rows],
+        next_cursor=encode_cursor(last, 'next') if has_next else None,
+        prev_cursor=encode_cursor(first, 'prev') if has_prev else None
+    )
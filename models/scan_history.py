@@ -1,8 +1,18 @@
 from .base import db, BaseModel
-from datetime import datetime
+from .scan_stats_daily import ScanStatsDaily
+from .storage import writer
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import date, datetime
+import json
 
 class ScanHistory(BaseModel):
     __tablename__ = 'scan_history'
+    __table_args__ = (
+        db.Index('ix_scan_history_scanner_id_started_at', 'scanner_id', 'started_at'),
+        db.Index('ix_scan_history_status', 'status'),
+    )
 
     scanner_id = db.Column(db.Integer, db.ForeignKey('scanners.id'), nullable=False)
     watchlist_id = db.Column(db.Integer, db.ForeignKey('watchlists.id'))
@@ -13,6 +23,13 @@ class ScanHistory(BaseModel):
     error_message = db.Column(db.Text)
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
+    # Set once the run and its results are in the analytics archive
+    exported_at = db.Column(db.DateTime)
+    # JSON summary of the run's results, stored when they are written (see summarize)
+    summary = db.Column(db.Text)
+
+    # Relationships
+    results = db.relationship('ScanResult', backref='scan_history', lazy='dynamic')
 
     def __repr__(self):
         return f'<ScanHistory {self.id} - {self.status}>'
@@ -22,6 +39,7 @@ class ScanHistory(BaseModel):
         self.started_at = datetime.now()
 
     def complete(self, symbols_scanned, signals_found):
+        was_running = self.status == 'running'
         self.status = 'completed'
         self.completed_at = datetime.now()
         self.symbols_scanned = symbols_scanned
@@ -31,7 +49,11 @@ class ScanHistory(BaseModel):
             delta = self.completed_at - self.started_at
             self.execution_time_ms = int(delta.total_seconds() * 1000)
 
+        if was_running:
+            ScanStatsDaily.record_scan(self)
+
     def fail(self, error_message):
+        was_running = self.status == 'running'
         self.status = 'failed'
         self.completed_at = datetime.now()
         self.error_message = error_message
@@ -40,38 +62,182 @@ class ScanHistory(BaseModel):
             delta = self.completed_at - self.started_at
             self.execution_time_ms = int(delta.total_seconds() * 1000)
 
+        if was_running:
+            ScanStatsDaily.record_scan(self)
+
     def cancel(self):
+        was_running = self.status == 'running'
         self.status = 'cancelled'
         self.completed_at = datetime.now()
 
+        if was_running:
+            ScanStatsDaily.record_scan(self)
+
+    def get_summary(self):
+        """The stored run summary; rebuilt from the run's results when a purge cleared it
+
+        The rebuilt summary is saved once the run has finished, so later reads
+        don't recompute it. A running run's summary is left to bulk_create,
+        which would otherwise merge its next batch into a stale one. Saving
+        takes the writer connection, so don't call this inside writer_session().
+        """
+        if self.summary:
+            return json.loads(self.summary)
+
+        from .scan_result import ScanResult
+        # Same row fields as the summaries bulk_create stores, which have no timestamp
+        summary = self.summarize(
+            {name: value for name, value in row.items() if name != 'timestamp'}
+            for row in ScanResult.get_derived_rows(self.id)
+        )
+        if self.id is not None and self.status != 'running':
+            encoded = json.dumps(summary)
+            history = self.__table__
+            with writer() as conn:
+                # Unless a concurrent write stored one first
+                conn.execute(
+                    history.update().where(history.c.id == self.id, history.c.summary.is_(None)).values(summary=encoded)
+                )
+            # Without marking the row dirty, so the caller's session doesn't write it again
+            set_committed_value(self, 'summary', encoded)
+        return summary
+
     def to_dict(self):
         data = super().to_dict()
+        data.pop('summary')
         data['scanner_name'] = self.scanner.name if self.scanner else None
         data['watchlist_name'] = self.watchlist.name if self.watchlist else None
         data['execution_time_seconds'] = self.execution_time_ms / 1000 if self.execution_time_ms else None
         return data
 
+    @staticmethod
+    def summarize(rows, previous=None):
+        """Signal counts, averages and top 5 BUY and SELL signals of a run
+
+        rows are a run's results in id order, each the derived fields of
+        ScanResult.derive_fields plus symbol and signal. previous is the
+        summary of the run's earlier rows, which the new ones are added to.
+        """
+        total = 0
+        counts = {'BUY': 0, 'SELL': 0}
+        strength_sum = 0
+        risk_reward_sum = 0
+        exploration = False
+        top = {'BUY': [], 'SELL': []}
+        if previous:
+            total = previous['total_scanned']
+            counts = {'BUY': previous['buy_signals'], 'SELL': previous['sell_signals']}
+            # Averages are over max(BUY + SELL, 1), so the sums come back exactly
+            trading = max(counts['BUY'] + counts['SELL'], 1)
+            strength_sum = previous['avg_signal_strength'] / 20 * trading
+            risk_reward_sum = previous['avg_risk_reward'] * trading
+            exploration = previous['exploration']
+            # Earlier rows have lower ids, so they stay ahead of equal strengths
+            top = {'BUY': list(previous['top_buy_signals']), 'SELL': list(previous['top_sell_signals'])}
+
+        for row in rows:
+            total += 1
+            signal = row['signal']
+            if signal in counts:
+                counts[signal] += 1
+                strength_sum += row['strength']
+                if row['risk_reward'] > 0:
+                    risk_reward_sum += row['risk_reward']
+                top[signal].append(row)
+            elif signal in ('DATA', 'EXPLORE'):
+                exploration = True
+
+        buy_signals, sell_signals = counts['BUY'], counts['SELL']
+        no_signals = total - buy_signals - sell_signals
+        trading = max(buy_signals + sell_signals, 1)
+        return {
+            'total_scanned': total,
+            'buy_signals': buy_signals,
+            'sell_signals': sell_signals,
+            'no_signals': no_signals,
+            'buy_percentage': (buy_signals / total * 100) if total > 0 else 0,
+            'sell_percentage': (sell_signals / total * 100) if total > 0 else 0,
+            'no_signal_percentage': (no_signals / total * 100) if total > 0 else 0,
+            'avg_signal_strength': strength_sum / trading * 20,
+            'avg_risk_reward': risk_reward_sum / trading,
+            'market_trend': 'Bullish' if buy_signals > sell_signals else 'Bearish' if sell_signals > buy_signals else 'Neutral',
+            # Stable sorts keep id order among equal strengths
+            'top_buy_signals': sorted(top['BUY'], key=lambda r: r['strength'], reverse=True)[:5],
+            'top_sell_signals': sorted(top['SELL'], key=lambda r: r['strength'], reverse=True)[:5],
+            # DATA/EXPLORE runs are shown on the exploration page
+            'exploration': exploration
+        }
+
+    @classmethod
+    def with_relations(cls, query=None):
+        """Load scanners and watchlists for all rows up front, for serializing lists with to_dict()"""
+        from .scanner import Scanner
+        from .watchlist import Watchlist
+
+        query = query if query is not None else cls.query
+        return query.options(
+            selectinload(cls.scanner).load_only(Scanner.id, Scanner.name),
+            selectinload(cls.watchlist).load_only(Watchlist.id, Watchlist.name)
+        )
+
+    @classmethod
+    def purge(cls, conn, condition):
+        """Set-based delete of the runs matching a Core condition, taking them off the daily rollup
+
+        Their results must be purged first, with ScanResult.purge. Returns runs deleted.
+        """
+        table = cls.__table__
+        finished = func.date(func.coalesce(table.c.completed_at, table.c.started_at))
+        for day, status, scans, symbols, signals, elapsed in conn.execute(
+            select(
+                finished, table.c.status, func.count(), func.sum(table.c.symbols_scanned),
+                func.sum(table.c.signals_found), func.sum(table.c.execution_time_ms)
+            ).where(condition, table.c.status.in_(('completed', 'failed', 'cancelled'))).group_by(finished, table.c.status)
+        ).fetchall():
+            if day is None:
+                continue
+            # SQLite's date() returns text
+            day = date.fromisoformat(day) if isinstance(day, str) else day
+            if status == 'completed':
+                ScanStatsDaily.increment(
+                    day, executor=conn, scans_completed=-scans, symbols_scanned=-(symbols or 0),
+                    signals_found=-(signals or 0), execution_time_ms=-(elapsed or 0)
+                )
+            else:
+                ScanStatsDaily.increment(day, executor=conn, **{f'scans_{status}': -scans})
+
+        return conn.execute(delete(table).where(condition)).rowcount
+
     @classmethod
     def get_recent_history(cls, limit=50):
-        return cls.query.order_by(cls.started_at.desc()).limit(limit).all()
+        return cls.with_relations().order_by(cls.started_at.desc()).limit(limit).all()
 
     @classmethod
     def get_by_scanner(cls, scanner_id):
-        return cls.query.filter_by(scanner_id=scanner_id).order_by(cls.started_at.desc()).all()
+        return cls.with_relations().filter_by(scanner_id=scanner_id).order_by(cls.started_at.desc()).all()
 
     @classmethod
     def get_running_scans(cls):
-        return cls.query.filter_by(status='running').all()
+        return cls.with_relations().filter_by(status='running').all()
 
     @classmethod
     def get_statistics(cls, scanner_id=None):
-        query = cls.query.filter_by(status='completed')
+        completed = cls.status == 'completed'
+        query = db.session.query(
+            func.count(cls.id),
+            func.sum(case((completed, 1), else_=0)),
+            func.sum(case((completed, cls.execution_time_ms), else_=0)),
+            func.sum(case((completed, cls.signals_found), else_=0))
+        )
         if scanner_id:
-            query = query.filter_by(scanner_id=scanner_id)
+            query = query.filter(cls.scanner_id == scanner_id)
 
-        histories = query.all()
+        all_count, total, total_time, total_signals = query.one()
+        total = total or 0
+        total_time = total_time or 0
+        total_signals = total_signals or 0
 
-        if not histories:
+        if not total:
             return {
                 'total_scans': 0,
                 'average_execution_time': 0,
@@ -80,20 +246,10 @@ class ScanHistory(BaseModel):
                 'success_rate': 0
             }
 
-        total = len(histories)
-        total_time = sum(h.execution_time_ms for h in histories if h.execution_time_ms)
-        total_signals = sum(h.signals_found for h in histories if h.signals_found)
-
-        # Calculate success rate
-        all_query = cls.query
-        if scanner_id:
-            all_query = all_query.filter_by(scanner_id=scanner_id)
-        all_count = all_query.count()
-
         return {
             'total_scans': total,
-            'average_execution_time': total_time / total if total > 0 else 0,
+            'average_execution_time': total_time / total,
             'total_signals': total_signals,
-            'average_signals_per_scan': total_signals / total if total > 0 else 0,
+            'average_signals_per_scan': total_signals / total,
             'success_rate': (total / all_count * 100) if all_count > 0 else 0
         }
\ No newline at end of file
@@ -1,17 +1,47 @@
 from .base import db, BaseModel
+from .scan_result_metric import ScanResultMetric
+from .scan_stats_daily import ScanStatsDaily
+from .storage import copy_rows, writer
+from .pagination import keyset_paginate
+from sqlalchemy import case, delete, func, insert, select, text
+from sqlalchemy.orm import Session, aliased, scoped_session, selectinload
 import json
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 class ScanResult(BaseModel):
     __tablename__ = 'scan_results'
+    __table_args__ = (
+        db.Index('ix_scan_results_scan_history_id', 'scan_history_id'),
+        db.Index('ix_scan_results_scanner_id_timestamp', 'scanner_id', 'timestamp'),
+        db.Index('ix_scan_results_symbol_timestamp', 'symbol', 'timestamp'),
+        db.Index('ix_scan_results_timestamp_id', 'timestamp', 'id'),
+    )
 
     scanner_id = db.Column(db.Integer, db.ForeignKey('scanners.id'), nullable=False)
+    scan_history_id = db.Column(db.Integer, db.ForeignKey('scan_history.id'))
     symbol = db.Column(db.String(20), nullable=False)
     exchange = db.Column(db.String(10))
     signal = db.Column(db.String(50))
     metrics = db.Column(db.Text)  # JSON object with detailed metrics
+    # JSON object of the display fields computed from metrics when the row is written
+    derived = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Relationships
+    metric_values = db.relationship('ScanResultMetric', backref='result', lazy='dynamic', cascade='all, delete-orphan')
+
+    METRIC_OPERATORS = {
+        'lt': lambda column, value: column < value,
+        'lte': lambda column, value: column <= value,
+        'gt': lambda column, value: column > value,
+        'gte': lambda column, value: column >= value,
+        'eq': lambda column, value: column == value,
+        'ne': lambda column, value: column != value
+    }
+
+    # Metrics the results table shows for signals other than BUY, SELL, DATA and EXPLORE
+    GENERIC_FIELDS = ('ltp', 'volume', 'ema10', 'ema20', 'entry', 'target', 'stop_loss', 'risk_reward')
+
     def __repr__(self):
         return f'<ScanResult {self.symbol} - {self.signal}>'
 
@@ -25,14 +55,301 @@ class ScanResult(BaseModel):
 
     def to_dict(self):
         data = super().to_dict()
+        data.pop('derived')
         data['metrics'] = self.get_metrics()
         data['scanner_name'] = self.scanner.name if self.scanner else None
         return data
 
+    @classmethod
+    def with_scanner(cls, query=None):
+        """Load the scanner of every row in one extra query, for serializing lists with to_dict()"""
+        from .scanner import Scanner
+
+        query = query if query is not None else cls.query
+        return query.options(selectinload(cls.scanner).load_only(Scanner.id, Scanner.name))
+
+    @classmethod
+    def bulk_create(cls, scanner_id, exchange, results, scan_history_id=None, timestamp=None, executor=None):
+        """Insert one row per scanner result, plus its numeric metrics, with batched inserts
+
+        Skips building ORM objects, which dominates write time for large scans.
+        Runs on the session unless given a connection; the caller commits, so by
+        default results land in the same transaction as the history update
+        (the scan routes run both in storage.writer_session()). PostgreSQL loads
+        the rows with COPY on that same connection.
+        """
+        if not results:
+            return 0
+
+        executor = executor if executor is not None else db.session
+        rows = cls._rows(scanner_id, exchange, results, scan_history_id, timestamp)
+        cls._record_summary(executor, scan_history_id, rows)
+
+        if db.engine.dialect.name == 'postgresql':
+            conn = executor.connection() if isinstance(executor, (Session, scoped_session)) else executor
+            # COPY can't return generated keys, so reserve the ids first
+            ids = conn.execute(
+                text("SELECT nextval(pg_get_serial_sequence('scan_results', 'id')) FROM generate_series(1, :n)"),
+                {'n': len(rows)}
+            ).scalars().all()
+            copy_rows(conn, cls.__tablename__, ['id'] + list(rows[0]), (
+                [result_id] + list(row.values()) for result_id, row in zip(ids, rows)
+            ))
+        else:
+            conn = None
+            ids = executor.execute(
+                insert(cls.__table__).returning(cls.__table__.c.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+
+        metric_rows = []
+        for result_id, res in zip(ids, results):
+            metric_rows.extend(ScanResultMetric.rows_for(result_id, res.get('metrics') or {}))
+        if metric_rows and conn is not None:
+            copy_rows(conn, ScanResultMetric.__tablename__, ['result_id', 'name', 'value'], (
+                (metric['result_id'], metric['name'], metric['value']) for metric in metric_rows
+            ))
+        elif metric_rows:
+            executor.execute(insert(ScanResultMetric.__table__), metric_rows)
+
+        ScanStatsDaily.increment(rows[0]['timestamp'].date(), executor=executor, results=len(rows))
+        return len(rows)
+
+    @staticmethod
+    def _rows(scanner_id, exchange, results, scan_history_id, timestamp):
+        now = datetime.utcnow()
+        timestamp = timestamp or now
+        encode = json.JSONEncoder().encode
+        return [
+            {
+                'scanner_id': scanner_id,
+                'scan_history_id': scan_history_id,
+                'symbol': res['symbol'],
+                'exchange': exchange,
+                'signal': res['signal'],
+                'metrics': encode(res.get('metrics') or {}),
+                'derived': encode(ScanResult.derive_fields(res['signal'], res.get('metrics') or {})),
+                'timestamp': timestamp,
+                'created_at': now,
+                'updated_at': now
+            }
+            for res in results
+        ]
+
+    @staticmethod
+    def _record_summary(executor, scan_history_id, rows):
+        """Add a batch of a scan's results to the run summary on its history row"""
+        from .scan_history import ScanHistory
+
+        if scan_history_id is None:
+            return
+        history = ScanHistory.__table__
+        # Scans that write their results in several batches build on the earlier ones
+        previous = executor.execute(
+            select(history.c.summary).where(history.c.id == scan_history_id)
+        ).scalar()
+        summary = ScanHistory.summarize(
+            (dict(json.loads(row['derived']), symbol=row['symbol'], signal=row['signal']) for row in rows),
+            previous=json.loads(previous) if previous else None
+        )
+        executor.execute(
+            history.update().where(history.c.id == scan_history_id).values(summary=json.dumps(summary))
+        )
+
+    @staticmethod
+    def derive_fields(signal, metrics):
+        """Display fields of a result: prices from its metrics, potential gain, risk and strength (1-5)
+
+        Trading signals (BUY, SELL) get entry, target, stop loss and the
+        percentages between them; DATA and EXPLORE rows their price and EMAs;
+        other signals close_price plus whichever of GENERIC_FIELDS their
+        metrics have. The full metrics stay in the metrics column only.
+        """
+        def number(*names):
+            for name in names:
+                if name in metrics:
+                    try:
+                        return float(metrics[name])
+                    except (TypeError, ValueError):
+                        return 0.0
+            return 0.0
+
+        if signal in ('BUY', 'SELL'):
+            fields = {
+                'close_price': number('close_price', 'price', 'ltp'),
+                'entry': number('entry', 'price'),
+                'target': number('target'),
+                'stop_loss': number('stop_loss'),
+                'risk_reward': number('risk_reward'),
+                'ema10': number('ema10'),
+                'ema20': number('ema20'),
+                'volume': number('volume')
+            }
+            entry, target, stop_loss = fields['entry'], fields['target'], fields['stop_loss']
+            if entry > 0 and target > 0:
+                gain = target - entry if signal == 'BUY' else entry - target
+                fields['potential_gain'] = gain / entry * 100
+                fields['risk'] = abs((stop_loss - entry) / entry) * 100 if stop_loss > 0 else 0
+            else:
+                fields['potential_gain'] = 0
+                fields['risk'] = 0
+
+            rr_ratio = fields['risk_reward']
+            fields['strength'] = (5 if rr_ratio >= 3 else 4 if rr_ratio >= 2 else 3 if rr_ratio >= 1.5
+                                  else 2 if rr_ratio >= 1 else 1)
+            return fields
+
+        if signal in ('DATA', 'EXPLORE'):
+            # Shown on the exploration page, which reads the metrics themselves
+            fields = {
+                'ltp': number('ltp', 'close_price'),
+                'ema10': number('ema10'),
+                'ema20': number('ema20'),
+                'volume': number('volume'),
+                'close_price': number('ltp', 'close_price')
+            }
+        else:
+            fields = {name: metrics[name] for name in ScanResult.GENERIC_FIELDS if name in metrics}
+            fields['close_price'] = number('close_price', 'price', 'ltp')
+
+        fields.update(potential_gain=0, risk=0, strength=0)
+        return fields
+
+    @classmethod
+    def get_derived_rows(cls, scan_history_id):
+        """symbol, signal, timestamp and derived fields of a run's results, as dicts in id order
+
+        Reads the derived column instead of loading results and parsing their
+        metrics; rows written before it existed are derived on the fly.
+        """
+        table = cls.__table__
+        rows = db.session.execute(
+            select(
+                table.c.symbol, table.c.signal, table.c.timestamp, table.c.derived,
+                case((table.c.derived.is_(None), table.c.metrics)).label('metrics')
+            )
+            .where(table.c.scan_history_id == scan_history_id)
+            .order_by(table.c.id)
+        )
+        items = []
+        for row in rows:
+            if row.derived:
+                fields = json.loads(row.derived)
+            else:
+                fields = cls.derive_fields(row.signal, json.loads(row.metrics) if row.metrics else {})
+            items.append(dict(fields, symbol=row.symbol, signal=row.signal, timestamp=row.timestamp))
+        return items
+
+    @classmethod
+    def filter_by_metric(cls, query, name, op, value):
+        """Restrict a ScanResult query to rows whose numeric metric satisfies op (lt, gt, ...)"""
+        if op not in cls.METRIC_OPERATORS:
+            raise ValueError(f"Unknown metric operator: {op}")
+        metric = aliased(ScanResultMetric)
+        return query.join(metric, (metric.result_id == cls.id) & (metric.name == name)).filter(
+            cls.METRIC_OPERATORS[op](metric.value, float(value))
+        )
+
+    @classmethod
+    def order_by_metric(cls, query, name, descending=True):
+        """Sort a ScanResult query by a numeric metric; rows without it are dropped"""
+        query, metric = cls._join_metric(query, name)
+        return query.order_by(metric.value.desc() if descending else metric.value.asc(), cls.id)
+
+    @classmethod
+    def _join_metric(cls, query, name):
+        metric = aliased(ScanResultMetric)
+        return query.join(metric, (metric.result_id == cls.id) & (metric.name == name)), metric
+
+    @classmethod
+    def keyset_page(cls, query, cursor=None, limit=50, sort_metric=None, descending=True):
+        """Page of an unordered ScanResult query, newest first or by a metric like order_by_metric"""
+        if sort_metric:
+            query, metric = cls._join_metric(query, sort_metric)
+            keys = [(metric.value, descending), (cls.id, False)]
+        else:
+            keys = [(cls.timestamp, True), (cls.id, True)]
+        return keyset_paginate(query, keys, cursor, limit)
+
+    @classmethod
+    def estimate_count(cls, query=None, cap=10000):
+        """(count, exact) for a results query, without a full COUNT(*) over a large table
+
+        With no query, the running total kept in scan_stats_daily. Otherwise
+        the planner's row estimate on PostgreSQL, and elsewhere a count that
+        stops at cap.
+        """
+        if query is None:
+            return ScanStatsDaily.totals()['results'], False
+
+        if db.engine.dialect.name == 'postgresql':
+            compiled = query.statement.compile(dialect=db.engine.dialect)
+            plan = db.session.connection().exec_driver_sql(
+                f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params
+            ).scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return int(plan[0]['Plan']['Plan Rows']), False
+
+        counted = db.session.query(func.count()).select_from(
+            query.with_entities(cls.id).limit(cap + 1).subquery()
+        ).scalar()
+        return min(counted, cap), counted <= cap
+
+    @classmethod
+    def get_top_by_metric(cls, name, limit=20, descending=True, scanner_id=None, scan_history_id=None):
+        query = cls.with_scanner()
+        if scanner_id:
+            query = query.filter_by(scanner_id=scanner_id)
+        if scan_history_id:
+            query = query.filter_by(scan_history_id=scan_history_id)
+        return cls.order_by_metric(query, name, descending).limit(limit).all()
+
+    @classmethod
+    def metric_names(cls, *conditions, order_by=(), limit=None):
+        """Sorted names of the numeric metrics of the rows iter_rows() would return
+
+        Read from the metrics side table, so no metrics JSON is parsed.
+        """
+        table = cls.__table__
+        ids = select(table.c.id).where(*conditions).order_by(*order_by)
+        if limit:
+            ids = ids.limit(limit)
+        names = select(ScanResultMetric.name).where(
+            ScanResultMetric.result_id.in_(ids.scalar_subquery())
+        ).distinct()
+        return sorted(db.session.execute(names).scalars())
+
+    @classmethod
+    def iter_rows(cls, *conditions, order_by=(), limit=None, batch_size=1000):
+        """Stream result rows, with scanner_name, holding at most batch_size rows in memory
+
+        Reads through a server-side cursor where the driver has one. Rows are
+        plain Core rows; metrics is the raw JSON text.
+        """
+        from .scanner import Scanner
+
+        table = cls.__table__
+        scanners = Scanner.__table__
+        columns = [column for column in table.c if column.name != 'derived']
+        query = (
+            select(*columns, scanners.c.name.label('scanner_name'))
+            .select_from(table.outerjoin(scanners, scanners.c.id == table.c.scanner_id))
+            .where(*conditions)
+            .order_by(*order_by)
+        )
+        if limit:
+            query = query.limit(limit)
+
+        with db.engine.connect() as conn:
+            yield from conn.execution_options(yield_per=batch_size).execute(query)
+
     @classmethod
     def get_recent_results(cls, limit=100):
         return cls.query.order_by(cls.timestamp.desc()).limit(limit).all()
 
+    @classmethod
+    def get_by_history(cls, scan_history_id):
+        return cls.with_scanner().filter_by(scan_history_id=scan_history_id).order_by(cls.id).all()
+
     @classmethod
     def get_by_symbol(cls, symbol):
         return cls.query.filter_by(symbol=symbol).order_by(cls.timestamp.desc()).all()
@@ -52,10 +369,52 @@ class ScanResult(BaseModel):
         ).order_by(cls.timestamp.desc()).all()
 
     @classmethod
-    def cleanup_old_results(cls, days=30):
+    def purge(cls, conn, condition):
+        """Set-based delete of the results matching a Core condition, and their metric rows
+
+        Takes them off the daily rollup and clears the stored summary of their
+        runs, which is rebuilt from the remaining rows when next read.
+        Returns (results deleted, metric rows deleted).
+        """
+        from .scan_history import ScanHistory
+
+        table = cls.__table__
+        metrics = ScanResultMetric.__table__
+        history = ScanHistory.__table__
+        per_day = conn.execute(
+            select(func.date(table.c.timestamp), func.count()).where(condition).group_by(func.date(table.c.timestamp))
+        ).fetchall()
+
+        conn.execute(
+            history.update()
+            .where(history.c.id.in_(select(table.c.scan_history_id).where(condition)), history.c.summary.isnot(None))
+            .values(summary=None)
+        )
+
+        metric_rows = conn.execute(
+            delete(metrics).where(metrics.c.result_id.in_(select(table.c.id).where(condition)))
+        ).rowcount
+        rows = conn.execute(delete(table).where(condition)).rowcount
+
+        for day, count in per_day:
+            if day is not None:
+                # SQLite's date() returns text
+                day = date.fromisoformat(day) if isinstance(day, str) else day
+                ScanStatsDaily.increment(day, executor=conn, results=-count)
+        return rows, metric_rows
+
+    @classmethod
+    def cleanup_old_results(cls, days=30, batch_size=5000):
+        """Delete results older than days in id-range batches, one transaction each"""
+        table = cls.__table__
         cutoff_date = datetime.utcnow() - timedelta(days=days)
-        old_results = cls.query.filter(cls.timestamp < cutoff_date).all()
-        for result in old_results:
-            db.session.delete(result)
-        db.session.commit()
-        return len(old_results)
\ No newline at end of file
+        deleted = 0
+        while True:
+            with writer() as conn:
+                ids = conn.execute(
+                    select(table.c.id).where(table.c.timestamp < cutoff_date).order_by(table.c.id).limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    return deleted
+                rows, _ = cls.purge(conn, table.c.id.between(ids[0], ids[-1]) & (table.c.timestamp < cutoff_date))
+                deleted += rows
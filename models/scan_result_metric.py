@@ -0,0 +1,31 @@
+from .base import db
+import math
+
+class ScanResultMetric(db.Model):
+    """One numeric metric of a scan result, so metrics can be filtered and sorted in SQL
+
+    The full metrics dict stays in ScanResult.metrics; only finite numbers are copied here.
+    """
+    __tablename__ = 'scan_result_metrics'
+    __table_args__ = (
+        db.Index('ix_scan_result_metrics_name_value', 'name', 'value'),
+    )
+
+    result_id = db.Column(db.Integer, db.ForeignKey('scan_results.id', ondelete='CASCADE'), primary_key=True)
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<ScanResultMetric {self.result_id} {self.name}={self.value}>'
+
+    @staticmethod
+    def rows_for(result_id, metrics):
+        """Rows for the numeric entries of a metrics dict"""
+        rows = []
+        for name, value in metrics.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            value = float(value)
+            if math.isfinite(value):
+                rows.append({'result_id': result_id, 'name': name, 'value': value})
+        return rows
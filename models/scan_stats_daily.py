@@ -0,0 +1,88 @@
+from .base import db
+from sqlalchemy import func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import date
+
+class ScanStatsDaily(db.Model):
+    """Per-day rollup of scan activity, kept current as scans finish and results are written or purged
+
+    Dashboard totals are sums over these few rows rather than counts over
+    scan_history and scan_results.
+    """
+    __tablename__ = 'scan_stats_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    scans_completed = db.Column(db.Integer, nullable=False, default=0)
+    scans_failed = db.Column(db.Integer, nullable=False, default=0)
+    scans_cancelled = db.Column(db.Integer, nullable=False, default=0)
+    symbols_scanned = db.Column(db.Integer, nullable=False, default=0)
+    signals_found = db.Column(db.Integer, nullable=False, default=0)
+    # Summed over completed scans only
+    execution_time_ms = db.Column(db.BigInteger, nullable=False, default=0)
+    # Rows currently in scan_results with a timestamp on this day
+    results = db.Column(db.Integer, nullable=False, default=0)
+
+    COUNTERS = ('scans_completed', 'scans_failed', 'scans_cancelled', 'symbols_scanned',
+                'signals_found', 'execution_time_ms', 'results')
+
+    def __repr__(self):
+        return f'<ScanStatsDaily {self.day}>'
+
+    @classmethod
+    def increment(cls, day, executor=None, **counts):
+        """Add counts to a day's row, creating it if needed, inside the caller's transaction"""
+        counts = {name: value for name, value in counts.items() if value}
+        if not counts:
+            return
+
+        executor = executor if executor is not None else db.session
+        table = cls.__table__
+        dialect = db.engine.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            dialect_insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+            stmt = dialect_insert(table).values(day=day, **cls._zeroed(counts))
+            executor.execute(stmt.on_conflict_do_update(
+                index_elements=['day'],
+                set_={name: table.c[name] + stmt.excluded[name] for name in counts}
+            ))
+            return
+
+        updated = executor.execute(
+            table.update().where(table.c.day == day).values(
+                **{name: table.c[name] + value for name, value in counts.items()}
+            )
+        ).rowcount
+        if not updated:
+            executor.execute(insert(table).values(day=day, **cls._zeroed(counts)))
+
+    @classmethod
+    def record_scan(cls, history):
+        """Count a finished ScanHistory run on the day it finished"""
+        day = (history.completed_at or history.started_at).date()
+        if history.status == 'completed':
+            cls.increment(
+                day,
+                scans_completed=1,
+                symbols_scanned=history.symbols_scanned or 0,
+                signals_found=history.signals_found or 0,
+                execution_time_ms=history.execution_time_ms or 0
+            )
+        elif history.status in ('failed', 'cancelled'):
+            cls.increment(day, **{f'scans_{history.status}': 1})
+
+    @classmethod
+    def totals(cls):
+        """Every counter summed across all days, in one query"""
+        row = db.session.query(*(func.coalesce(func.sum(cls.__table__.c[name]), 0) for name in cls.COUNTERS)).one()
+        return dict(zip(cls.COUNTERS, (int(value) for value in row)))
+
+    @classmethod
+    def get_day(cls, day: date):
+        row = cls.query.get(day)
+        return {name: getattr(row, name) if row else 0 for name in cls.COUNTERS}
+
+    @classmethod
+    def _zeroed(cls, counts):
+        values = dict.fromkeys(cls.COUNTERS, 0)
+        values.update(counts)
+        return values
@@ -1,4 +1,5 @@
 from .base import db, BaseModel
+from sqlalchemy import func
 import json
 
 class Scanner(BaseModel):
@@ -27,13 +28,43 @@ class Scanner(BaseModel):
     def set_parameters(self, params):
         self.parameters = json.dumps(params)
 
-    def to_dict(self):
+    def to_dict(self, total_scans=None, active_schedules=None):
         data = super().to_dict()
         data['parameters'] = self.get_parameters()
-        data['total_scans'] = self.histories.count()
-        data['active_schedules'] = self.schedules.filter_by(is_active=True).count()
+        data['total_scans'] = self.histories.count() if total_scans is None else total_scans
+        data['active_schedules'] = (
+            self.schedules.filter_by(is_active=True).count() if active_schedules is None else active_schedules
+        )
         return data
 
+    @classmethod
+    def to_dict_many(cls, scanners):
+        """Serialize a list of scanners with two grouped count queries instead of two per scanner"""
+        from .scan_history import ScanHistory
+        from .schedule import ScanSchedule
+
+        ids = [scanner.id for scanner in scanners]
+        if not ids:
+            return []
+
+        total_scans = dict(
+            db.session.query(ScanHistory.scanner_id, func.count(ScanHistory.id))
+            .filter(ScanHistory.scanner_id.in_(ids))
+            .group_by(ScanHistory.scanner_id)
+        )
+        active_schedules = dict(
+            db.session.query(ScanSchedule.scanner_id, func.count(ScanSchedule.id))
+            .filter(ScanSchedule.scanner_id.in_(ids), ScanSchedule.is_active == True)
+            .group_by(ScanSchedule.scanner_id)
+        )
+        return [
+            scanner.to_dict(
+                total_scans=total_scans.get(scanner.id, 0),
+                active_schedules=active_schedules.get(scanner.id, 0)
+            )
+            for scanner in scanners
+        ]
+
     @classmethod
     def get_by_category(cls, category):
         return cls.query.filter_by(category=category, is_active=True).all()
@@ -1,4 +1,5 @@
 from .base import db, BaseModel
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta
 
 class ScanSchedule(BaseModel):
@@ -87,6 +88,18 @@ class ScanSchedule(BaseModel):
         data['watchlist_name'] = self.watchlist.name if self.watchlist else None
         return data
 
+    @classmethod
+    def with_relations(cls, query=None):
+        """Load scanners and watchlists for all rows up front, for serializing lists with to_dict()"""
+        from .scanner import Scanner
+        from .watchlist import Watchlist
+
+        query = query if query is not None else cls.query
+        return query.options(
+            selectinload(cls.scanner).load_only(Scanner.id, Scanner.name),
+            selectinload(cls.watchlist).load_only(Watchlist.id, Watchlist.name)
+        )
+
     @classmethod
     def get_active_schedules(cls):
         return cls.query.filter_by(is_active=True).all()
@@ -0,0 +1,180 @@
+"""
+Database storage profiles
+
+SQLite runs in WAL mode so the web UI keeps reading while scans write.
+Scan result writes and batch maintenance (retention purges, analytics
+exports) run on one dedicated writer connection, so writers queue in Python
+instead of failing on the database lock. PostgreSQL gets a pre-pinged
+connection pool and COPY-based result ingest.
+"""
+
+from contextlib import contextmanager
+from flask import current_app
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from .base import db
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Used when the app was configured without config.Config
+DEFAULTS = {
+    'DB_POOL_SIZE': 10,
+    'DB_MAX_OVERFLOW': 20,
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_MMAP_SIZE_MB': 256,
+    'SQLITE_BUSY_TIMEOUT_MS': 30000
+}
+
+def _setting(config, key):
+    return config.get(key, DEFAULTS[key])
+
+def is_file_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database"""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    backend = make_url(uri).get_backend_name()
+
+    if backend == 'sqlite':
+        if not is_file_sqlite(uri):
+            return {}
+        return {
+            'pool_size': _setting(config, 'DB_POOL_SIZE'),
+            'max_overflow': _setting(config, 'DB_MAX_OVERFLOW'),
+            'connect_args': {
+                'timeout': _setting(config, 'SQLITE_BUSY_TIMEOUT_MS') / 1000,
+                'check_same_thread': False
+            }
+        }
+
+    return {
+        'pool_size': _setting(config, 'DB_POOL_SIZE'),
+        'max_overflow': _setting(config, 'DB_MAX_OVERFLOW'),
+        'pool_pre_ping': True,
+        'pool_recycle': 1800
+    }
+
+def configure_storage(app):
+    """Apply the SQLite pragmas to every pooled connection; call right after db.init_app(app)"""
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite' and is_file_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+            event.listen(db.engine, 'connect', _sqlite_pragmas(app.config))
+
+def _sqlite_pragmas(config):
+    pragmas = [
+        f"PRAGMA journal_mode={_setting(config, 'SQLITE_JOURNAL_MODE')}",
+        f"PRAGMA synchronous={_setting(config, 'SQLITE_SYNCHRONOUS')}",
+        f"PRAGMA mmap_size={_setting(config, 'SQLITE_MMAP_SIZE_MB') * 1024 * 1024}",
+        f"PRAGMA busy_timeout={_setting(config, 'SQLITE_BUSY_TIMEOUT_MS')}",
+        'PRAGMA temp_store=MEMORY'
+    ]
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return on_connect
+
+def writer_engine():
+    """Engine for bulk writes: a single pooled connection on file SQLite, the main engine elsewhere"""
+    app = current_app._get_current_object()
+    engine = app.extensions.get('fluxscan_writer')
+    if engine is not None:
+        return engine
+
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if db.engine.dialect.name == 'sqlite' and is_file_sqlite(uri):
+        options = engine_options(app.config)
+        engine = create_engine(
+            uri,
+            pool_size=1,
+            max_overflow=0,
+            # Writers wait their turn here rather than on the SQLite lock
+            pool_timeout=_setting(app.config, 'SQLITE_BUSY_TIMEOUT_MS') / 1000,
+            connect_args=options['connect_args']
+        )
+        event.listen(engine, 'connect', _sqlite_pragmas(app.config))
+    else:
+        engine = db.engine
+
+    app.extensions['fluxscan_writer'] = engine
+    return engine
+
+@contextmanager
+def writer():
+    """Transaction on the writer connection, committed on exit"""
+    with writer_engine().begin() as conn:
+        yield conn
+
+@contextmanager
+def writer_session():
+    """Point db.session at the writer connection for the block, then commit
+
+    ORM changes and bulk statements in the block share one transaction, so a
+    scan's results commit together with its history update, and concurrent
+    scans wait for the writer connection rather than for the SQLite lock.
+    Rolls back if the block raises. Objects loaded before the block belong to
+    the previous session; load what the block changes inside it.
+    """
+    engine = writer_engine()
+    if engine is db.engine:
+        try:
+            yield db.session
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return
+
+    registry = db.session.registry
+    previous = registry()
+    with engine.connect() as conn:
+        session = Session(bind=conn, query_cls=db.Query)
+        registry.set(session)
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+            registry.set(previous)
+
+def copy_rows(conn, table_name, columns, rows):
+    """Load rows into a PostgreSQL table with COPY FROM STDIN on the connection's transaction
+
+    Works with psycopg2 and psycopg 3. Rows are written in COPY's text format,
+    where None is \\N and every other value is its str() with backslashes,
+    tabs and line breaks escaped.
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_text(value) for value in row))
+        buffer.write('\n')
+    sql = f"COPY {table_name} ({', '.join(columns)}) FROM STDIN"
+
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+def _copy_text(value):
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
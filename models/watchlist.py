@@ -1,15 +1,19 @@
 from .base import db, BaseModel
-import json
+from .watchlist_symbol import WatchlistSymbol
+from sqlalchemy import delete, insert, select
 
 class Watchlist(BaseModel):
     __tablename__ = 'watchlists'
 
     name = db.Column(db.String(100), nullable=False, unique=True)
     description = db.Column(db.Text)
-    symbols = db.Column(db.Text, nullable=False)  # JSON array with exchange info
+    # Legacy JSON array; symbols live in watchlist_symbols since upgrade_database() moved them
+    symbols_json = db.Column('symbols', db.Text, nullable=False, default='[]')
     exchange = db.Column(db.String(10), default='NSE')  # Default exchange
 
     # Relationships
+    symbol_rows = db.relationship('WatchlistSymbol', backref='watchlist', lazy='dynamic',
+                                  cascade='all, delete-orphan', order_by='WatchlistSymbol.id')
     schedules = db.relationship('ScanSchedule', backref='watchlist', lazy='dynamic')
     histories = db.relationship('ScanHistory', backref='watchlist', lazy='dynamic')
 
@@ -21,18 +25,17 @@ class Watchlist(BaseModel):
 
     def get_symbols(self):
         """Get symbols with exchange information"""
-        if self.symbols:
-            data = json.loads(self.symbols)
-            # Handle both old format (list) and new format (list of dicts)
-            if data and isinstance(data[0], str):
-                # Old format - convert to new format with default exchange
-                return [{'symbol': s, 'exchange': self.exchange} for s in data]
-            return data
-        return []
+        if self.id is None:
+            # Not flushed yet, so the rows only exist in the pending collection
+            return [row.to_dict() for row in self.symbol_rows]
+        rows = db.session.query(WatchlistSymbol.symbol, WatchlistSymbol.exchange).filter_by(
+            watchlist_id=self.id
+        ).order_by(WatchlistSymbol.id)
+        return [{'symbol': symbol, 'exchange': exchange} for symbol, exchange in rows]
 
     def get_symbol_list(self):
         """Get just the symbol names (backward compatibility)"""
-        return [s['symbol'] if isinstance(s, dict) else s for s in self.get_symbols()]
+        return [s['symbol'] for s in self.get_symbols()]
 
     def set_symbols(self, symbol_data):
         """Set symbols with exchange information
@@ -41,76 +44,109 @@ class Watchlist(BaseModel):
         - List of dicts with 'symbol' and 'exchange' keys
         - List of tuples (symbol, exchange)
         """
-        if not symbol_data:
-            self.symbols = json.dumps([])
-            return
+        # The column default only applies on INSERT, so a new watchlist may have no exchange yet
+        normalized = self.normalize_symbols(symbol_data or [], self.exchange or 'NSE')
 
-        normalized = []
-        for item in symbol_data:
-            if isinstance(item, str):
-                normalized.append({'symbol': item.upper(), 'exchange': self.exchange})
-            elif isinstance(item, dict):
-                normalized.append({
-                    'symbol': item['symbol'].upper(),
-                    'exchange': item.get('exchange', self.exchange).upper()
-                })
-            elif isinstance(item, (list, tuple)) and len(item) >= 1:
-                exchange = item[1] if len(item) > 1 else self.exchange
-                normalized.append({'symbol': item[0].upper(), 'exchange': exchange.upper()})
+        if self.id is None:
+            self.symbol_rows = [WatchlistSymbol(**item) for item in normalized]
+            return
 
-        self.symbols = json.dumps(normalized)
+        db.session.execute(delete(WatchlistSymbol.__table__).where(WatchlistSymbol.watchlist_id == self.id))
+        if normalized:
+            db.session.execute(
+                insert(WatchlistSymbol.__table__),
+                [dict(item, watchlist_id=self.id) for item in normalized]
+            )
 
     def add_symbol(self, symbol, exchange=None):
         """Add a symbol with optional exchange"""
-        symbols = self.get_symbols()
         new_symbol = {
             'symbol': symbol.upper(),
-            'exchange': (exchange or self.exchange).upper()
+            'exchange': (exchange or self.exchange or 'NSE').upper()
         }
 
         # Check if already exists
-        for s in symbols:
-            if s['symbol'] == new_symbol['symbol'] and s['exchange'] == new_symbol['exchange']:
-                return False
+        if self.has_symbol(**new_symbol):
+            return False
 
-        symbols.append(new_symbol)
-        self.symbols = json.dumps(symbols)
+        self.symbol_rows.append(WatchlistSymbol(**new_symbol))
         return True
 
     def remove_symbol(self, symbol, exchange=None):
-        """Remove a symbol with optional exchange"""
-        symbols = self.get_symbols()
-        symbol = symbol.upper()
-
+        """Remove a symbol with optional exchange; returns whether anything was removed"""
+        query = WatchlistSymbol.query.filter_by(watchlist_id=self.id, symbol=symbol.upper())
         if exchange:
-            exchange = exchange.upper()
-            symbols = [s for s in symbols if not (s['symbol'] == symbol and s['exchange'] == exchange)]
-        else:
-            symbols = [s for s in symbols if s['symbol'] != symbol]
+            query = query.filter_by(exchange=exchange.upper())
+        return query.delete(synchronize_session=False) > 0
 
-        self.symbols = json.dumps(symbols)
-        return True
+    def has_symbol(self, symbol, exchange=None):
+        member = {'symbol': symbol.upper(), 'exchange': (exchange or self.exchange or 'NSE').upper()}
+        if self.id is None:
+            return member in self.get_symbols()
+        query = db.session.query(WatchlistSymbol.id).filter_by(watchlist_id=self.id, **member)
+        return db.session.query(query.exists()).scalar()
 
     def symbol_count(self):
-        return len(self.get_symbols())
-
-    def to_dict(self):
-        data = super().to_dict()
-        data['symbols'] = self.get_symbols()
-        data['symbol_count'] = self.symbol_count()
+        if self.id is None:
+            return len(self.get_symbols())
+        return WatchlistSymbol.query.filter_by(watchlist_id=self.id).count()
+
+    def to_dict(self, symbols=None):
+        # The legacy 'symbols' column is mapped as symbols_json, so BaseModel.to_dict can't read it
+        data = {
+            column.name: getattr(self, column.name)
+            for column in self.__table__.columns
+            if column.name != 'symbols'
+        }
+        data['symbols'] = self.get_symbols() if symbols is None else symbols
+        data['symbol_count'] = len(data['symbols'])
         data['supported_exchanges'] = self.SUPPORTED_EXCHANGES
         return data
 
+    @staticmethod
+    def normalize_symbols(symbol_data, default_exchange):
+        """Upper-cased {'symbol', 'exchange'} dicts, duplicates dropped, order kept"""
+        normalized = []
+        seen = set()
+        for item in symbol_data:
+            if isinstance(item, str):
+                entry = (item.upper(), default_exchange)
+            elif isinstance(item, dict):
+                entry = (item['symbol'].upper(), item.get('exchange', default_exchange).upper())
+            elif isinstance(item, (list, tuple)) and len(item) >= 1:
+                exchange = item[1] if len(item) > 1 else default_exchange
+                entry = (item[0].upper(), exchange.upper())
+            else:
+                continue
+
+            if entry not in seen:
+                seen.add(entry)
+                normalized.append({'symbol': entry[0], 'exchange': entry[1]})
+        return normalized
+
+    @classmethod
+    def to_dict_many(cls, watchlists):
+        """Serialize a list of watchlists, loading all their symbols in one query"""
+        ids = [watchlist.id for watchlist in watchlists]
+        symbols = {watchlist_id: [] for watchlist_id in ids}
+        if ids:
+            rows = db.session.query(
+                WatchlistSymbol.watchlist_id, WatchlistSymbol.symbol, WatchlistSymbol.exchange
+            ).filter(WatchlistSymbol.watchlist_id.in_(ids)).order_by(WatchlistSymbol.id)
+            for watchlist_id, symbol, exchange in rows:
+                symbols[watchlist_id].append({'symbol': symbol, 'exchange': exchange})
+        return [watchlist.to_dict(symbols=symbols[watchlist.id]) for watchlist in watchlists]
+
+    @classmethod
+    def total_symbol_count(cls):
+        """Symbols across all watchlists, counted in SQL"""
+        return WatchlistSymbol.query.count()
+
     @classmethod
     def get_by_exchange(cls, exchange):
         """Get watchlists that contain symbols from specified exchange"""
-        all_watchlists = cls.query.all()
-        result = []
-        for wl in all_watchlists:
-            symbols = wl.get_symbols()
-            if any(s.get('exchange', wl.exchange) == exchange for s in symbols):
-                result.append(wl)
-        return result
+        members = select(WatchlistSymbol.watchlist_id).where(WatchlistSymbol.exchange == exchange)
+        return cls.query.filter(cls.id.in_(members)).all()
 
     @classmethod
     def create_from_csv(cls, name, csv_content, default_exchange='NSE'):
@@ -137,5 +173,5 @@ class Watchlist(BaseModel):
             symbols.append({'symbol': symbol, 'exchange': exchange})
 
         watchlist = cls(name=name, exchange=default_exchange)
-        watchlist.symbols = json.dumps(symbols)
+        watchlist.set_symbols(symbols)
         return watchlist
\ No newline at end of file
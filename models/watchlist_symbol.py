@@ -0,0 +1,20 @@
+from .base import db
+
+class WatchlistSymbol(db.Model):
+    """One symbol of a watchlist; rows keep insertion order through their id"""
+    __tablename__ = 'watchlist_symbols'
+    __table_args__ = (
+        db.UniqueConstraint('watchlist_id', 'symbol', 'exchange', name='uq_watchlist_symbols_member'),
+        db.Index('ix_watchlist_symbols_exchange_watchlist_id', 'exchange', 'watchlist_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    watchlist_id = db.Column(db.Integer, db.ForeignKey('watchlists.id', ondelete='CASCADE'), nullable=False)
+    symbol = db.Column(db.String(50), nullable=False)
+    exchange = db.Column(db.String(10), nullable=False)
+
+    def __repr__(self):
+        return f'<WatchlistSymbol {self.exchange}:{self.symbol}>'
+
+    def to_dict(self):
+        return {'symbol': self.symbol, 'exchange': self.exchange}
@@ -1,14 +1,15 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, current_app, send_file, stream_with_context
 from models import db, ScanResult, Settings
-from datetime import datetime, timedelta
-import csv
-import io
+from services import ExportService
+from datetime import date, datetime, timedelta
+import json
+import tempfile
+import threading
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
 @bp.route('/results', methods=['GET'])
 def get_results():
-    page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 50, type=int)
     scanner_id = request.args.get('scanner_id', type=int)
     symbol = request.args.get('symbol')
@@ -23,7 +24,53 @@ def get_results():
     if signal:
         query = query.filter_by(signal=signal)
 
-    query = query.order_by(ScanResult.timestamp.desc())
+    # Metric filters as name:op:value, e.g. metric=rsi:lt:30&metric=volume_ratio:gt:2
+    metric_filters = request.args.getlist('metric')
+    try:
+        for metric_filter in metric_filters:
+            name, op, value = metric_filter.split(':', 2)
+            query = ScanResult.filter_by_metric(query, name, op, value)
+    except ValueError:
+        return jsonify({'error': 'metric filters must look like name:lt|lte|gt|gte|eq|ne:number'}), 400
+
+    sort_metric = request.args.get('sort_metric')
+    descending = request.args.get('order', 'desc') != 'asc'
+
+    # Numbered pages unless the client opts in to cursor pages with
+    # paginate=cursor (first page) or cursor=<next_cursor|prev_cursor>
+    if 'cursor' not in request.args and request.args.get('paginate') != 'cursor':
+        return _offset_page(query, request.args.get('page', 1, type=int), per_page, sort_metric, descending)
+
+    try:
+        page = ScanResult.keyset_page(
+            ScanResult.with_scanner(query), request.args.get('cursor'), per_page, sort_metric, descending
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    data = {
+        'results': [r.to_dict() for r in page.items],
+        'per_page': per_page,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    }
+
+    if request.args.get('total') == 'approx':
+        if sort_metric:
+            # Rows without the sort metric are not listed, so they are not counted either
+            query = ScanResult.order_by_metric(query, sort_metric, descending)
+        filtered = scanner_id or symbol or signal or metric_filters or sort_metric
+        data['total'], data['total_exact'] = ScanResult.estimate_count(query if filtered else None)
+
+    return jsonify(data)
+
+def _offset_page(query, page, per_page, sort_metric, descending):
+    """Numbered pages, the default shape; costs a COUNT(*) and an OFFSET scan per page"""
+    query = ScanResult.with_scanner(query)
+    if sort_metric:
+        query = ScanResult.order_by_metric(query, sort_metric, descending)
+    else:
+        query = query.order_by(ScanResult.timestamp.desc())
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
 
     results = [r.to_dict() for r in pagination.items]
@@ -36,6 +83,22 @@ def get_results():
         'total_pages': pagination.pages
     })
 
+@bp.route('/results/top', methods=['GET'])
+def get_top_results():
+    metric = request.args.get('metric')
+    if not metric:
+        return jsonify({'error': 'metric is required'}), 400
+
+    results = ScanResult.get_top_by_metric(
+        metric,
+        # A negative LIMIT means no limit at all on SQLite
+        limit=max(1, min(request.args.get('limit', 20, type=int), 500)),
+        descending=request.args.get('order', 'desc') != 'asc',
+        scanner_id=request.args.get('scanner_id', type=int),
+        scan_history_id=request.args.get('scan_id', type=int)
+    )
+    return jsonify({'metric': metric, 'results': [r.to_dict() for r in results]})
+
 @bp.route('/results/<int:id>', methods=['GET'])
 def get_result(id):
     result = ScanResult.query.get_or_404(id)
@@ -43,8 +106,9 @@ def get_result(id):
 
 @bp.route('/results/<int:id>', methods=['DELETE'])
 def delete_result(id):
-    result = ScanResult.query.get_or_404(id)
-    db.session.delete(result)
+    ScanResult.query.get_or_404(id)
+    # purge keeps the daily rollup and the run summary in step
+    ScanResult.purge(db.session.connection(), ScanResult.__table__.c.id == id)
     db.session.commit()
     return jsonify({'message': 'Result deleted successfully'})
 
@@ -56,50 +120,66 @@ def export_results():
     start_date = data.get('start_date')
     end_date = data.get('end_date')
 
-    query = ScanResult.query
+    conditions = []
 
     if scanner_id:
-        query = query.filter_by(scanner_id=scanner_id)
+        conditions.append(ScanResult.scanner_id == scanner_id)
 
     if start_date:
         start = datetime.fromisoformat(start_date)
-        query = query.filter(ScanResult.timestamp >= start)
+        conditions.append(ScanResult.timestamp >= start)
 
     if end_date:
         end = datetime.fromisoformat(end_date)
-        query = query.filter(ScanResult.timestamp <= end)
+        conditions.append(ScanResult.timestamp <= end)
 
-    results = query.order_by(ScanResult.timestamp.desc()).limit(
-        current_app.config['MAX_EXPORT_ROWS']
-    ).all()
+    # Rows are read and sent in chunks as the client downloads them
+    selection = dict(
+        order_by=(ScanResult.timestamp.desc(), ScanResult.id.desc()),
+        limit=current_app.config['MAX_EXPORT_ROWS']
+    )
+    rows = ScanResult.iter_rows(*conditions, **selection)
 
     if format == 'csv':
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Write headers
-        writer.writerow(['Timestamp', 'Symbol', 'Exchange', 'Signal', 'Scanner', 'Metrics'])
-
-        # Write data
-        for result in results:
-            writer.writerow([
-                result.timestamp.isoformat(),
-                result.symbol,
-                result.exchange,
-                result.signal,
-                result.scanner.name if result.scanner else '',
-                str(result.get_metrics())
-            ])
-
-        return output.getvalue(), 200, {
-            'Content-Type': 'text/csv',
+        chunks = ExportService.stream_csv(
+            ['Timestamp', 'Symbol', 'Exchange', 'Signal', 'Scanner', 'Metrics'],
+            rows,
+            lambda row: [
+                row.timestamp.isoformat(),
+                row.symbol,
+                row.exchange,
+                row.signal,
+                row.scanner_name or '',
+                str(json.loads(row.metrics) if row.metrics else {})
+            ]
+        )
+        return Response(stream_with_context(chunks), mimetype='text/csv', headers={
             'Content-Disposition': f'attachment; filename=scan_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        }
+        })
+
+    elif format in ExportService.FILE_FORMATS:
+        # xlsx, parquet and arrow files end with an index, so they are sent once written.
+        # That happens inside the request: up to MAX_EXPORT_ROWS rows are written to a
+        # temporary file before the first byte goes out, which takes seconds at the cap
+        mimetype, extension = ExportService.FILE_FORMATS[format]
+        output = tempfile.TemporaryFile()
+        metric_names = ScanResult.metric_names(*conditions, **selection) if format == 'xlsx' else ()
+        ExportService.export_to_file(format, rows, output, metric_names)
+        output.seek(0)
+        return send_file(output, mimetype=mimetype, as_attachment=True,
+                         download_name=f'scan_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}')
 
     else:
-        # JSON format
-        data = [r.to_dict() for r in results]
-        return jsonify(data)
+        # JSON format, the same objects as ScanResult.to_dict()
+        def to_item(row):
+            item = dict(row._mapping)
+            item['metrics'] = json.loads(row.metrics) if row.metrics else {}
+            return item
+
+        # Compact, as jsonify() writes it outside debug mode
+        dumps = lambda item: current_app.json.dumps(item, separators=(',', ':'))
+        chunks = ExportService.stream_json(rows, to_item, dumps)
+        return Response(stream_with_context(chunks), mimetype='application/json')
 
 @bp.route('/symbols/search', methods=['GET'])
 def search_symbols():
@@ -192,4 +272,110 @@ def clear_cache():
     data_service = current_app.data_service
     data_service.cache.clear()
 
-    return jsonify({'message': 'Cache cleared successfully'})
\ No newline at end of file
+    return jsonify({'message': 'Cache cleared successfully'})
+
+@bp.route('/cache/warmup', methods=['GET'])
+def cache_warmup_status():
+    return jsonify(current_app.cache_warmer.get_status())
+
+@bp.route('/cache/warmup', methods=['POST'])
+def start_cache_warmup():
+    data = request.get_json(silent=True) or {}
+    window_minutes = data.get('window_minutes', current_app.config['CACHE_WARMUP_WINDOW_MINUTES'])
+
+    cache_warmer = current_app.cache_warmer
+    if cache_warmer.get_status()['state'] == 'running':
+        return jsonify({'error': 'Cache warm-up is already running'}), 409
+
+    thread = threading.Thread(target=cache_warmer.run, args=(window_minutes,))
+    thread.start()
+
+    return jsonify({'message': 'Cache warm-up started'}), 202
+
+@bp.route('/retention', methods=['GET'])
+def retention_status():
+    return jsonify(current_app.retention_service.get_status())
+
+@bp.route('/retention', methods=['POST'])
+def start_retention():
+    data = request.get_json(silent=True) or {}
+    retention_days = data.get('retention_days')
+    # bool is an int subclass, so true would otherwise mean one day
+    if retention_days is not None and (
+        not isinstance(retention_days, int) or isinstance(retention_days, bool) or retention_days < 1
+    ):
+        return jsonify({'error': 'retention_days must be a positive integer'}), 400
+
+    retention_service = current_app.retention_service
+    if retention_service.get_status()['state'] == 'running':
+        return jsonify({'error': 'Retention run is already in progress'}), 409
+
+    thread = threading.Thread(target=retention_service.run, args=(retention_days,))
+    thread.start()
+
+    return jsonify({'message': 'Retention run started'}), 202
+
+def _analytics_range():
+    """start/end dates from the query string; days=N covers the last N days"""
+    start = request.args.get('start')
+    end = request.args.get('end')
+    days = request.args.get('days', type=int)
+    start = date.fromisoformat(start) if start else None
+    end = date.fromisoformat(end) if end else None
+    if days and start is None:
+        start = (end or date.today()) - timedelta(days=days)
+    return start, end
+
+@bp.route('/analytics/signals', methods=['GET'])
+def analytics_signals():
+    try:
+        start, end = _analytics_range()
+        symbols = current_app.analytics_service.signal_counts(
+            start, end,
+            scanner_id=request.args.get('scanner_id', type=int),
+            signal=request.args.get('signal'),
+            limit=min(request.args.get('limit', 20, type=int), 1000)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'symbols': symbols})
+
+@bp.route('/analytics/hit-rate', methods=['GET'])
+def analytics_hit_rate():
+    try:
+        start, end = _analytics_range()
+        data = current_app.analytics_service.hit_rate(
+            start, end,
+            scanner_id=request.args.get('scanner_id', type=int),
+            period=request.args.get('period', 'week')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(data)
+
+@bp.route('/analytics/metrics/<name>', methods=['GET'])
+def analytics_metric(name):
+    try:
+        start, end = _analytics_range()
+        stats = current_app.analytics_service.metric_stats(
+            name, start, end,
+            scanner_id=request.args.get('scanner_id', type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'metric': name, 'signals': stats})
+
+@bp.route('/analytics/export', methods=['GET'])
+def analytics_export_status():
+    return jsonify(current_app.analytics_service.get_status())
+
+@bp.route('/analytics/export', methods=['POST'])
+def start_analytics_export():
+    analytics_service = current_app.analytics_service
+    if analytics_service.get_status()['state'] == 'running':
+        return jsonify({'error': 'Analytics export is already running'}), 409
+
+    thread = threading.Thread(target=analytics_service.export)
+    thread.start()
+
+    return jsonify({'message': 'Analytics export started'}), 202
\ No newline at end of file
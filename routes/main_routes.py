@@ -1,5 +1,6 @@
-from flask import Blueprint, render_template, jsonify
-from models import Scanner, Watchlist, ScanResult, ScanHistory
+from flask import Blueprint, render_template, jsonify, current_app
+from models import db, Scanner, Watchlist, ScanResult, ScanHistory, ScanStatsDaily
+from sqlalchemy import case, func
 from datetime import datetime, timedelta
 
 bp = Blueprint('main', __name__)
@@ -12,30 +13,21 @@ def index():
 
     # Get recent scan results (last 24 hours)
     yesterday = datetime.utcnow() - timedelta(days=1)
-    recent_results = ScanResult.query.filter(
+    # Ids follow insertion order, so walk the primary key back instead of sorting on timestamp
+    recent_results = ScanResult.with_scanner().filter(
         ScanResult.timestamp >= yesterday
-    ).order_by(ScanResult.timestamp.desc()).limit(10).all()
+    ).order_by(ScanResult.id.desc()).limit(10).all()
 
-    # Get today's signal count
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_signals = ScanResult.query.filter(
-        ScanResult.timestamp >= today_start
-    ).count()
-
-    # Get yesterday's signal count
-    yesterday_start = today_start - timedelta(days=1)
-    yesterday_signals = ScanResult.query.filter(
-        ScanResult.timestamp >= yesterday_start,
-        ScanResult.timestamp < today_start
-    ).count()
+    # Today's and yesterday's signal counts from the daily rollup
+    today = datetime.utcnow().date()
+    today_signals = ScanStatsDaily.get_day(today)['results']
+    yesterday_signals = ScanStatsDaily.get_day(today - timedelta(days=1))['results']
 
     # Get running scans
-    running_scans = ScanHistory.query.filter_by(status='running').all()
+    running_scans = ScanHistory.get_running_scans()
 
     # Calculate total symbols across all watchlists
-    total_symbols = 0
-    for watchlist in Watchlist.query.all():
-        total_symbols += watchlist.symbol_count()
+    total_symbols = Watchlist.total_symbol_count()
 
     return render_template('pages/index.html',
                          active_scanners=active_scanners,
@@ -63,27 +55,39 @@ def health_check():
 
 @bp.route('/api/stats')
 def get_stats():
+    total_scanners, active_scanners = db.session.query(
+        func.count(Scanner.id),
+        func.sum(case((Scanner.is_active == True, 1), else_=0))
+    ).one()
+    running = ScanHistory.query.filter_by(status='running').count()
+
+    # Finished scans and stored results come from the daily rollup
+    totals = ScanStatsDaily.totals()
+    today = ScanStatsDaily.get_day(datetime.utcnow().date())
+
     stats = {
         'scanners': {
-            'total': Scanner.query.count(),
-            'active': Scanner.query.filter_by(is_active=True).count()
+            'total': total_scanners,
+            'active': active_scanners or 0
         },
         'watchlists': {
             'total': Watchlist.query.count(),
-            'symbols': sum(w.symbol_count() for w in Watchlist.query.all())
+            'symbols': Watchlist.total_symbol_count()
         },
         'scans': {
-            'total': ScanHistory.query.count(),
-            'running': ScanHistory.query.filter_by(status='running').count(),
-            'completed': ScanHistory.query.filter_by(status='completed').count(),
-            'failed': ScanHistory.query.filter_by(status='failed').count()
+            'total': totals['scans_completed'] + totals['scans_failed'] + totals['scans_cancelled'] + running,
+            'running': running,
+            'completed': totals['scans_completed'],
+            'failed': totals['scans_failed']
         },
         'results': {
-            'total': ScanResult.query.count(),
-            'today': ScanResult.query.filter(
-                ScanResult.timestamp >= datetime.utcnow().replace(hour=0, minute=0, second=0)
-            ).count()
+            'total': totals['results'],
+            'today': today['results']
         }
     }
 
+    data_service = getattr(current_app, 'data_service', None)
+    if data_service:
+        stats['cache'] = data_service.cache.get_stats()
+
     return jsonify(stats)
\ No newline at end of file
@@ -1,9 +1,9 @@
-from flask import Blueprint, render_template, jsonify, request, make_response, redirect, url_for
+from flask import Blueprint, Response, render_template, jsonify, request, redirect, url_for, send_file, stream_with_context
 from models import db, ScanResult, Scanner, Watchlist, ScanHistory
+from services import ExportService
 from datetime import datetime, timedelta
-import csv
-import io
 import json
+import tempfile
 
 bp = Blueprint('results', __name__, url_prefix='/results')
 
@@ -15,130 +15,25 @@ def list_results():
     if scan_id:
         # Get specific scan results
         history = ScanHistory.query.get(scan_id)
-        if history:
-            results = ScanResult.query.filter_by(
-                scanner_id=history.scanner_id
-            ).filter(
-                ScanResult.timestamp >= history.started_at
-            ).all()
-        else:
-            results = []
     else:
         # Get latest scan results
-        latest_scan = ScanHistory.query.order_by(ScanHistory.id.desc()).first()
-        if latest_scan:
-            results = ScanResult.query.filter_by(
-                scanner_id=latest_scan.scanner_id
-            ).filter(
-                ScanResult.timestamp >= latest_scan.started_at
-            ).all()
-            scan_id = latest_scan.id
-        else:
-            results = []
-            scan_id = None
+        history = ScanHistory.query.order_by(ScanHistory.id.desc()).first()
+        scan_id = history.id if history else None
 
-    # Process results for comprehensive display (Amibroker-style)
+    # Display fields and the run summary are computed when results are written
+    summary = history.get_summary() if history else ScanHistory.summarize([])
     processed_results = []
-    buy_signals = 0
-    sell_signals = 0
-    no_signals = 0
+    if history and not summary['exploration']:
+        processed_results = ScanResult.get_derived_rows(history.id)
 
-    for r in results:
-        metrics = r.get_metrics() if r.metrics else {}
-
-        # Build processed result based on signal type
-        processed = {
-            'symbol': r.symbol,
-            'signal': r.signal,
-            'timestamp': r.timestamp,
-            'metrics': metrics  # Keep original metrics
-        }
-
-        # Determine scanner type and add appropriate fields
-        if r.signal in ['BUY', 'SELL']:
-            # Trading signal scanner
-            processed.update({
-                'close_price': float(metrics.get('close_price', metrics.get('price', metrics.get('ltp', 0)))),
-                'entry': float(metrics.get('entry', metrics.get('price', 0))),
-                'target': float(metrics.get('target', 0)),
-                'stop_loss': float(metrics.get('stop_loss', 0)),
-                'risk_reward': float(metrics.get('risk_reward', 0)),
-                'ema10': float(metrics.get('ema10', 0)),
-                'ema20': float(metrics.get('ema20', 0)),
-                'volume': float(metrics.get('volume', 0)),
-                'strength': 3
-            })
-        elif r.signal in ['DATA', 'EXPLORE']:
-            # Data exploration scanner
-            processed.update({
-                'ltp': float(metrics.get('ltp', metrics.get('close_price', 0))),
-                'ema10': float(metrics.get('ema10', 0)),
-                'ema20': float(metrics.get('ema20', 0)),
-                'volume': float(metrics.get('volume', 0)),
-                'close_price': float(metrics.get('ltp', metrics.get('close_price', 0)))
-            })
-            # Add any additional metrics dynamically
-            for key, value in metrics.items():
-                if key not in processed:
-                    processed[key] = value
-        else:
-            # Generic scanner - include all metrics
-            processed.update(metrics)
-            processed['close_price'] = float(metrics.get('close_price', metrics.get('price', metrics.get('ltp', 0))))
-
-        # Calculate potential gain and risk percentages ONLY for trading signals
-        if r.signal in ['BUY', 'SELL']:
-            if processed.get('entry', 0) > 0 and processed.get('target', 0) > 0:
-                if r.signal == 'BUY':
-                    processed['potential_gain'] = ((processed['target'] - processed['entry']) / processed['entry']) * 100
-                    processed['risk'] = abs((processed.get('stop_loss', 0) - processed['entry']) / processed['entry']) * 100 if processed.get('stop_loss', 0) > 0 else 0
-                else:  # SELL
-                    processed['potential_gain'] = ((processed['entry'] - processed['target']) / processed['entry']) * 100
-                    processed['risk'] = abs((processed.get('stop_loss', 0) - processed['entry']) / processed['entry']) * 100 if processed.get('stop_loss', 0) > 0 else 0
-            else:
-                processed['potential_gain'] = 0
-                processed['risk'] = 0
-
-            # Calculate signal strength based on risk-reward ratio
-            rr_ratio = processed.get('risk_reward', 0)
-            if rr_ratio >= 3:
-                processed['strength'] = 5
-            elif rr_ratio >= 2:
-                processed['strength'] = 4
-            elif rr_ratio >= 1.5:
-                processed['strength'] = 3
-            elif rr_ratio >= 1:
-                processed['strength'] = 2
-            else:
-                processed['strength'] = 1
-        else:
-            # For DATA/EXPLORE scanners, no risk calculations needed
-            processed['potential_gain'] = 0
-            processed['risk'] = 0
-            processed['strength'] = 0
-
-        # Count signal types
-        if r.signal == 'BUY':
-            buy_signals += 1
-        elif r.signal == 'SELL':
-            sell_signals += 1
-        elif r.signal in ['DATA', 'EXPLORE']:
-            no_signals += 1  # Data rows, not signals
-        else:
-            no_signals += 1
-
-        processed_results.append(processed)
+    # Check if we have exploration data
+    if summary['exploration']:
+        # Redirect to exploration view for EXPLORE/DATA type scanners
+        return redirect(url_for('results.exploration_view', scan_id=scan_id))
 
     # Get scan info
-    history = None
-    scanner = None
-    watchlist = None
-
-    if scan_id:
-        history = ScanHistory.query.get(scan_id)
-        if history:
-            scanner = Scanner.query.get(history.scanner_id)
-            watchlist = Watchlist.query.get(history.watchlist_id)
+    scanner = Scanner.query.get(history.scanner_id) if history else None
+    watchlist = Watchlist.query.get(history.watchlist_id) if history else None
 
     scan_info = {
         'scanner_name': scanner.name if scanner else 'Unknown Scanner',
@@ -146,36 +41,10 @@ def list_results():
         'timestamp': history.started_at.strftime('%d %b %Y %H:%M') if history and history.started_at else datetime.now().strftime('%d %b %Y %H:%M')
     }
 
-    # Calculate summary statistics
-    total_scanned = len(results)
-
-    # Sort for top signals
-    buy_results = sorted([r for r in processed_results if r['signal'] == 'BUY'],
-                         key=lambda x: x.get('strength', 0), reverse=True)
-    sell_results = sorted([r for r in processed_results if r['signal'] == 'SELL'],
-                          key=lambda x: x.get('strength', 0), reverse=True)
-
-    summary = {
-        'total_scanned': total_scanned,
-        'buy_signals': buy_signals,
-        'sell_signals': sell_signals,
-        'no_signals': no_signals,
-        'buy_percentage': (buy_signals / total_scanned * 100) if total_scanned > 0 else 0,
-        'sell_percentage': (sell_signals / total_scanned * 100) if total_scanned > 0 else 0,
-        'no_signal_percentage': (no_signals / total_scanned * 100) if total_scanned > 0 else 0,
-        'watchlist_name': scan_info['watchlist_name'],
-        'execution_time': history.execution_time if history and hasattr(history, 'execution_time') else 0,
-        'avg_signal_strength': sum(r['strength'] for r in processed_results if r['signal'] in ['BUY', 'SELL']) / max(buy_signals + sell_signals, 1) * 20,
-        'avg_risk_reward': sum(r['risk_reward'] for r in processed_results if r['signal'] in ['BUY', 'SELL'] and r['risk_reward'] > 0) / max(buy_signals + sell_signals, 1),
-        'market_trend': 'Bullish' if buy_signals > sell_signals else 'Bearish' if sell_signals > buy_signals else 'Neutral',
-        'top_buy_signals': buy_results[:5],
-        'top_sell_signals': sell_results[:5]
-    }
-
-    # Check if we have exploration data
-    if results and any(r.signal in ['EXPLORE', 'DATA'] for r in results):
-        # Redirect to exploration view for EXPLORE/DATA type scanners
-        return redirect(url_for('results.exploration_view', scan_id=scan_id))
+    summary.update(
+        watchlist_name=scan_info['watchlist_name'],
+        execution_time=history.execution_time if history and hasattr(history, 'execution_time') else 0
+    )
 
     return render_template('results/comprehensive.html',
                          results=processed_results,
@@ -195,7 +64,7 @@ def list_results_old():
     signal = request.args.get('signal')
 
     # Build query
-    query = ScanResult.query
+    query = ScanResult.with_scanner()
 
     if scanner_id:
         query = query.filter_by(scanner_id=scanner_id)
@@ -204,8 +73,12 @@ def list_results_old():
     if signal:
         query = query.filter_by(signal=signal)
 
-    # Get recent results
-    results = query.order_by(ScanResult.timestamp.desc()).limit(100).all()
+    # Recent results, 100 per page, older pages by cursor
+    try:
+        page = ScanResult.keyset_page(query, request.args.get('cursor'), limit=100)
+    except ValueError:
+        return redirect(url_for('results.list_results_old', scanner_id=scanner_id, symbol=symbol, signal=signal))
+    results = page.items
 
     # Get unique signals for filter
     signals = db.session.query(ScanResult.signal).distinct().all()
@@ -213,7 +86,9 @@ def list_results_old():
 
     return render_template('results/list.html',
                          results=results,
-                         signal_types=signal_types)
+                         signal_types=signal_types,
+                         page=page,
+                         filters={'scanner_id': scanner_id, 'symbol': symbol, 'signal': signal})
 
 @bp.route('/exploration/<int:scan_id>')
 def exploration_view(scan_id):
@@ -222,11 +97,7 @@ def exploration_view(scan_id):
     history = ScanHistory.query.get_or_404(scan_id)
 
     # Get scan results
-    results = ScanResult.query.filter_by(
-        scanner_id=history.scanner_id
-    ).filter(
-        ScanResult.timestamp >= history.started_at
-    ).all()
+    results = ScanResult.get_by_history(history.id)
 
     # Simply pass all results for exploration display
     # The template will handle the dynamic columns
@@ -272,8 +143,9 @@ def exploration_view(scan_id):
 # API Endpoints
 @bp.route('/api/results/<int:id>', methods=['DELETE'])
 def api_delete_result(id):
-    result = ScanResult.query.get_or_404(id)
-    db.session.delete(result)
+    ScanResult.query.get_or_404(id)
+    # purge keeps the daily rollup and the run summary in step
+    ScanResult.purge(db.session.connection(), ScanResult.__table__.c.id == id)
     db.session.commit()
 
     return jsonify({'message': 'Result deleted successfully'})
@@ -286,31 +158,17 @@ def api_export_results():
 
     # Get results for scan
     if scan_id:
-        history = ScanHistory.query.get(scan_id)
-        if history:
-            results = ScanResult.query.filter_by(
-                scanner_id=history.scanner_id
-            ).filter(
-                ScanResult.timestamp >= history.started_at
-            ).all()
-        else:
-            results = []
+        conditions = (ScanResult.scan_history_id == scan_id,)
+        selection = dict(order_by=(ScanResult.id,))
     else:
-        results = ScanResult.query.order_by(ScanResult.timestamp.desc()).limit(1000).all()
+        conditions = ()
+        selection = dict(order_by=(ScanResult.timestamp.desc(), ScanResult.id.desc()), limit=1000)
+    rows = ScanResult.iter_rows(*conditions, **selection)
 
     if format_type == 'csv':
-        # Create CSV output
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Write headers
-        writer.writerow(['Timestamp', 'Symbol', 'Signal', 'Price', 'Entry', 'Target',
-                        'Stop Loss', 'Volume', 'EMA10', 'EMA20', 'RSI', 'Risk/Reward'])
-
-        # Write data
-        for result in results:
-            metrics = result.get_metrics() if result.metrics else {}
-            writer.writerow([
+        def to_row(result):
+            metrics = json.loads(result.metrics) if result.metrics else {}
+            return [
                 result.timestamp.strftime('%Y-%m-%d %H:%M:%S') if result.timestamp else '',
                 result.symbol,
                 result.signal,
@@ -323,13 +181,28 @@ def api_export_results():
                 metrics.get('ema_slow', metrics.get('ema20_current', '')),
                 metrics.get('rsi', ''),
                 metrics.get('risk_reward', '')
-            ])
-
-        # Create response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = f'attachment; filename=scan_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-
-        return response
+            ]
+
+        # Streamed as it is written, so large scans never sit in memory
+        chunks = ExportService.stream_csv(
+            ['Timestamp', 'Symbol', 'Signal', 'Price', 'Entry', 'Target',
+             'Stop Loss', 'Volume', 'EMA10', 'EMA20', 'RSI', 'Risk/Reward'],
+            rows,
+            to_row
+        )
+        return Response(stream_with_context(chunks), mimetype='text/csv', headers={
+            'Content-Disposition': f'attachment; filename=scan_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        })
+
+    if format_type in ExportService.FILE_FORMATS:
+        # Every metric of an exploration gets its own column. The file is built
+        # before the response starts, so a large scan holds the request for seconds
+        mimetype, extension = ExportService.FILE_FORMATS[format_type]
+        output = tempfile.TemporaryFile()
+        metric_names = ScanResult.metric_names(*conditions, **selection) if format_type == 'xlsx' else ()
+        ExportService.export_to_file(format_type, rows, output, metric_names)
+        output.seek(0)
+        return send_file(output, mimetype=mimetype, as_attachment=True,
+                         download_name=f'scan_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}')
 
     return jsonify({'error': 'Invalid format'}), 400
\ No newline at end of file
@@ -1,8 +1,8 @@
 from flask import Blueprint, jsonify, request, current_app
 from flask_socketio import emit
 from models import db, Scanner, Watchlist, ScanResult, ScanHistory
+from models.storage import writer_session
 from scanners import ScannerEngine
-from datetime import datetime
 import threading
 
 bp = Blueprint('scan', __name__, url_prefix='/scan')
@@ -90,29 +90,20 @@ def api_run_scan():
                 progress_callback
             )
 
-            # Update history
-            history_record = ScanHistory.query.get(history.id)
-            if result['status'] == 'completed':
-                # Save results
-                for res in result['results']:
-                    scan_result = ScanResult(
-                        scanner_id=scanner_id,
-                        symbol=res['symbol'],
-                        exchange=watchlist.exchange,
-                        signal=res['signal'],
-                        timestamp=datetime.utcnow()
+            # Save results and update history in one transaction on the writer connection
+            with writer_session():
+                history_record = ScanHistory.query.get(history.id)
+                if result['status'] == 'completed':
+                    ScanResult.bulk_create(
+                        scanner_id, watchlist.exchange, result['results'], scan_history_id=history.id
                     )
-                    scan_result.set_metrics(res.get('metrics', {}))
-                    db.session.add(scan_result)
-
-                history_record.complete(
-                    symbols_scanned=result['total_scanned'],
-                    signals_found=result['signals_found']
-                )
-            else:
-                history_record.fail('Scan was cancelled or failed')
 
-            db.session.commit()
+                    history_record.complete(
+                        symbols_scanned=result['total_scanned'],
+                        signals_found=result['signals_found']
+                    )
+                else:
+                    history_record.fail('Scan was cancelled or failed')
 
             # Emit completion event
             if hasattr(current_app, 'socketio'):
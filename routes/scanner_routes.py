@@ -49,6 +49,7 @@ def execute_scan():
 def api_execute_scan():
     """Execute a scan with selected parameters including timeframe"""
     from models import Watchlist, ScanResult, ScanHistory
+    from models.storage import writer_session
     from scanners import ScannerEngine
     from datetime import datetime
     import threading
@@ -102,27 +103,24 @@ def api_execute_scan():
                     parameters
                 )
 
-                # Save results
-                if result['status'] == 'completed':
-                    for res in result['results']:
-                        scan_result = ScanResult(
-                            scanner_id=scanner_id,
-                            symbol=res['symbol'],
-                            exchange=parameters.get('exchange', 'NSE'),
-                            signal=res['signal'],
+                # Save results and update history in one transaction on the writer connection
+                with writer_session():
+                    record = ScanHistory.query.get(history_id)
+                    if result['status'] == 'completed':
+                        ScanResult.bulk_create(
+                            scanner_id,
+                            parameters.get('exchange', 'NSE'),
+                            result['results'],
+                            scan_history_id=history_id,
                             timestamp=datetime.now()
                         )
-                        scan_result.set_metrics(res.get('metrics', {}))
-                        db.session.add(scan_result)
 
-                    history.complete(
-                        symbols_scanned=result['total_scanned'],
-                        signals_found=result['signals_found']
-                    )
-                else:
-                    history.fail('Scan failed or was cancelled')
-
-                db.session.commit()
+                        record.complete(
+                            symbols_scanned=result['total_scanned'],
+                            signals_found=result['signals_found']
+                        )
+                    else:
+                        record.fail('Scan failed or was cancelled')
 
             except Exception as e:
                 print(f"Scan error: {str(e)}")
@@ -167,8 +165,7 @@ def api_scan_status(scan_id):
     # Get results if completed
     results = []
     if history.status == 'completed':
-        scan_results = ScanResult.query.filter_by(scanner_id=history.scanner_id)\
-            .filter(ScanResult.timestamp >= history.started_at).all()
+        scan_results = ScanResult.get_by_history(history.id)
         results = [r.to_dict() for r in scan_results]
 
     return jsonify({
@@ -183,7 +180,7 @@ def api_scan_status(scan_id):
 @bp.route('/api/scanners', methods=['GET'])
 def api_list_scanners():
     scanners = Scanner.query.all()
-    return jsonify([s.to_dict() for s in scanners])
+    return jsonify(Scanner.to_dict_many(scanners))
 
 @bp.route('/api/scanners', methods=['POST'])
 def api_create_scanner():
@@ -274,7 +271,13 @@ def api_update_scanner(id):
 
 @bp.route('/api/scanners/<int:id>', methods=['DELETE'])
 def api_delete_scanner(id):
+    from models import ScanResult, ScanHistory
+
     scanner = Scanner.query.get_or_404(id)
+    # Results and runs go first, set-based, so the daily rollup drops them too
+    conn = db.session.connection()
+    ScanResult.purge(conn, ScanResult.__table__.c.scanner_id == id)
+    ScanHistory.purge(conn, ScanHistory.__table__.c.scanner_id == id)
     db.session.delete(scanner)
     db.session.commit()
     return jsonify({'message': 'Scanner deleted successfully'})
@@ -17,7 +17,7 @@ def list_schedules():
 # API Endpoints
 @bp.route('/api/schedules', methods=['GET'])
 def api_list_schedules():
-    schedules = ScanSchedule.query.all()
+    schedules = ScanSchedule.with_relations().all()
     return jsonify([s.to_dict() for s in schedules])
 
 @bp.route('/api/schedules', methods=['POST'])
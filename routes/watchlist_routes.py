@@ -1,5 +1,6 @@
-from flask import Blueprint, render_template, jsonify, request, redirect, url_for, flash, make_response
+from flask import Blueprint, render_template, jsonify, request, redirect, url_for, flash, make_response, current_app
 from models import db, Watchlist
+from services import WatchlistService
 import json
 import csv
 import io
@@ -15,7 +16,7 @@ def list_watchlists():
 @bp.route('/api/watchlists', methods=['GET'])
 def api_list_watchlists():
     watchlists = Watchlist.query.all()
-    return jsonify([w.to_dict() for w in watchlists])
+    return jsonify(Watchlist.to_dict_many(watchlists))
 
 @bp.route('/api/watchlists', methods=['POST'])
 def api_create_watchlist():
@@ -76,6 +77,12 @@ def api_delete_watchlist(id):
     db.session.commit()
     return jsonify({'message': 'Watchlist deleted successfully'})
 
+@bp.route('/api/watchlists/<int:id>/quotes', methods=['GET'])
+def api_watchlist_quotes(id):
+    Watchlist.query.get_or_404(id)
+    watchlist_service = WatchlistService(current_app.data_service)
+    return jsonify(watchlist_service.get_watchlist_quotes(id))
+
 @bp.route('/api/watchlists/<int:id>/symbols', methods=['POST'])
 def api_add_symbol(id):
     watchlist = Watchlist.query.get_or_404(id)
@@ -85,10 +92,7 @@ def api_add_symbol(id):
     if not symbol:
         return jsonify({'error': 'Symbol is required'}), 400
 
-    symbols = watchlist.get_symbols()
-    if symbol not in symbols:
-        symbols.append(symbol)
-        watchlist.set_symbols(symbols)
+    if watchlist.add_symbol(symbol, data.get('exchange')):
         db.session.commit()
 
     return jsonify(watchlist.to_dict())
@@ -96,12 +100,8 @@ def api_add_symbol(id):
 @bp.route('/api/watchlists/<int:id>/symbols/<symbol>', methods=['DELETE'])
 def api_remove_symbol(id, symbol):
     watchlist = Watchlist.query.get_or_404(id)
-    symbols = watchlist.get_symbols()
-
-    if symbol in symbols:
-        symbols.remove(symbol)
-        watchlist.set_symbols(symbols)
-        db.session.commit()
+    watchlist.remove_symbol(symbol, request.args.get('exchange'))
+    db.session.commit()
 
     return jsonify(watchlist.to_dict())
 
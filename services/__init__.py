@@ -3,7 +3,11 @@ from .scanner_service import ScannerService
 from .watchlist_service import WatchlistService
 from .schedule_service import ScheduleService
 from .cache_service import CacheService
+from .shared_cache import SharedCache
 from .export_service import ExportService
+from .cache_warmer import CacheWarmer
+from .retention_service import RetentionService
+from .analytics_service import AnalyticsService
 
 __all__ = [
     'DataService',
@@ -11,5 +15,9 @@ __all__ = [
     'WatchlistService',
     'ScheduleService',
     'CacheService',
-    'ExportService'
+    'SharedCache',
+    'ExportService',
+    'CacheWarmer',
+    'RetentionService',
+    'AnalyticsService'
 ]
\ No newline at end of file
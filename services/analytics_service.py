@@ -0,0 +1,406 @@
+from typing import Dict, Any, List, Optional
+from models import db, ScanHistory, ScanResult
+from models.storage import writer
+from sqlalchemy import select
+from datetime import date, datetime, timedelta
+from functools import reduce
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import threading
+import operator
+import logging
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+RUN_COLUMNS = ('id', 'scanner_id', 'watchlist_id', 'symbols_scanned', 'signals_found',
+               'execution_time_ms', 'started_at', 'completed_at')
+RESULT_COLUMNS = ('id', 'scan_history_id', 'scanner_id', 'symbol', 'exchange', 'signal', 'timestamp', 'metrics')
+METRIC_PREFIX = 'metric_'
+
+# Fixed column types of the archive files; metric columns come on top of these
+FILE_DTYPES = {
+    'scan_runs': {
+        'scan_history_id': 'int64', 'scanner_id': 'int64', 'watchlist_id': 'Int64', 'symbols_scanned': 'Int64',
+        'signals_found': 'Int64', 'execution_time_ms': 'Int64', 'started_at': 'datetime64[ns]',
+        'completed_at': 'datetime64[ns]'
+    },
+    'scan_results': {
+        'result_id': 'int64', 'scan_history_id': 'int64', 'symbol': 'string', 'exchange': 'string',
+        'signal': 'string', 'timestamp': 'datetime64[ns]'
+    }
+}
+
+# Hive partition keys of each dataset, as found in the directory names
+PARTITIONS = {
+    'scan_results': pa.schema([('date', pa.string()), ('scanner_id', pa.int64())]),
+    'scan_runs': pa.schema([('date', pa.string())])
+}
+
+PERIODS = {'day': 'D', 'week': 'W', 'month': 'M'}
+
+class AnalyticsService:
+    """Columnar archive of completed scan runs and the analytical queries served from it
+
+    Completed runs are exported in batches to zstd Parquet under archive_dir:
+        scan_results/date=YYYY-MM-DD/scanner_id=N/part-<first run>-<last run>.parquet
+        scan_runs/date=YYYY-MM-DD/part-<first run>-<last run>.parquet
+    where date is the day the run started. Result metrics are flattened into
+    typed metric_<name> columns. Queries only open the partitions in their
+    date range and scanner, and only read the columns they use.
+
+    Each export adds a file per partition it touches, so partitions of past
+    days are compacted into a single file. The merged file replaces its inputs
+    by rename; if a run is interrupted between the rename and the removal of
+    the inputs, the next compaction drops the duplicate rows.
+    """
+
+    def __init__(self, app=None, archive_dir: str = os.path.join('archive', 'analytics'), batch_size: int = 200):
+        # Needed for database access when run from the scheduler thread
+        self.app = app
+        self.archive_dir = archive_dir
+        # Runs per export batch
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.status = self._empty_status('idle')
+
+    # Export
+
+    def export(self) -> Dict[str, Any]:
+        if self.app is not None:
+            with self.app.app_context():
+                return self._export()
+        return self._export()
+
+    def _export(self) -> Dict[str, Any]:
+        with self._lock:
+            if self.status['state'] == 'running':
+                return dict(self.status)
+            self.status = self._empty_status('running')
+
+        try:
+            days = set()
+            while self._export_batch(days):
+                pass
+
+            # Yesterday stops receiving new files once today's first export runs
+            yesterday = (date.today() - timedelta(days=1)).isoformat()
+            self.compact(sorted(day for day in days | {yesterday} if day < date.today().isoformat()))
+
+            with self._lock:
+                self.status['state'] = 'completed'
+                self.status['finished_at'] = datetime.utcnow().isoformat()
+
+            if self.status['runs_exported']:
+                logger.info(f"Exported {self.status['runs_exported']} runs and {self.status['results_exported']} "
+                            f"results to the analytics archive")
+
+        except Exception as e:
+            logger.error(f"Analytics export failed: {e}")
+            with self._lock:
+                self.status['state'] = 'failed'
+                self.status['error'] = str(e)
+                self.status['finished_at'] = datetime.utcnow().isoformat()
+
+        return self.get_status()
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.status)
+
+    def _export_batch(self, days: set) -> bool:
+        history = ScanHistory.__table__
+        results = ScanResult.__table__
+
+        with db.engine.connect() as conn:
+            runs = conn.execute(
+                select(*(history.c[name] for name in RUN_COLUMNS))
+                .where(history.c.status == 'completed', history.c.exported_at.is_(None))
+                .order_by(history.c.id)
+                .limit(self.batch_size)
+            ).fetchall()
+            if not runs:
+                return False
+
+            run_ids = [run.id for run in runs]
+            rows = conn.execute(
+                select(*(results.c[name] for name in RESULT_COLUMNS))
+                .where(results.c.scan_history_id.in_(run_ids))
+                .order_by(results.c.id)
+            ).fetchall()
+
+        run_frame = (pd.DataFrame(runs, columns=list(RUN_COLUMNS))
+                     .rename(columns={'id': 'scan_history_id'})
+                     .astype(FILE_DTYPES['scan_runs']))
+        run_frame['date'] = run_frame['started_at'].fillna(run_frame['completed_at']).dt.strftime('%Y-%m-%d')
+        run_days = dict(zip(run_frame['scan_history_id'], run_frame['date']))
+
+        result_frame = self._flatten(
+            pd.DataFrame(rows, columns=list(RESULT_COLUMNS))
+            .rename(columns={'id': 'result_id'})
+            .astype(dict(FILE_DTYPES['scan_results'], scanner_id='int64'))
+        )
+        result_frame['date'] = result_frame['scan_history_id'].map(run_days)
+
+        name = f'part-{run_ids[0]}-{run_ids[-1]}.parquet'
+        files = 0
+        written = 0
+        days.update(run_frame['date'])
+        for day, part in run_frame.groupby('date'):
+            written += self._write(part.drop(columns='date'), 'scan_runs', f'date={day}', name)
+            files += 1
+        for (day, scanner_id), part in result_frame.groupby(['date', 'scanner_id']):
+            written += self._write(part.drop(columns=['date', 'scanner_id']), 'scan_results',
+                                   f'date={day}', f'scanner_id={scanner_id}', name)
+            files += 1
+
+        with writer() as conn:
+            conn.execute(history.update().where(history.c.id.in_(run_ids)).values(exported_at=datetime.utcnow()))
+
+        with self._lock:
+            self.status['batches'] += 1
+            self.status['runs_exported'] += len(runs)
+            self.status['results_exported'] += len(result_frame)
+            self.status['files'] += files
+            self.status['bytes'] += written
+        return True
+
+    def compact(self, days: List[str]) -> int:
+        """Merge the files of each partition of the given days (YYYY-MM-DD) into one"""
+        merged = 0
+        for name, key in (('scan_runs', 'scan_history_id'), ('scan_results', 'result_id')):
+            for day in days:
+                top = os.path.join(self.archive_dir, name, f'date={day}')
+                for directory, _, files in os.walk(top):
+                    parts = sorted(f for f in files if f.startswith('part-') and f.endswith('.parquet'))
+                    if len(parts) > 1:
+                        self._compact_partition(directory, parts, key)
+                        merged += len(parts)
+
+        with self._lock:
+            self.status['files_compacted'] += merged
+        return merged
+
+    def _compact_partition(self, directory: str, parts: List[str], key: str):
+        paths = [os.path.join(directory, part) for part in parts]
+        schema = _unify_schemas([pq.read_schema(path) for path in paths])
+        table = ds.dataset(paths, schema=schema, format='parquet').to_table()
+        table = table.filter(pa.array(~table.column(key).to_pandas().duplicated())).sort_by(key)
+
+        ids = [int(run_id) for part in parts for run_id in part[len('part-'):-len('.parquet')].split('-')]
+        name = f'part-{min(ids)}-{max(ids)}.parquet'
+        # Dataset discovery skips names starting with an underscore
+        staging = os.path.join(directory, f'_{name}')
+        pq.write_table(table, staging, compression='zstd')
+        os.replace(staging, os.path.join(directory, name))
+        for part in parts:
+            if part != name:
+                os.remove(os.path.join(directory, part))
+
+    def _write(self, frame: pd.DataFrame, *parts: str) -> int:
+        directory = os.path.join(self.archive_dir, *parts[:-1])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, parts[-1])
+        frame.to_parquet(path, index=False, compression='zstd')
+        return os.path.getsize(path)
+
+    @staticmethod
+    def _flatten(frame: pd.DataFrame) -> pd.DataFrame:
+        """Replace the metrics JSON with one typed metric_<name> column per metric"""
+        parsed = []
+        for raw in frame.pop('metrics'):
+            try:
+                values = json.loads(raw) if raw else {}
+            except ValueError:
+                values = {}
+            parsed.append(values if isinstance(values, dict) else {})
+
+        names = sorted({name for values in parsed for name in values})
+        columns = {METRIC_PREFIX + name: _typed([values.get(name) for values in parsed]) for name in names}
+        return pd.concat([frame, pd.DataFrame(columns, index=frame.index)], axis=1)
+
+    # Queries
+
+    def signal_counts(self, start: Optional[date] = None, end: Optional[date] = None,
+                      scanner_id: Optional[int] = None, signal: Optional[str] = None,
+                      limit: int = 20) -> List[Dict[str, Any]]:
+        """Symbols that signalled most often, with counts per signal"""
+        condition = ds.field('signal') == signal if signal else None
+        table = self._read('scan_results', ['symbol', 'signal'], start, end, scanner_id, condition)
+        if table is None or table.num_rows == 0:
+            return []
+
+        # Group in Arrow; only the per-symbol counts are converted to pandas
+        counts = (table.group_by(['symbol', 'signal']).aggregate([([], 'count_all')]).to_pandas()
+                  .pivot(index='symbol', columns='signal', values='count_all').fillna(0))
+        totals = counts.sum(axis=1).sort_values(ascending=False, kind='stable').head(limit)
+        return [
+            {
+                'symbol': symbol,
+                'signals': int(total),
+                'by_signal': {name: int(count) for name, count in counts.loc[symbol].items() if count}
+            }
+            for symbol, total in totals.items()
+        ]
+
+    def hit_rate(self, start: Optional[date] = None, end: Optional[date] = None,
+                 scanner_id: Optional[int] = None, period: str = 'week') -> Dict[str, Any]:
+        """Signals found per symbol scanned, overall and per day, week or month"""
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+
+        table = self._read('scan_runs', ['started_at', 'symbols_scanned', 'signals_found'], start, end, scanner_id)
+        if table is None or table.num_rows == 0:
+            return {'runs': 0, 'symbols_scanned': 0, 'signals_found': 0, 'hit_rate': 0, 'periods': []}
+
+        frame = table.to_pandas()
+        frame['period'] = frame['started_at'].dt.to_period(PERIODS[period]).dt.start_time.dt.strftime('%Y-%m-%d')
+        grouped = frame.groupby('period').agg(
+            runs=('signals_found', 'size'),
+            symbols_scanned=('symbols_scanned', 'sum'),
+            signals_found=('signals_found', 'sum')
+        )
+
+        def summary(runs, symbols, signals):
+            return {
+                'runs': int(runs),
+                'symbols_scanned': int(symbols),
+                'signals_found': int(signals),
+                'hit_rate': signals / symbols * 100 if symbols else 0
+            }
+
+        data = summary(len(frame), frame['symbols_scanned'].sum(), frame['signals_found'].sum())
+        data['periods'] = [
+            dict(summary(row.runs, row.symbols_scanned, row.signals_found), period=name)
+            for name, row in grouped.iterrows()
+        ]
+        return data
+
+    def metric_stats(self, metric: str, start: Optional[date] = None, end: Optional[date] = None,
+                     scanner_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Distribution of a numeric metric for each signal"""
+        column = METRIC_PREFIX + metric
+        table = self._read('scan_results', ['signal', column], start, end, scanner_id)
+        if table is None or table.num_rows == 0:
+            return []
+
+        frame = table.to_pandas()
+        # Text values of a metric that is numeric elsewhere are skipped
+        frame[column] = pd.to_numeric(frame[column], errors='coerce')
+        if frame[column].isna().all():
+            raise ValueError(f"Metric {metric} has no numeric values")
+
+        stats = frame.dropna(subset=[column]).groupby('signal')[column].describe()
+        return [
+            {
+                'signal': name,
+                'count': int(row['count']),
+                'mean': row['mean'],
+                'min': row['min'],
+                'p25': row['25%'],
+                'median': row['50%'],
+                'p75': row['75%'],
+                'max': row['max']
+            }
+            for name, row in stats.iterrows()
+        ]
+
+    def _read(self, name: str, columns: List[str], start: Optional[date] = None, end: Optional[date] = None,
+              scanner_id: Optional[int] = None, condition=None) -> Optional[pa.Table]:
+        """Read columns of one dataset from the partitions matching the date range and scanner"""
+        root = os.path.join(self.archive_dir, name)
+        if not os.path.isdir(root):
+            return None
+
+        conditions = [condition] if condition is not None else []
+        if start is not None:
+            conditions.append(ds.field('date') >= start.isoformat())
+        if end is not None:
+            conditions.append(ds.field('date') <= end.isoformat())
+        if scanner_id:
+            conditions.append(ds.field('scanner_id') == scanner_id)
+        condition = reduce(operator.and_, conditions) if conditions else None
+
+        partitioning = ds.partitioning(PARTITIONS[name], flavor='hive')
+        dataset = ds.dataset(root, format='parquet', partitioning=partitioning)
+        # Prunes on the directory names alone; no file outside the range is opened
+        fragments = list(dataset.get_fragments(filter=condition))
+        if not fragments:
+            return None
+
+        schema = _file_schema(name)
+        metrics = [column for column in columns if column.startswith(METRIC_PREFIX)]
+        if metrics:
+            # Runs export different metrics, so their types come from the footers of the files being read
+            found = _unify_schemas([fragment.physical_schema for fragment in fragments])
+            for column in metrics:
+                if column not in found.names:
+                    raise ValueError(f"Metric {column[len(METRIC_PREFIX):]} is not in the archive for this range")
+                schema = schema.append(found.field(column))
+        for field in PARTITIONS[name]:
+            schema = schema.append(field)
+
+        paths = [fragment.path for fragment in fragments]
+        dataset = ds.dataset(paths, schema=schema, format='parquet', partitioning=partitioning, partition_base_dir=root)
+        return dataset.to_table(columns=columns, filter=condition)
+
+    @staticmethod
+    def _empty_status(state: str) -> Dict[str, Any]:
+        return {
+            'state': state,
+            'batches': 0,
+            'runs_exported': 0,
+            'results_exported': 0,
+            'files': 0,
+            'bytes': 0,
+            'files_compacted': 0,
+            'error': None,
+            'started_at': datetime.utcnow().isoformat() if state == 'running' else None,
+            'finished_at': None
+        }
+
+def _file_schema(name: str) -> pa.Schema:
+    empty = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in FILE_DTYPES[name].items()})
+    return pa.Schema.from_pandas(empty, preserve_index=False).remove_metadata()
+
+def _typed(values: List[Any]):
+    """Column for one metric: float for numbers, boolean for flags, otherwise text"""
+    present = [value for value in values if value is not None]
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return pd.array(values, dtype='Float64')
+    if all(isinstance(value, bool) for value in present):
+        return pd.array(values, dtype='boolean')
+    return pd.array(
+        [value if value is None or isinstance(value, str) else json.dumps(value) for value in values],
+        dtype='string'
+    )
+
+def _unify_schemas(schemas: List[pa.Schema]) -> pa.Schema:
+    """Common schema for files whose metric columns may differ in presence and type
+
+    A column typed differently across files is read as float64 if every type
+    is numeric, and as string otherwise.
+    """
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            found = types.setdefault(field.name, set())
+            # All-null columns take the type the column has elsewhere
+            if not pa.types.is_null(field.type):
+                found.add(field.type)
+
+    fields = []
+    for name, found in types.items():
+        if len(found) == 1:
+            column_type = found.pop()
+        elif found and all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in found):
+            column_type = pa.float64()
+        elif found:
+            column_type = pa.string()
+        else:
+            column_type = pa.float64()
+        fields.append(pa.field(name, column_type))
+    return pa.schema(fields)
@@ -1,78 +1,422 @@
 import time
-from typing import Any, Optional
-import pickle
+import sys
+import heapq
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
 import hashlib
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Byte budgets per key namespace (the key prefix before the first '_')
+DEFAULT_BUDGETS = {
+    'hist': 512 * MB,
+    'quote': 32 * MB
+}
+
+# Seconds between prunes of the shared tier
+L2_CLEANUP_INTERVAL = 60
+
+COUNTERS = ('hits', 'misses', 'sets', 'evictions', 'expirations')
+
+class ByteBudgets:
+    """Bytes held per namespace across all shards, each against one cache-wide budget"""
+
+    def __init__(self, budgets: Dict[str, int], default_budget: int):
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.lock = threading.Lock()
+        self.used: Dict[str, int] = {}
+
+    def budget(self, namespace: str) -> int:
+        return self.budgets.get(namespace, self.default_budget)
+
+    def charge(self, namespace: str, size: int) -> int:
+        """Add size bytes (negative to release); returns how far over budget the namespace is"""
+        with self.lock:
+            used = self.used[namespace] = self.used.get(namespace, 0) + size
+        return used - self.budget(namespace)
+
+    def excess(self, namespace: str) -> int:
+        return self.charge(namespace, 0)
+
+class CacheShard:
+    """One lock-protected slice of the cache with its own LRU per namespace
+
+    Byte budgets are shared by all shards, so a shard can hold any share of
+    a namespace and a single entry can be as large as the whole budget.
+    """
+
+    def __init__(self, budgets: ByteBudgets):
+        self.budgets = budgets
+        self.lock = threading.Lock()
+        # namespace -> OrderedDict of key -> (value, expiry, size), least recently used first
+        self.namespaces: Dict[str, OrderedDict] = {}
+        self.sizes: Dict[str, int] = {}
+        # namespace -> running counters, kept up to date on every operation
+        self.counters: Dict[str, Dict[str, int]] = {}
+        # key -> Future for values currently being computed by get_or_compute
+        self.pending: Dict[str, Future] = {}
+        # Min-heap of (expiry, key, namespace); entries overwritten or removed since are skipped
+        self.expiry_heap: List[tuple] = []
+
+    def get(self, key: str, namespace: str) -> Optional[Any]:
+        counters = self.counters_for(namespace)
+        entries = self.namespaces.get(namespace)
+        if not entries or key not in entries:
+            counters['misses'] += 1
+            return None
+
+        value, expiry, size = entries[key]
+        if expiry and time.time() > expiry:
+            # Expired, remove from cache
+            self.remove(key, namespace)
+            counters['expirations'] += 1
+            counters['misses'] += 1
+            return None
+
+        entries.move_to_end(key)
+        counters['hits'] += 1
+        return value
+
+    def store(self, key: str, namespace: str, value: Any, expiry: Optional[float], size: int) -> int:
+        """Add an entry, evicting this shard's least recently used ones to make room
+
+        Returns the bytes the namespace is still over budget, which the caller
+        frees from the other shards once this shard's lock is released.
+        """
+        self.remove(key, namespace)
+        if size > self.budgets.budget(namespace):
+            # Would evict the whole namespace and still not fit
+            return 0
+
+        entries = self.namespaces.setdefault(namespace, OrderedDict())
+        entries[key] = (value, expiry, size)
+        self.sizes[namespace] = self.sizes.get(namespace, 0) + size
+        if expiry:
+            heapq.heappush(self.expiry_heap, (expiry, key, namespace))
+
+        self.counters_for(namespace)['sets'] += 1
+        self.budgets.charge(namespace, size)
+        # The new entry is the most recently used, so it is never its own victim
+        return self.evict(namespace, keep=1)
+
+    def evict(self, namespace: str, keep: int = 0) -> int:
+        """Drop least recently used entries while the namespace is over budget; returns the bytes still over"""
+        entries = self.namespaces.get(namespace)
+        excess = self.budgets.excess(namespace)
+        counters = self.counters_for(namespace)
+        while excess > 0 and entries and len(entries) > keep:
+            _, (_, _, size) = entries.popitem(last=False)
+            self.sizes[namespace] -= size
+            excess = self.budgets.charge(namespace, -size)
+            counters['evictions'] += 1
+        return excess
+
+    def remove(self, key: str, namespace: str):
+        entries = self.namespaces.get(namespace)
+        if entries and key in entries:
+            _, _, size = entries.pop(key)
+            self.sizes[namespace] -= size
+            self.budgets.charge(namespace, -size)
+
+    def clear(self):
+        for namespace, size in self.sizes.items():
+            self.budgets.charge(namespace, -size)
+        self.namespaces.clear()
+        self.sizes.clear()
+        self.expiry_heap.clear()
+
+    def expire(self, now: float, budget: int) -> int:
+        """Drop entries whose deadline has passed, examining at most budget heap items"""
+        expired = 0
+        heap = self.expiry_heap
+        while heap and heap[0][0] <= now and budget > 0:
+            expiry, key, namespace = heapq.heappop(heap)
+            budget -= 1
+
+            entries = self.namespaces.get(namespace)
+            entry = entries.get(key) if entries else None
+            if entry is None or entry[1] != expiry:
+                # Overwritten, deleted or evicted since this deadline was pushed
+                continue
+
+            self.remove(key, namespace)
+            self.counters_for(namespace)['expirations'] += 1
+            expired += 1
+
+        return expired
+
+    def counters_for(self, namespace: str) -> Dict[str, int]:
+        counters = self.counters.get(namespace)
+        if counters is None:
+            counters = self.counters[namespace] = dict.fromkeys(COUNTERS, 0)
+        return counters
 
 class CacheService:
-    def __init__(self):
-        self.cache = {}
-        self.ttl_map = {}
+    def __init__(self, budgets: Dict[str, int] = None, default_budget: int = 64 * MB,
+                 num_shards: int = 16, l2=None, l2_namespaces=('hist',)):
+        self.budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+        self.default_budget = default_budget
+        # Budgets are cache-wide; shards only split the locking
+        self.usage = ByteBudgets(self.budgets, default_budget)
+        self.shards = [CacheShard(self.usage) for _ in range(num_shards)]
+        # Optional SharedCache beneath the in-memory tier, used for the listed namespaces
+        self.l2 = l2
+        self.l2_namespaces = set(l2_namespaces)
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
 
     def get(self, key: str) -> Optional[Any]:
-        if key in self.cache:
-            # Check if expired
-            if key in self.ttl_map:
-                if time.time() > self.ttl_map[key]:
-                    # Expired, remove from cache
-                    del self.cache[key]
-                    del self.ttl_map[key]
-                    return None
-
-            return self.cache[key]
-        return None
+        namespace = self._namespace(key)
+        shard = self._shard(key)
+        with shard.lock:
+            value = shard.get(key, namespace)
+        if value is None and self._uses_l2(namespace):
+            value = self._get_l2(key, namespace, shard)
+        return value
 
     def set(self, key: str, value: Any, ttl: int = 300):
-        self.cache[key] = value
-        if ttl > 0:
-            self.ttl_map[key] = time.time() + ttl
+        namespace = self._namespace(key)
+        expiry = time.time() + ttl if ttl > 0 else None
+        size = self.estimate_size(value)
+        self._store(key, namespace, value, expiry, size)
+        if self._uses_l2(namespace):
+            self.l2.set(key, value, expiry)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def set_many(self, items: Dict[str, Any], ttl: int = 300):
+        expiry = time.time() + ttl if ttl > 0 else None
+        for key, value in items.items():
+            namespace = self._namespace(key)
+            size = self.estimate_size(value)
+            self._store(key, namespace, value, expiry, size)
+            if self._uses_l2(namespace):
+                self.l2.set(key, value, expiry)
 
     def delete(self, key: str):
-        if key in self.cache:
-            del self.cache[key]
-        if key in self.ttl_map:
-            del self.ttl_map[key]
+        shard = self._shard(key)
+        with shard.lock:
+            shard.remove(key, self._namespace(key))
+        if self._uses_l2(self._namespace(key)):
+            self.l2.delete(key)
 
     def clear(self):
-        self.cache.clear()
-        self.ttl_map.clear()
+        for shard in self.shards:
+            with shard.lock:
+                shard.clear()
+        if self.l2:
+            self.l2.clear()
 
     def exists(self, key: str) -> bool:
-        if key in self.cache:
-            # Check if expired
-            if key in self.ttl_map:
-                if time.time() > self.ttl_map[key]:
-                    # Expired
-                    del self.cache[key]
-                    del self.ttl_map[key]
-                    return False
-            return True
-        return False
+        return self.get(key) is not None
+
+    def get_or_compute(self, key: str, callback: Callable[[], Any], ttl: int = 300) -> Any:
+        """Return the cached value, or compute it once even if many threads miss together
+
+        Concurrent callers for the same key wait for the first caller's result
+        instead of running callback themselves. None results are not cached.
+        """
+        namespace = self._namespace(key)
+        shard = self._shard(key)
+
+        with shard.lock:
+            value = shard.get(key, namespace)
+            if value is not None:
+                return value
+
+            future = shard.pending.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = shard.pending[key] = Future()
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            # Another process may already have it
+            value = self._get_l2(key, namespace, shard) if self._uses_l2(namespace) else None
+            if value is not None:
+                with shard.lock:
+                    shard.pending.pop(key, None)
+                future.set_result(value)
+                return value
 
-    def get_or_set(self, key: str, callback, ttl: int = 300) -> Any:
-        value = self.get(key)
-        if value is None:
             value = callback()
-            self.set(key, value, ttl)
+        except BaseException as e:
+            with shard.lock:
+                shard.pending.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        expiry = time.time() + ttl if ttl > 0 else None
+        size = self.estimate_size(value) if value is not None else 0
+        excess = 0
+        with shard.lock:
+            if value is not None:
+                excess = shard.store(key, namespace, value, expiry, size)
+            shard.pending.pop(key, None)
+        future.set_result(value)
+        if excess > 0:
+            self._make_room(namespace, shard)
+
+        if value is not None and self._uses_l2(namespace):
+            self.l2.set(key, value, expiry)
         return value
 
-    def cleanup_expired(self):
+    def get_or_set(self, key: str, callback, ttl: int = 300) -> Any:
+        return self.get_or_compute(key, callback, ttl)
+
+    def cleanup_expired(self, budget: int = None) -> int:
+        """Remove expired entries, examining at most budget deadlines per shard"""
         current_time = time.time()
-        expired_keys = [
-            key for key, expiry in self.ttl_map.items()
-            if current_time > expiry
-        ]
+        expired = 0
+        for shard in self.shards:
+            with shard.lock:
+                expired += shard.expire(current_time, budget if budget is not None else len(shard.expiry_heap))
+        return expired
+
+    def start_sweeper(self, interval: float = 1.0, budget: int = 1000):
+        """Expire entries in the background instead of waiting for them to be read
+
+        Each pass holds a shard's lock for at most budget heap pops, so request
+        threads are never stalled behind a large sweep.
+        """
+        if self._sweeper and self._sweeper.is_alive():
+            return
+
+        self._stop_sweeper.clear()
+
+        def sweep():
+            l2_cleanup_at = time.time()
+            while not self._stop_sweeper.wait(interval):
+                try:
+                    self.cleanup_expired(budget)
+
+                    # The shared tier is pruned far less often; it needs a table scan
+                    if self.l2 and time.time() >= l2_cleanup_at:
+                        self.l2.cleanup()
+                        l2_cleanup_at = time.time() + L2_CLEANUP_INTERVAL
+                except Exception as e:
+                    logger.error(f"Cache sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=sweep, name='cache-sweeper', daemon=True)
+        self._sweeper.start()
 
-        for key in expired_keys:
-            self.delete(key)
+    def stop_sweeper(self):
+        self._stop_sweeper.set()
+        if self._sweeper:
+            self._sweeper.join()
+            self._sweeper = None
 
     def get_stats(self) -> dict:
-        return {
-            'total_keys': len(self.cache),
-            'expired_keys': len([k for k, v in self.ttl_map.items() if time.time() > v]),
-            'cache_size_bytes': sum(len(pickle.dumps(v)) for v in self.cache.values())
-        }
+        """Totals and per-namespace counters; cost depends on shards and namespaces, not entries"""
+        namespaces = {}
+
+        for shard in self.shards:
+            with shard.lock:
+                for namespace, counters in shard.counters.items():
+                    stats = namespaces.get(namespace)
+                    if stats is None:
+                        stats = namespaces[namespace] = dict.fromkeys(COUNTERS, 0)
+                        stats.update(keys=0, size_bytes=0,
+                                     budget_bytes=self.budgets.get(namespace, self.default_budget))
+                    for name in COUNTERS:
+                        stats[name] += counters[name]
+                    stats['keys'] += len(shard.namespaces.get(namespace, ()))
+                    stats['size_bytes'] += shard.sizes.get(namespace, 0)
+
+        for stats in namespaces.values():
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = (stats['hits'] / lookups * 100) if lookups else 0
+
+        totals = {name: sum(s[name] for s in namespaces.values()) for name in COUNTERS}
+        lookups = totals['hits'] + totals['misses']
+        hit_rate = (totals['hits'] / lookups * 100) if lookups else 0
+
+        # Top-level counters are the in-memory tier's; an L1 miss served by L2 counts as an L2 hit
+        tiers = {'l1': {'hits': totals['hits'], 'misses': totals['misses'], 'hit_rate': hit_rate}}
+        if self.l2:
+            tiers['l2'] = self.l2.get_stats()
+
+        return dict(
+            totals,
+            total_keys=sum(s['keys'] for s in namespaces.values()),
+            cache_size_bytes=sum(s['size_bytes'] for s in namespaces.values()),
+            hit_rate=hit_rate,
+            namespaces=namespaces,
+            tiers=tiers
+        )
+
+    def _uses_l2(self, namespace: str) -> bool:
+        return self.l2 is not None and namespace in self.l2_namespaces
+
+    def _get_l2(self, key: str, namespace: str, shard: CacheShard) -> Optional[Any]:
+        found = self.l2.get(key)
+        if found is None:
+            return None
+
+        # Promote into this process's in-memory tier with the remaining TTL
+        value, expiry = found
+        self._store(key, namespace, value, expiry, self.estimate_size(value), shard)
+        return value
+
+    def _store(self, key: str, namespace: str, value: Any, expiry: Optional[float], size: int,
+               shard: CacheShard = None):
+        shard = shard or self._shard(key)
+        with shard.lock:
+            excess = shard.store(key, namespace, value, expiry, size)
+        if excess > 0:
+            self._make_room(namespace, shard)
+
+    def _make_room(self, namespace: str, full: CacheShard):
+        """Evict from the other shards when the storing one had too little of the namespace to free
+
+        One shard lock is held at a time, starting after the storing shard so
+        no shard is always picked first.
+        """
+        start = self.shards.index(full)
+        for i in range(1, len(self.shards)):
+            shard = self.shards[(start + i) % len(self.shards)]
+            with shard.lock:
+                if shard.evict(namespace) <= 0:
+                    return
+
+    def _shard(self, key: str) -> CacheShard:
+        return self.shards[hash(key) % len(self.shards)]
+
+    @staticmethod
+    def _namespace(key: str) -> str:
+        return key.split('_', 1)[0] if '_' in key else 'default'
+
+    @classmethod
+    def estimate_size(cls, value: Any) -> int:
+        """Cheap byte estimate; DataFrames are measured by their buffers, not serialized"""
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=False).sum())
+        if hasattr(value, 'nbytes'):
+            return int(value.nbytes)
+        if isinstance(value, dict):
+            return sys.getsizeof(value) + sum(
+                sys.getsizeof(k) + cls.estimate_size(v) for k, v in value.items()
+            )
+        if isinstance(value, (list, tuple)):
+            return sys.getsizeof(value) + sum(cls.estimate_size(v) for v in value)
+        return sys.getsizeof(value)
 
     @staticmethod
     def generate_key(*args) -> str:
         key_str = '_'.join(str(arg) for arg in args)
-        return hashlib.md5(key_str.encode()).hexdigest()
\ No newline at end of file
+        return hashlib.md5(key_str.encode()).hexdigest()
@@ -0,0 +1,135 @@
+from typing import Dict, List, Any
+from models import ScanSchedule, Scanner, Watchlist
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CacheWarmer:
+    """Prefetches the history upcoming scheduled scans will ask for"""
+
+    # Intervals whose bars don't change during the warm-up window
+    LONG_INTERVALS = ('D', 'W', 'M')
+
+    def __init__(self, data_service, app=None, max_workers: int = 4):
+        self.data_service = data_service
+        # Needed for database access when run from the scheduler thread
+        self.app = app
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self.status = self._empty_status('idle')
+
+    def plan(self, window_minutes: int = 45) -> List[Dict[str, Any]]:
+        """Union of (symbol, exchange, interval) needed by schedules due within the window,
+        each with the widest lookback any of them asks for"""
+        horizon = datetime.utcnow() + timedelta(minutes=window_minutes)
+        targets = {}
+
+        for schedule in ScanSchedule.get_active_schedules():
+            # Interval schedules fire throughout the session
+            if schedule.schedule_type != 'interval' and schedule.next_run and schedule.next_run > horizon:
+                continue
+
+            scanner = Scanner.get_by_id(schedule.scanner_id)
+            watchlist = Watchlist.get_by_id(schedule.watchlist_id)
+            if not scanner or not watchlist:
+                continue
+
+            params = {}
+            for key, value in scanner.get_parameters().items():
+                params[key] = value['default'] if isinstance(value, dict) and 'default' in value else value
+            interval = params.get('interval', 'D')
+            lookback_days = params.get('lookback_days', 100)
+
+            for item in watchlist.get_symbols():
+                key = (item['symbol'], item['exchange'], interval)
+                targets[key] = max(targets.get(key, 0), lookback_days)
+
+        return [
+            {'symbol': symbol, 'exchange': exchange, 'interval': interval, 'lookback_days': lookback}
+            for (symbol, exchange, interval), lookback in targets.items()
+        ]
+
+    def run(self, window_minutes: int = 45) -> Dict[str, Any]:
+        if self.app is not None:
+            with self.app.app_context():
+                return self._run(window_minutes)
+        return self._run(window_minutes)
+
+    def _run(self, window_minutes: int) -> Dict[str, Any]:
+        with self._lock:
+            if self.status['state'] == 'running':
+                return dict(self.status)
+            self.status = self._empty_status('running')
+
+        try:
+            targets = self.plan(window_minutes)
+            # Symbol lookups during the scans then hit a loaded master
+            self.data_service.symbol_master.preload({t['exchange'] for t in targets})
+            pending = [t for t in targets if not self.data_service.has_cached_history(**t)]
+
+            with self._lock:
+                self.status['total'] = len(targets)
+                self.status['already_cached'] = len(targets) - len(pending)
+
+            # Keep warmed daily and longer bars alive until the window's scans have fired.
+            # Intraday bars keep the normal TTL, so scans at the open revalidate them
+            fetches = [
+                dict(target, ttl=window_minutes * 60) if target['interval'] in self.LONG_INTERVALS else target
+                for target in pending
+            ]
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for ok in executor.map(self._prefetch, fetches):
+                    with self._lock:
+                        self.status['fetched' if ok else 'failed'] += 1
+
+            covered = sum(1 for t in targets if self.data_service.has_cached_history(**t))
+            with self._lock:
+                self.status['state'] = 'completed'
+                self.status['coverage'] = (covered / len(targets) * 100) if targets else 100.0
+                self.status['finished_at'] = datetime.utcnow().isoformat()
+
+            logger.info(f"Cache warm-up done: {covered}/{len(targets)} series cached")
+
+        except Exception as e:
+            logger.error(f"Cache warm-up failed: {e}")
+            with self._lock:
+                self.status['state'] = 'failed'
+                self.status['error'] = str(e)
+                self.status['finished_at'] = datetime.utcnow().isoformat()
+
+        return self.get_status()
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            status = dict(self.status)
+        done = status['already_cached'] + status['fetched'] + status['failed']
+        status['progress'] = int(done / status['total'] * 100) if status['total'] else 0
+        return status
+
+    def _prefetch(self, target: Dict[str, Any]) -> bool:
+        try:
+            self.data_service.get_historical_data(**target)
+            return self.data_service.has_cached_history(
+                target['symbol'], target['exchange'], target['interval'], target['lookback_days']
+            )
+        except Exception as e:
+            logger.error(f"Warm-up fetch failed for {target['symbol']}: {e}")
+            return False
+
+    @staticmethod
+    def _empty_status(state: str) -> Dict[str, Any]:
+        return {
+            'state': state,
+            'total': 0,
+            'already_cached': 0,
+            'fetched': 0,
+            'failed': 0,
+            'coverage': None,
+            'error': None,
+            'started_at': datetime.utcnow().isoformat() if state == 'running' else None,
+            'finished_at': None
+        }
@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+# Most recently expanded frames, so repeated reads of a hot series skip the rebuild.
+# Bounded by the bytes of their full-width copies, which DataService takes off the
+# hist cache budget, so cache plus copies stay within CACHE_HISTORY_MAX_MB
+EXPANDED_MAX_BYTES = 32 * 1024 * 1024
+_expanded: OrderedDict = OrderedDict()
+_expanded_bytes = 0
+_expanded_lock = threading.Lock()
+
+
+class CompactFrame:
+    """Memory-lean copy of an OHLCV frame, rebuilt as a DataFrame on demand
+
+    Prices are held as float32, volume as the smallest unsigned integer type
+    that fits and a DatetimeIndex as int64 epoch nanoseconds. Other columns are
+    kept as they are. A float64 OHLC frame with int64 volume shrinks by about
+    42%: 2.8 MB instead of 4.8 MB for 100,000 rows.
+    """
+
+    __slots__ = ('columns', 'arrays', 'dtypes', 'index', 'index_tz', 'index_name')
+
+    def __init__(self, df: pd.DataFrame):
+        self.columns = list(df.columns)
+        self.arrays: Dict[str, np.ndarray] = {}
+        # Original dtypes of packed columns, restored in to_frame()
+        self.dtypes: Dict[str, np.dtype] = {}
+
+        for column in self.columns:
+            values = df[column].to_numpy()
+            if column in PRICE_COLUMNS and values.dtype.kind == 'f':
+                packed = values.astype(np.float32)
+            elif column == 'volume':
+                packed = self._pack_volume(values)
+            else:
+                packed = values
+
+            if packed is values:
+                # Don't let a view keep the source frame's block alive
+                packed = values.copy()
+            elif packed.dtype != values.dtype:
+                self.dtypes[column] = values.dtype
+            self.arrays[column] = packed
+
+        self.index_name = df.index.name
+        if isinstance(df.index, pd.DatetimeIndex):
+            self.index = df.index.as_unit('ns').asi8.copy()
+            self.index_tz = df.index.tz
+        else:
+            self.index = df.index
+            self.index_tz = None
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def nbytes(self) -> int:
+        index_bytes = self.index.nbytes if isinstance(self.index, np.ndarray) else self.index.memory_usage()
+        return index_bytes + sum(values.nbytes for values in self.arrays.values())
+
+    def to_frame(self) -> pd.DataFrame:
+        """The full-precision frame; shared by recent callers, so read-only like any cached frame"""
+        global _expanded_bytes
+        # Entries hold self, so its id can't be reused while it is a key
+        key = id(self)
+        with _expanded_lock:
+            found = _expanded.get(key)
+            if found is not None:
+                _expanded.move_to_end(key)
+                return found[1]
+
+        frame = self._expand()
+        size = int(frame.memory_usage(index=True).sum())
+        if size > EXPANDED_MAX_BYTES:
+            return frame
+        with _expanded_lock:
+            if key not in _expanded:
+                _expanded[key] = (self, frame, size)
+                _expanded_bytes += size
+            while _expanded_bytes > EXPANDED_MAX_BYTES:
+                _expanded_bytes -= _expanded.popitem(last=False)[1][2]
+        return frame
+
+    def _expand(self) -> pd.DataFrame:
+        if isinstance(self.index, np.ndarray):
+            index = pd.DatetimeIndex(self.index.view('datetime64[ns]'), name=self.index_name)
+            if self.index_tz is not None:
+                index = index.tz_localize('UTC').tz_convert(self.index_tz)
+        else:
+            index = self.index
+
+        data = {}
+        for column in self.columns:
+            values = self.arrays[column]
+            if column in self.dtypes:
+                values = values.astype(self.dtypes[column])
+            data[column] = values
+
+        return pd.DataFrame(data, index=index, columns=self.columns)
+
+    @staticmethod
+    def _pack_volume(values: np.ndarray) -> np.ndarray:
+        if values.dtype.kind not in 'iuf' or len(values) == 0:
+            return values
+        if values.dtype.kind == 'f' and not (np.isfinite(values).all() and (values == np.round(values)).all()):
+            return values
+        if values.min() < 0:
+            return values
+        if values.max() < np.iinfo(np.uint32).max:
+            return values.astype(np.uint32)
+        return values.astype(np.uint64)
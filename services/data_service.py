@@ -1,23 +1,63 @@
 import pandas as pd
 import numpy as np
 from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 from openalgo import api as openalgo_api
 import httpx
 import logging
-from .cache_service import CacheService
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .cache_service import CacheService, DEFAULT_BUDGETS
+from .compact_frame import CompactFrame, EXPANDED_MAX_BYTES
+from .symbol_master import SymbolMaster
 
 # Configure logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 class DataService:
-    def __init__(self, api_key: str, host: str):
+    # Symbols per multiquotes request
+    MULTIQUOTE_BATCH_SIZE = 100
+
+    # Seconds a history entry may be served past its TTL while it refreshes in the background
+    MAX_STALENESS = {
+        '1m': 30,
+        '3m': 60,
+        '5m': 120,
+        '10m': 180,
+        '15m': 300,
+        '30m': 600,
+        '1h': 900,
+        'D': 3600,
+        'W': 6 * 3600,
+        'M': 24 * 3600
+    }
+
+    def __init__(self, api_key: str, host: str, max_quote_workers: int = 10,
+                 compact_cache: bool = False, cache_budgets: Dict[str, int] = None,
+                 shared_cache=None):
         self.api_key = api_key
         self.host = host
+        self.max_quote_workers = max_quote_workers
+        # Hold cached history as CompactFrame (float32 prices, packed volume)
+        self.compact_cache = compact_cache
         self.client = None
-        self.cache = CacheService()
+        budgets = dict(cache_budgets or {})
+        if compact_cache:
+            # Recently expanded frames are held outside the cache; reserve their bytes from its budget
+            hist = budgets.get('hist', DEFAULT_BUDGETS['hist'])
+            budgets['hist'] = hist - min(EXPANDED_MAX_BYTES, hist // 2)
+        # In-memory tier per process, backed by the host-wide shared tier when one is given
+        self.cache = CacheService(budgets=budgets, l2=shared_cache)
         self.http_client = httpx.Client(timeout=30.0)
+        self.symbol_master = SymbolMaster(self._load_instruments)
+        # Background revalidation of stale history entries
+        self._refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='history-refresh')
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        # Serialize read-merge-write of a history entry between extensions and refreshes
+        self._entry_locks = [threading.Lock() for _ in range(16)]
         self._initialize_client()
 
     def _initialize_client(self):
@@ -33,19 +73,124 @@ class DataService:
             self.error_shown = False
 
     def get_historical_data(self, symbol: str, exchange: str = 'NSE',
-                           interval: str = 'D', lookback_days: int = 100) -> Optional[pd.DataFrame]:
-        cache_key = f"hist_{symbol}_{exchange}_{interval}_{lookback_days}"
+                           interval: str = 'D', lookback_days: int = 100,
+                           ttl: int = 300) -> Optional[pd.DataFrame]:
+        # One entry per (symbol, exchange, interval) holding the widest window fetched so far
+        cache_key = f"hist_{symbol}_{exchange}_{interval}"
+
+        # Calculate date range
+        end_date = datetime.now()
+        start_date = (end_date - timedelta(days=lookback_days)).date()
+
+        # Entries stay in the cache past their TTL for up to the interval's staleness limit
+        max_stale = self.MAX_STALENESS.get(interval, 0)
+
+        # Check cache first; concurrent misses for the same series share one fetch
+        cached = self.cache.get_or_compute(
+            cache_key,
+            lambda: self._history_entry(symbol, exchange, interval, start_date, end_date.date(), ttl),
+            ttl=ttl + max_stale  # 5 minutes cache by default
+        )
+
+        if cached is None:
+            # Return dummy data for testing if API fails
+            # Only show message if not already shown API error
+            if not getattr(self, 'error_shown', False):
+                print(f"Using dummy data for {symbol} ({interval})")
+            return self._get_dummy_data(lookback_days)
+
+        if time.time() - cached['fetched_at'] > cached['ttl']:
+            # Serve the stale frame now and refresh it in the background
+            self._revalidate(cache_key, symbol, exchange, interval, cached)
+
+        if cached['start_date'] <= start_date:
+            return self._slice_window(self._unpack(cached['data']), start_date)
+
+        # Only fetch the older range the cached window doesn't cover yet
+        older = self._fetch_history(symbol, exchange, interval,
+                                    start_date, cached['start_date'] - timedelta(days=1))
+        data = self._unpack(cached['data'])
+        if older is None:
+            return data
+
+        data = self._prepend(older, data)
+
+        with self._entry_lock(cache_key):
+            # A refresh or another extension may have replaced the entry since it was read
+            current = self.cache.get(cache_key) or cached
+            if current['start_date'] > start_date:
+                if current is not cached:
+                    data = self._prepend(older, self._unpack(current['data']))
+                # Keep the entry's expiry so the recent end of the window still refreshes on time
+                remaining = current['fetched_at'] + current['ttl'] + max_stale - time.time()
+                if remaining > 0:
+                    self.cache.set(cache_key, dict(current, data=self._pack(data), start_date=start_date),
+                                   ttl=int(remaining) or 1)
+        return self._slice_window(data, start_date)
+
+    def _history_entry(self, symbol: str, exchange: str, interval: str,
+                       start_date: date, end_date: date, ttl: int) -> Optional[Dict[str, Any]]:
+        data = self._fetch_history(symbol, exchange, interval, start_date, end_date)
+        if data is None:
+            return None
 
-        # Check cache first
-        cached_data = self.cache.get(cache_key)
-        if cached_data is not None:
-            return cached_data
+        return {
+            'data': self._pack(data),
+            'start_date': start_date,
+            'fetched_at': time.time(),
+            'ttl': ttl
+        }
 
-        try:
-            # Calculate date range
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=lookback_days)
+    def _revalidate(self, cache_key: str, symbol: str, exchange: str, interval: str,
+                    cached: Dict[str, Any]):
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+
+        def refresh():
+            try:
+                entry = self._history_entry(symbol, exchange, interval, cached['start_date'],
+                                            datetime.now().date(), cached['ttl'])
+                if entry is None:
+                    return
+                with self._entry_lock(cache_key):
+                    # Keep older rows a wider request added while this refresh was fetching
+                    current = self.cache.get(cache_key)
+                    if current is not None and current['start_date'] < entry['start_date']:
+                        data = self._prepend(self._unpack(current['data']), self._unpack(entry['data']))
+                        entry.update(data=self._pack(data), start_date=current['start_date'])
+                    self.cache.set(cache_key, entry, ttl=entry['ttl'] + self.MAX_STALENESS.get(interval, 0))
+            except Exception as e:
+                logger.error(f"Background refresh failed for {symbol}: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
 
+        try:
+            self._refresh_executor.submit(refresh)
+        except RuntimeError:
+            # Executor already shut down
+            with self._refresh_lock:
+                self._refreshing.discard(cache_key)
+
+    def _entry_lock(self, cache_key: str) -> threading.Lock:
+        return self._entry_locks[hash(cache_key) % len(self._entry_locks)]
+
+    @staticmethod
+    def _prepend(older: pd.DataFrame, data: pd.DataFrame) -> pd.DataFrame:
+        """older's rows from before data's first row, followed by data"""
+        return pd.concat([older[older.index < data.index[0]], data])
+
+    def has_cached_history(self, symbol: str, exchange: str = 'NSE',
+                           interval: str = 'D', lookback_days: int = 100) -> bool:
+        cached = self.cache.get(f"hist_{symbol}_{exchange}_{interval}")
+        start_date = (datetime.now() - timedelta(days=lookback_days)).date()
+        return cached is not None and cached['start_date'] <= start_date
+
+    def _fetch_history(self, symbol: str, exchange: str, interval: str,
+                       start_date: date, end_date: date) -> Optional[pd.DataFrame]:
+        try:
             # Fetch data from OpenAlgo
             if self.client and self.api_valid != False:
                 response = self.client.history(
@@ -88,7 +233,7 @@ class DataService:
                     # Log data info (head only)
                     logger.info(f"\n{'='*60}")
                     logger.info(f"Historical Data Downloaded: {symbol} ({exchange})")
-                    logger.info(f"Interval: {interval}, Lookback: {lookback_days} days")
+                    logger.info(f"Interval: {interval}, Range: {start_date} to {end_date}")
                     logger.info(f"Shape: {response.shape[0]} rows x {response.shape[1]} columns")
                     logger.info(f"Columns: {list(response.columns)}")
                     logger.info(f"Date range: {response.index[0]} to {response.index[-1]}")
@@ -96,19 +241,28 @@ class DataService:
                     logger.info(f"\n{response.head().to_string()}")
                     logger.info(f"{'='*60}\n")
 
-                    # Cache the data
-                    self.cache.set(cache_key, response, ttl=300)  # 5 minutes cache
-
                     return response
 
         except Exception as e:
             logger.error(f"Error fetching historical data for {symbol}: {e}")
 
-        # Return dummy data for testing if API fails
-        # Only show message if not already shown API error
-        if not getattr(self, 'error_shown', False):
-            print(f"Using dummy data for {symbol} ({interval})")
-        return self._get_dummy_data(lookback_days)
+        return None
+
+    def _pack(self, data: pd.DataFrame):
+        return CompactFrame(data) if self.compact_cache else data
+
+    def _unpack(self, data) -> pd.DataFrame:
+        return data.to_frame() if isinstance(data, CompactFrame) else data
+
+    def _slice_window(self, data: pd.DataFrame, start_date: date) -> pd.DataFrame:
+        """Trailing rows from start_date on; a positional slice, so no data is copied"""
+        if not isinstance(data.index, pd.DatetimeIndex):
+            return data
+
+        start = pd.Timestamp(start_date)
+        if data.index.tz is not None:
+            start = start.tz_localize(data.index.tz)
+        return data.iloc[data.index.searchsorted(start):]
 
     def get_quote(self, symbol: str, exchange: str = 'NSE') -> Optional[Dict[str, Any]]:
         cache_key = f"quote_{symbol}_{exchange}"
@@ -134,6 +288,74 @@ class DataService:
         # Return dummy quote for testing
         return self._get_dummy_quote(symbol)
 
+    def get_quotes(self, symbols: List[Dict[str, str]]) -> Dict[tuple, Dict[str, Any]]:
+        """Quotes for many {'symbol', 'exchange'} pairs, keyed by (symbol, exchange)"""
+        quotes = {}
+        keys = {(s['symbol'], s['exchange']): f"quote_{s['symbol']}_{s['exchange']}" for s in symbols}
+
+        # Serve what's still fresh straight from the cache
+        cached = self.cache.get_many(list(keys.values()))
+        missing = []
+        for pair, cache_key in keys.items():
+            if cached.get(cache_key):
+                quotes[pair] = cached[cache_key]
+            else:
+                missing.append(pair)
+
+        if missing and self.client:
+            if hasattr(self.client, 'multiquotes'):
+                fetched = self._fetch_multiquotes(missing)
+            else:
+                fetched = self._fetch_quotes_concurrently(missing)
+
+            # Cache for 10 seconds
+            self.cache.set_many({keys[pair]: quote for pair, quote in fetched.items()}, ttl=10)
+            quotes.update(fetched)
+
+        # Return dummy quotes for testing
+        for pair in missing:
+            if pair not in quotes:
+                quotes[pair] = self._get_dummy_quote(pair[0])
+
+        return quotes
+
+    def _fetch_multiquotes(self, pairs: List[tuple]) -> Dict[tuple, Dict[str, Any]]:
+        quotes = {}
+        for i in range(0, len(pairs), self.MULTIQUOTE_BATCH_SIZE):
+            batch = pairs[i:i + self.MULTIQUOTE_BATCH_SIZE]
+            try:
+                response = self.client.multiquotes(
+                    symbols=[{'symbol': symbol, 'exchange': exchange} for symbol, exchange in batch]
+                )
+
+                if response and response.get('status') == 'success':
+                    for item in response.get('results', []):
+                        if item.get('data'):
+                            quotes[(item.get('symbol'), item.get('exchange'))] = item['data']
+
+            except Exception as e:
+                print(f"Error fetching quotes for {len(batch)} symbols: {e}")
+
+        return quotes
+
+    def _fetch_quotes_concurrently(self, pairs: List[tuple]) -> Dict[tuple, Dict[str, Any]]:
+        def fetch(pair):
+            try:
+                response = self.client.quotes(symbol=pair[0], exchange=pair[1])
+                if response and response.get('status') == 'success':
+                    return response.get('data', {})
+            except Exception as e:
+                print(f"Error fetching quote for {pair[0]}: {e}")
+            return None
+
+        quotes = {}
+        with ThreadPoolExecutor(max_workers=self.max_quote_workers) as executor:
+            for pair, quote in zip(pairs, executor.map(fetch, pairs)):
+                if quote:
+                    quotes[pair] = quote
+
+        return quotes
+
     def get_depth(self, symbol: str, exchange: str = 'NSE') -> Optional[Dict[str, Any]]:
         try:
             if self.client:
@@ -148,6 +370,11 @@ class DataService:
         return None
 
     def search_symbols(self, query: str, exchange: str = 'NSE') -> List[Dict[str, Any]]:
+        # Local lookup against the instrument master when it's available
+        results = self.symbol_master.search(query, exchange)
+        if results is not None:
+            return results
+
         try:
             if self.client:
                 response = self.client.search(query=query, exchange=exchange)
@@ -161,6 +388,10 @@ class DataService:
         return []
 
     def validate_symbol(self, symbol: str, exchange: str = 'NSE') -> bool:
+        is_listed = self.symbol_master.contains(symbol, exchange)
+        if is_listed is not None:
+            return is_listed
+
         try:
             if self.client:
                 response = self.client.symbol(symbol=symbol, exchange=exchange)
@@ -175,6 +406,33 @@ class DataService:
         test_symbols = ['RELIANCE', 'TCS', 'INFY', 'HDFC', 'ICICIBANK', 'SBIN', 'ITC', 'HDFCBANK']
         return symbol in test_symbols
 
+    def validate_symbols(self, symbols: List[str], exchange: str = 'NSE') -> List[str]:
+        return [symbol for symbol in symbols if self.validate_symbol(symbol, exchange)]
+
+    def _load_instruments(self, exchange: str) -> Optional[List[Dict[str, Any]]]:
+        """Download the instrument master for one exchange
+
+        Needs a client with instruments(); openalgo 1.0.31 has none, so there
+        the master stays empty and lookups use the search and symbol APIs.
+        """
+        if not (self.client and hasattr(self.client, 'instruments')):
+            return None
+
+        try:
+            response = self.client.instruments(exchange=exchange)
+
+            if isinstance(response, pd.DataFrame):
+                return response.to_dict(orient='records')
+            if isinstance(response, list):
+                return response
+            if response and response.get('status') == 'success':
+                return response.get('data', [])
+
+        except Exception as e:
+            logger.error(f"Error downloading instrument master for {exchange}: {e}")
+
+        return None
+
     def get_index_constituents(self, index_name: str) -> List[str]:
         # Predefined index constituents for testing
         indices = {
@@ -271,5 +529,7 @@ class DataService:
         }
 
     def close(self):
+        self.cache.stop_sweeper()
+        self._refresh_executor.shutdown(wait=False)
         if self.http_client:
             self.http_client.close()
\ No newline at end of file
@@ -1,12 +1,76 @@
 import csv
 import json
 import io
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
+from itertools import chain, islice
 from models import ScanResult
 from datetime import datetime
-import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+
+# Metrics with a fixed column in Excel exports, after the result fields
+EXCEL_METRICS = ['price', 'volume', 'rsi', 'macd', 'signal_strength']
+EXCEL_HEADERS = ['Timestamp', 'Symbol', 'Exchange', 'Signal', 'Scanner',
+                 'Price', 'Volume', 'RSI', 'MACD', 'Signal_Strength']
+
+# Result fields of Parquet and Arrow exports; metric_<name> columns follow them
+ARROW_FIELDS = [
+    ('id', pa.int64()), ('scan_history_id', pa.int64()), ('scanner_id', pa.int64()), ('scanner', pa.string()),
+    ('symbol', pa.string()), ('exchange', pa.string()), ('signal', pa.string()), ('timestamp', pa.timestamp('us'))
+]
+METRIC_PREFIX = 'metric_'
 
 class ExportService:
+    # Rows serialized per chunk of a streamed export
+    STREAM_CHUNK_ROWS = 500
+    # Rows read ahead to choose Excel columns and widths
+    EXCEL_SAMPLE_ROWS = 1000
+    # Rows per record batch (and Parquet row group) of an Arrow export
+    ARROW_BATCH_ROWS = 10000
+    # Formats written whole to a file before sending: format -> (mimetype, extension)
+    FILE_FORMATS = {
+        'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+        'parquet': ('application/vnd.apache.parquet', 'parquet'),
+        'arrow': ('application/vnd.apache.arrow.file', 'arrow')
+    }
+
+    @classmethod
+    def export_to_file(cls, format: str, results: Iterable, output, metric_names: Iterable[str] = ()) -> None:
+        """Write results in one of FILE_FORMATS to output, a path or binary file"""
+        if format == 'xlsx':
+            cls.export_to_excel(results, output, metric_names)
+        else:
+            cls.export_to_arrow(results, output, format)
+
+    @classmethod
+    def stream_csv(cls, headers: List[str], rows: Iterable, to_row: Callable[[Any], List[Any]]) -> Iterator[str]:
+        """CSV text in chunks of STREAM_CHUNK_ROWS rows, for a streamed response"""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(headers)
+
+        for count, row in enumerate(rows, 1):
+            writer.writerow(to_row(row))
+            if count % cls.STREAM_CHUNK_ROWS == 0:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+
+        yield output.getvalue()
+
+    @classmethod
+    def stream_json(cls, rows: Iterable, to_item: Callable[[Any], Any], dumps: Callable[[Any], str] = json.dumps) -> Iterator[str]:
+        """A JSON array in chunks of STREAM_CHUNK_ROWS items, for a streamed response"""
+        chunk = ['[']
+        for count, row in enumerate(rows):
+            chunk.append((',' if count else '') + dumps(to_item(row)))
+            if len(chunk) > cls.STREAM_CHUNK_ROWS:
+                yield ''.join(chunk)
+                chunk = []
+        chunk.append(']')
+        yield ''.join(chunk)
+
     @staticmethod
     def export_to_csv(results: List[ScanResult]) -> str:
         output = io.StringIO()
@@ -57,47 +121,175 @@ class ExportService:
 
         return json.dumps(data, indent=2)
 
-    @staticmethod
-    def export_to_excel(results: List[ScanResult]) -> bytes:
-        # Create DataFrame
-        data = []
-        for result in results:
-            metrics = result.get_metrics()
-            row = {
-                'Timestamp': result.timestamp,
-                'Symbol': result.symbol,
-                'Exchange': result.exchange or 'NSE',
-                'Signal': result.signal,
-                'Scanner': result.scanner.name if result.scanner else '',
-                'Price': metrics.get('price', ''),
-                'Volume': metrics.get('volume', ''),
-                'RSI': metrics.get('rsi', ''),
-                'MACD': metrics.get('macd', ''),
-                'Signal_Strength': metrics.get('signal_strength', '')
-            }
+    @classmethod
+    def export_to_excel(cls, results: Iterable, output=None, metric_names: Iterable[str] = ()) -> Optional[bytes]:
+        """Write results to an xlsx workbook a row at a time
 
-            # Add other metrics as columns
-            for key, value in metrics.items():
-                if key not in ['price', 'volume', 'rsi', 'macd', 'signal_strength']:
-                    row[key] = value
+        results may be ScanResult objects or the rows of ScanResult.iter_rows().
+        Rows go straight to disk in constant-memory mode, so only the first
+        EXCEL_SAMPLE_ROWS are held: they estimate column widths and find the
+        metric columns, along with metric_names (ScanResult.metric_names() of
+        the same rows). Metrics in neither, which can only be non-numeric ones
+        first seen after the sample, go to Other_Metrics.
+        Writes to output (a path or binary file) if given, else returns bytes.
+        """
+        results = iter(results)
+        sample = list(islice(results, cls.EXCEL_SAMPLE_ROWS))
 
-            data.append(row)
+        extra = {}
+        for result in sample:
+            for key in cls._metrics_of(result):
+                if key not in EXCEL_METRICS:
+                    extra.setdefault(key, None)
+        for key in metric_names:
+            if key not in EXCEL_METRICS:
+                extra.setdefault(key, None)
+        headers = EXCEL_HEADERS + list(extra) + ['Other_Metrics']
+        known = set(EXCEL_METRICS).union(extra)
 
-        df = pd.DataFrame(data)
+        def to_row(result):
+            metrics = cls._metrics_of(result)
+            other = {k: v for k, v in metrics.items() if k not in known}
+            return [
+                result.timestamp,
+                result.symbol,
+                result.exchange or 'NSE',
+                result.signal,
+                cls._scanner_of(result) or '',
+                *(metrics.get(key, '') for key in EXCEL_METRICS),
+                *(metrics.get(key, '') for key in extra),
+                json.dumps(other) if other else ''
+            ]
 
-        # Create Excel file in memory
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Scan Results', index=False)
+        buffer = io.BytesIO() if output is None else output
+        workbook = xlsxwriter.Workbook(buffer, {
+            'constant_memory': True,
+            'in_memory': False,
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+            'nan_inf_to_errors': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss'
+        })
+        try:
+            worksheet = workbook.add_worksheet('Scan Results')
 
-            # Auto-adjust column widths
-            worksheet = writer.sheets['Scan Results']
-            for column in df.columns:
-                column_length = max(df[column].astype(str).map(len).max(), len(column))
-                col_idx = df.columns.get_loc(column)
-                worksheet.column_dimensions[chr(65 + col_idx)].width = min(column_length + 2, 50)
+            # Widths must be set before any row is written in constant-memory mode
+            widths = [len(header) for header in headers]
+            sample_rows = [to_row(result) for result in sample]
+            for row in sample_rows:
+                for col, value in enumerate(row):
+                    widths[col] = max(widths[col], len(cls._excel_text(value)))
+            for col, width in enumerate(widths):
+                worksheet.set_column(col, col, min(width + 2, 50))
 
-        return output.getvalue()
+            worksheet.write_row(0, 0, headers)
+            row_idx = 0
+            for row_idx, row in enumerate(chain(sample_rows, map(to_row, results)), 1):
+                worksheet.write_row(row_idx, 0, [cls._excel_value(value) for value in row])
+            worksheet.freeze_panes(1, 0)
+            if row_idx:
+                worksheet.autofilter(0, 0, row_idx, len(headers) - 1)
+        finally:
+            workbook.close()
+
+        return buffer.getvalue() if output is None else None
+
+    @classmethod
+    def export_to_arrow(cls, results: Iterable, output, format: str = 'parquet') -> None:
+        """Write results as zstd-compressed Parquet or an Arrow IPC file, one record batch at a time
+
+        results may be ScanResult objects or the rows of ScanResult.iter_rows().
+        Metrics are flattened into typed metric_<name> columns: float64 for
+        numbers, bool for flags, otherwise string (JSON for lists and dicts).
+        The first batch fixes the schema; metrics first seen later, and values
+        that do not fit their column's type, go to metrics_other as JSON.
+        """
+        results = iter(results)
+        batch = list(islice(results, cls.ARROW_BATCH_ROWS))
+        parsed = [cls._metrics_of(result) for result in batch]
+
+        names = sorted({name for metrics in parsed for name in metrics})
+        metric_types = {name: _metric_type([metrics.get(name) for metrics in parsed]) for name in names}
+        schema = pa.schema(
+            ARROW_FIELDS
+            + [(METRIC_PREFIX + name, metric_type) for name, metric_type in metric_types.items()]
+            + [('metrics_other', pa.string())]
+        )
+
+        if format == 'parquet':
+            writer = pq.ParquetWriter(output, schema, compression='zstd')
+        elif format == 'arrow':
+            writer = pa.ipc.new_file(output, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+        else:
+            raise ValueError(f"Unknown format: {format}")
+
+        with writer:
+            while batch:
+                writer.write_batch(cls._record_batch(batch, parsed, metric_types, schema))
+                batch = list(islice(results, cls.ARROW_BATCH_ROWS))
+                parsed = [cls._metrics_of(result) for result in batch]
+
+    @classmethod
+    def _record_batch(cls, batch: List, parsed: List[Dict[str, Any]], metric_types: Dict[str, pa.DataType],
+                      schema: pa.Schema) -> pa.RecordBatch:
+        columns = [
+            [result.id for result in batch],
+            [result.scan_history_id for result in batch],
+            [result.scanner_id for result in batch],
+            [cls._scanner_of(result) for result in batch],
+            [result.symbol for result in batch],
+            [result.exchange for result in batch],
+            [result.signal for result in batch],
+            [result.timestamp for result in batch]
+        ]
+
+        others = [{name: value for name, value in metrics.items() if name not in metric_types} for metrics in parsed]
+        for name, metric_type in metric_types.items():
+            values = []
+            for metrics, other in zip(parsed, others):
+                value = metrics.get(name)
+                if _fits(value, metric_type):
+                    values.append(value)
+                else:
+                    values.append(None)
+                    other[name] = value
+            if pa.types.is_string(metric_type):
+                values = [value if value is None or isinstance(value, str) else json.dumps(value) for value in values]
+            columns.append(values)
+        columns.append([json.dumps(other) if other else None for other in others])
+
+        return pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        )
+
+    @staticmethod
+    def _metrics_of(result) -> Dict[str, Any]:
+        if hasattr(result, 'get_metrics'):
+            return result.get_metrics()
+        return json.loads(result.metrics) if result.metrics else {}
+
+    @staticmethod
+    def _scanner_of(result) -> Optional[str]:
+        # iter_rows() rows carry the name; ScanResult objects have the relationship
+        if hasattr(result, 'scanner_name'):
+            return result.scanner_name
+        return result.scanner.name if result.scanner else None
+
+    @staticmethod
+    def _excel_value(value):
+        # Lists and dicts from scanner metrics have no cell type of their own
+        if isinstance(value, (dict, list, tuple)):
+            return json.dumps(value)
+        return value
+
+    @staticmethod
+    def _excel_text(value) -> str:
+        if isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(value, float):
+            return f'{value:.6g}'
+        return str(ExportService._excel_value(value))
 
     @staticmethod
     def export_summary_report(results: List[ScanResult]) -> Dict[str, Any]:
@@ -230,4 +422,20 @@ class ExportService:
             timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             total_signals=len(results),
             rows=''.join(rows)
-        )
\ No newline at end of file
+        )
+
+def _metric_type(values: List[Any]) -> pa.DataType:
+    """Column type for one metric: float for numbers, bool for flags, otherwise string"""
+    present = [value for value in values if value is not None]
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return pa.float64()
+    if all(isinstance(value, bool) for value in present):
+        return pa.bool_()
+    return pa.string()
+
+def _fits(value: Any, column_type: pa.DataType) -> bool:
+    if value is None or pa.types.is_string(column_type):
+        return True
+    if pa.types.is_boolean(column_type):
+        return isinstance(value, bool)
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
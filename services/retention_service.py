@@ -0,0 +1,249 @@
+from typing import Dict, Any, Optional
+from models import db, ScanHistory, ScanResult
+from models.storage import writer
+from sqlalchemy import exists, func, select
+from datetime import datetime, timedelta
+import pandas as pd
+import threading
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = ('id', 'scan_history_id', 'scanner_id', 'symbol', 'exchange', 'signal', 'timestamp', 'metrics')
+RUN_ARCHIVE_COLUMNS = ('id', 'scanner_id', 'watchlist_id', 'status', 'symbols_scanned', 'signals_found',
+                       'execution_time_ms', 'error_message', 'started_at', 'completed_at', 'exported_at')
+
+class RetentionService:
+    """Archives and purges scan results and runs older than the retention window
+
+    Each batch is a contiguous id range of expired results. It is written to
+    zstd-compressed Parquet under archive_dir/scan_results/date=YYYY-MM-DD/
+    and then deleted in its own transaction. Files are named by id range, so a
+    batch that fails to delete is simply rewritten on the next run. Runs that
+    finished before the cutoff and have no results left go the same way, to
+    archive_dir/scan_history/, and come off the daily rollup.
+
+    With an analytics service, newly completed runs are exported first, and
+    results of completed runs not in the analytics archive yet are held back.
+    Only for export_grace_days past the cutoff, though: a run whose export
+    keeps failing is then purged like any other, so the table stays bounded.
+    Failed and cancelled runs are never exported and aren't waited for.
+    """
+
+    def __init__(self, app=None, retention_days: int = 30, archive_dir: Optional[str] = 'archive',
+                 batch_size: int = 5000, analytics_service=None, export_grace_days: int = 7):
+        # Needed for database access when run from the scheduler thread
+        self.app = app
+        self.retention_days = retention_days
+        # None or '' purges without archiving
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self.analytics_service = analytics_service
+        self.export_grace_days = export_grace_days
+        self._lock = threading.Lock()
+        self.status = self._empty_status('idle')
+
+    def run(self, retention_days: Optional[int] = None) -> Dict[str, Any]:
+        if self.app is not None:
+            with self.app.app_context():
+                return self._run(retention_days)
+        return self._run(retention_days)
+
+    def _run(self, retention_days: Optional[int]) -> Dict[str, Any]:
+        with self._lock:
+            if self.status['state'] == 'running':
+                return dict(self.status)
+            self.status = self._empty_status('running')
+
+        days = retention_days if retention_days is not None else self.retention_days
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        grace_cutoff = cutoff - timedelta(days=self.export_grace_days)
+        free_before = self._free_bytes()
+
+        try:
+            if self.analytics_service is not None:
+                self.analytics_service.export()
+
+            while self._purge_batch(cutoff, grace_cutoff):
+                pass
+            while self._purge_runs(cutoff, grace_cutoff):
+                pass
+
+            held = self._held_back(cutoff, grace_cutoff)
+            if held:
+                logger.warning(f"Retention kept {held} expired results of runs not exported to analytics yet")
+
+            free_after = self._free_bytes()
+            with self._lock:
+                self.status['state'] = 'completed'
+                self.status['rows_held'] = held
+                if free_before is not None and free_after is not None:
+                    self.status['bytes_reclaimed'] = max(free_after - free_before, 0)
+                self.status['finished_at'] = datetime.utcnow().isoformat()
+
+            logger.info(f"Retention purged {self.status['rows_deleted']} results and {self.status['runs_deleted']} runs "
+                        f"older than {days} days, {self.status['archive_files']} archive files written")
+
+        except Exception as e:
+            logger.error(f"Retention run failed: {e}")
+            with self._lock:
+                self.status['state'] = 'failed'
+                self.status['error'] = str(e)
+                self.status['finished_at'] = datetime.utcnow().isoformat()
+
+        return self.get_status()
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.status)
+
+    def _awaiting_export(self):
+        """Ids of completed runs the analytics service hasn't exported yet"""
+        history = ScanHistory.__table__
+        return select(history.c.id).where(history.c.status == 'completed', history.c.exported_at.is_(None))
+
+    def _expired(self, cutoff: datetime, grace_cutoff: datetime):
+        table = ScanResult.__table__
+        condition = table.c.timestamp < cutoff
+        if self.analytics_service is not None:
+            condition = condition & (
+                table.c.scan_history_id.is_(None)
+                | table.c.scan_history_id.notin_(self._awaiting_export())
+                | (table.c.timestamp < grace_cutoff)
+            )
+        return condition
+
+    def _expired_runs(self, cutoff: datetime, grace_cutoff: datetime):
+        history = ScanHistory.__table__
+        results = ScanResult.__table__
+        finished = func.coalesce(history.c.completed_at, history.c.started_at)
+        condition = (
+            (finished < cutoff)
+            & history.c.status.in_(('completed', 'failed', 'cancelled'))
+            # Results held back, or not expired yet, keep their run
+            & ~exists().where(results.c.scan_history_id == history.c.id)
+        )
+        if self.analytics_service is not None:
+            condition = condition & (
+                (history.c.status != 'completed') | history.c.exported_at.isnot(None) | (finished < grace_cutoff)
+            )
+        return condition
+
+    def _held_back(self, cutoff: datetime, grace_cutoff: datetime) -> int:
+        """Expired results still waiting for their run's analytics export"""
+        if self.analytics_service is None:
+            return 0
+        table = ScanResult.__table__
+        with db.engine.connect() as conn:
+            return conn.execute(
+                select(func.count()).select_from(table).where(
+                    table.c.timestamp < cutoff, table.c.timestamp >= grace_cutoff,
+                    table.c.scan_history_id.in_(self._awaiting_export())
+                )
+            ).scalar()
+
+    def _purge_batch(self, cutoff: datetime, grace_cutoff: datetime) -> bool:
+        table = ScanResult.__table__
+        expired = self._expired(cutoff, grace_cutoff)
+        with writer() as conn:
+            rows = conn.execute(
+                select(*(table.c[name] for name in ARCHIVE_COLUMNS))
+                .where(expired)
+                .order_by(table.c.id)
+                .limit(self.batch_size)
+            ).fetchall()
+            if not rows:
+                return False
+
+            frame = pd.DataFrame(rows, columns=list(ARCHIVE_COLUMNS))
+            archive_files, archive_bytes = self._archive(frame, 'scan_results', frame['timestamp'])
+
+            first_id, last_id = rows[0].id, rows[-1].id
+            deleted, metric_rows = ScanResult.purge(
+                conn, table.c.id.between(first_id, last_id) & expired
+            )
+
+        with self._lock:
+            self.status['batches'] += 1
+            self.status['rows_deleted'] += deleted
+            self.status['metric_rows_deleted'] += metric_rows
+            self.status['payload_bytes'] += int(frame['metrics'].str.len().sum() or 0)
+            self.status['archive_files'] += archive_files
+            self.status['archive_bytes'] += archive_bytes
+        return True
+
+    def _purge_runs(self, cutoff: datetime, grace_cutoff: datetime) -> bool:
+        table = ScanHistory.__table__
+        expired = self._expired_runs(cutoff, grace_cutoff)
+        with writer() as conn:
+            rows = conn.execute(
+                select(*(table.c[name] for name in RUN_ARCHIVE_COLUMNS))
+                .where(expired)
+                .order_by(table.c.id)
+                .limit(self.batch_size)
+            ).fetchall()
+            if not rows:
+                return False
+
+            frame = pd.DataFrame(rows, columns=list(RUN_ARCHIVE_COLUMNS))
+            for name in ('started_at', 'completed_at', 'exported_at'):
+                frame[name] = pd.to_datetime(frame[name])
+            archive_files, archive_bytes = self._archive(
+                frame, 'scan_history', frame['completed_at'].fillna(frame['started_at'])
+            )
+            deleted = ScanHistory.purge(conn, table.c.id.between(rows[0].id, rows[-1].id) & expired)
+
+        with self._lock:
+            self.status['batches'] += 1
+            self.status['runs_deleted'] += deleted
+            self.status['archive_files'] += archive_files
+            self.status['archive_bytes'] += archive_bytes
+        return True
+
+    def _archive(self, frame: pd.DataFrame, name: str, timestamps: pd.Series):
+        if not self.archive_dir:
+            return 0, 0
+
+        first_id, last_id = frame['id'].iloc[0], frame['id'].iloc[-1]
+        files = 0
+        written = 0
+        for day, part in frame.groupby(timestamps.dt.strftime('%Y-%m-%d')):
+            directory = os.path.join(self.archive_dir, name, f'date={day}')
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'part-{first_id}-{last_id}.parquet')
+            part.to_parquet(path, index=False, compression='zstd')
+            files += 1
+            written += os.path.getsize(path)
+        return files, written
+
+    @staticmethod
+    def _free_bytes() -> Optional[int]:
+        """Free pages in the SQLite file; deletes show up here rather than shrinking it"""
+        if db.engine.dialect.name != 'sqlite':
+            return None
+        with db.engine.connect() as conn:
+            page_size = conn.exec_driver_sql('PRAGMA page_size').scalar()
+            free_pages = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+        return page_size * free_pages
+
+    @staticmethod
+    def _empty_status(state: str) -> Dict[str, Any]:
+        return {
+            'state': state,
+            'batches': 0,
+            'rows_deleted': 0,
+            'metric_rows_deleted': 0,
+            'runs_deleted': 0,
+            # Expired results kept until their run is exported to analytics
+            'rows_held': 0,
+            # Size of the purged metrics JSON, the bulk of each row
+            'payload_bytes': 0,
+            # Growth of the SQLite free list; None on other databases
+            'bytes_reclaimed': None,
+            'archive_files': 0,
+            'archive_bytes': 0,
+            'error': None,
+            'started_at': datetime.utcnow().isoformat() if state == 'running' else None,
+            'finished_at': None
+        }
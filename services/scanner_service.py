@@ -1,5 +1,6 @@
 from typing import Dict, List, Any, Optional
-from models import Scanner, ScanResult, ScanHistory
+from models import db, Scanner, ScanResult, ScanHistory
+from sqlalchemy import case, func
 from scanners import ScannerEngine, ScannerValidator
 from datetime import datetime
 
@@ -89,15 +90,19 @@ class ScannerService:
         if not scanner:
             return {}
 
-        # Get execution history
-        histories = ScanHistory.query.filter_by(scanner_id=scanner_id).all()
+        # Aggregate execution history in one query
+        total_scans, successful_scans, total_signals, last_run = db.session.query(
+            func.count(ScanHistory.id),
+            func.sum(case((ScanHistory.status == 'completed', 1), else_=0)),
+            func.sum(ScanHistory.signals_found),
+            func.max(ScanHistory.started_at)
+        ).filter(ScanHistory.scanner_id == scanner_id).one()
+        successful_scans = successful_scans or 0
+        total_signals = total_signals or 0
 
-        total_scans = len(histories)
-        successful_scans = len([h for h in histories if h.status == 'completed'])
-        total_signals = sum(h.signals_found or 0 for h in histories)
-
-        # Get recent results
-        recent_results = ScanResult.get_by_scanner(scanner_id, limit=100)
+        # Recent results, capped at 100 as before
+        recent = db.session.query(ScanResult.id).filter(ScanResult.scanner_id == scanner_id).limit(100).subquery()
+        recent_signals = db.session.query(func.count()).select_from(recent).scalar()
 
         return {
             'total_scans': total_scans,
@@ -105,8 +110,8 @@ class ScannerService:
             'success_rate': (successful_scans / total_scans * 100) if total_scans > 0 else 0,
             'total_signals': total_signals,
             'average_signals_per_scan': total_signals / total_scans if total_scans > 0 else 0,
-            'recent_signals': len(recent_results),
-            'last_run': histories[-1].started_at if histories else None
+            'recent_signals': recent_signals,
+            'last_run': last_run
         }
 
     def clone_scanner(self, scanner_id: int, new_name: str) -> Scanner:
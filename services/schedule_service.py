@@ -173,6 +173,36 @@ class ScheduleService:
             replace_existing=True
         )
 
+    def add_cache_warmup(self, cache_warmer, run_time: str = '09:00', window_minutes: int = 45):
+        """Warm the history cache on weekdays ahead of market open"""
+        hour, minute = (int(part) for part in run_time.split(':'))
+        self.scheduler.add_job(
+            func=cache_warmer.run,
+            trigger=CronTrigger(day_of_week='mon-fri', hour=hour, minute=minute),
+            id='cache_warmup',
+            kwargs={'window_minutes': window_minutes},
+            replace_existing=True
+        )
+
+    def add_result_retention(self, retention_service, run_time: str = '02:30'):
+        """Archive and purge expired scan results once a day, outside market hours"""
+        hour, minute = (int(part) for part in run_time.split(':'))
+        self.scheduler.add_job(
+            func=retention_service.run,
+            trigger=CronTrigger(hour=hour, minute=minute),
+            id='result_retention',
+            replace_existing=True
+        )
+
+    def add_analytics_export(self, analytics_service, interval_minutes: int = 15):
+        """Export newly completed runs to the analytics archive at a fixed interval"""
+        self.scheduler.add_job(
+            func=analytics_service.export,
+            trigger=IntervalTrigger(minutes=interval_minutes),
+            id='analytics_export',
+            replace_existing=True
+        )
+
     def _remove_from_scheduler(self, schedule_id: int):
         job_id = f"schedule_{schedule_id}"
         if self.scheduler.get_job(job_id):
@@ -0,0 +1,150 @@
+import os
+import time
+import pickle
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SharedCache:
+    """Host-wide second cache tier in a SQLite file shared by every process
+
+    Values are pickled with protocol 5, which stores numpy/pandas buffers
+    as raw bytes, so loading an OHLCV frame is little more than a memcpy.
+
+    Unpickling runs arbitrary code, so the file is trusted like the code
+    itself: keep it somewhere only the app's user can write (the default is
+    under the Flask instance folder) and never point it at a shared or
+    world-writable location.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 2048 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.size_bytes = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL,
+                size INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_expires_at ON cache_entries (expires_at)")
+
+    def get(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """Return (value, expires_at) or None"""
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._record('errors')
+            logger.error(f"Shared cache read failed for {key}: {e}")
+            return None
+
+        if row is None or (row[1] and time.time() > row[1]):
+            self._record('misses')
+            return None
+
+        try:
+            value = pickle.loads(row[0])
+        except Exception as e:
+            self._record('errors')
+            logger.error(f"Shared cache entry {key} could not be loaded: {e}")
+            return None
+
+        self._record('hits')
+        return value, row[1]
+
+    def set(self, key: str, value: Any, expires_at: Optional[float]):
+        blob = pickle.dumps(value, protocol=5)
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, size) VALUES (?, ?, ?, ?)",
+                    (key, blob, expires_at, len(blob))
+                )
+        except sqlite3.Error as e:
+            self._record('errors')
+            logger.error(f"Shared cache write failed for {key}: {e}")
+
+    def delete(self, key: str):
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            self._record('errors')
+            logger.error(f"Shared cache delete failed for {key}: {e}")
+
+    def clear(self):
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM cache_entries")
+        except sqlite3.Error as e:
+            self._record('errors')
+            logger.error(f"Shared cache clear failed: {e}")
+
+    def cleanup(self) -> int:
+        """Drop expired rows, then the soonest-to-expire ones while over the byte budget"""
+        with self._connection() as conn:
+            removed = conn.execute(
+                "DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+            ).rowcount
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+            self.size_bytes = total
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                rows = conn.execute(
+                    "SELECT key, size FROM cache_entries ORDER BY expires_at IS NULL, expires_at"
+                )
+                victims = []
+                for key, size in rows:
+                    if excess <= 0:
+                        break
+                    victims.append((key,))
+                    excess -= size
+                conn.executemany("DELETE FROM cache_entries WHERE key = ?", victims)
+                removed += len(victims)
+                self.size_bytes = self.max_bytes + excess
+
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'path': self.path,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': (self.hits / lookups * 100) if lookups else 0,
+            # As measured by the last cleanup pass
+            'size_bytes': self.size_bytes,
+            'budget_bytes': self.max_bytes
+        }
+
+    def _record(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            # WAL lets readers in other processes proceed while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
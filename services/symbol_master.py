@@ -0,0 +1,187 @@
+import bisect
+import logging
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fields kept per instrument, in tuple order
+FIELDS = ('symbol', 'name', 'exchange', 'instrumenttype', 'expiry',
+          'strike', 'lotsize', 'tick_size', 'token')
+
+
+class ExchangeIndex:
+    """Sorted symbol table for one exchange with prefix and trigram lookups"""
+
+    def __init__(self, instruments: List[Dict[str, Any]]):
+        records = {}
+        for item in instruments:
+            symbol = str(item.get('symbol', '')).upper()
+            if symbol:
+                records[symbol] = tuple(item.get(field) for field in FIELDS[1:])
+
+        self.symbols = sorted(records)
+        self.records = [records[s] for s in self.symbols]
+        self.loaded_at = time.time()
+        self._trigrams = None
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        symbol = symbol.upper()
+        pos = bisect.bisect_left(self.symbols, symbol)
+        return pos < len(self.symbols) and self.symbols[pos] == symbol
+
+    def record(self, pos: int) -> Dict[str, Any]:
+        return dict(zip(FIELDS, (self.symbols[pos],) + self.records[pos]))
+
+    def prefix(self, prefix: str, limit: int) -> List[int]:
+        prefix = prefix.upper()
+        start = bisect.bisect_left(self.symbols, prefix)
+        end = bisect.bisect_left(self.symbols, prefix + '\uffff', lo=start)
+        return list(range(start, min(end, start + limit)))
+
+    def fuzzy(self, query: str, limit: int) -> List[int]:
+        if self._trigrams is None:
+            self._build_trigrams()
+
+        grams = self._grams(query.upper().replace(' ', ''))
+        if not grams:
+            return []
+
+        scores = Counter()
+        for gram in grams:
+            scores.update(self._trigrams.get(gram, ()))
+
+        # Need at least half the query's trigrams, ties broken by shorter symbols
+        threshold = max(1, len(grams) // 2)
+        matches = [pos for pos, score in scores.items() if score >= threshold]
+        matches.sort(key=lambda pos: (-scores[pos], len(self.symbols[pos]), self.symbols[pos]))
+        return matches[:limit]
+
+    def _build_trigrams(self):
+        postings = defaultdict(lambda: array('I'))
+        for pos, symbol in enumerate(self.symbols):
+            for gram in self._grams(symbol):
+                postings[gram].append(pos)
+        self._trigrams = dict(postings)
+
+    @staticmethod
+    def _grams(text: str) -> set:
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolMaster:
+    """Daily-refreshed instrument master held in memory per exchange
+
+    Masters download in the background, so a lookup never waits on one:
+    until an exchange's first download finishes its lookups return None and
+    callers fall back to the broker API.
+    """
+
+    def __init__(self, loader: Callable[[str], Optional[List[Dict[str, Any]]]],
+                 max_age: int = 86400):
+        self.loader = loader
+        self.max_age = max_age
+        self.indexes: Dict[str, ExchangeIndex] = {}
+        self._failed_at: Dict[str, float] = {}
+        # exchange -> Future for the download in progress
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='symbol-master')
+
+    def get_index(self, exchange: str, wait: bool = False) -> Optional[ExchangeIndex]:
+        """The exchange's index, starting a download if it is missing or stale
+
+        While the download runs, callers get the stale index, or None if
+        there is none yet; wait=True blocks for the download instead.
+        """
+        index = self.indexes.get(exchange)
+        if index is not None and not self._is_stale(index):
+            return index
+
+        future = self.load(exchange)
+        if wait and future is not None:
+            return future.result()
+        return self.indexes.get(exchange)
+
+    def load(self, exchange: str) -> Optional[Future]:
+        """Download the exchange's master in the background, at most once at a time
+
+        Returns the download's Future, or None when the index is fresh or a
+        recent download failed. The lock only guards the bookkeeping, so a
+        slow download never blocks lookups.
+        """
+        with self._lock:
+            index = self.indexes.get(exchange)
+            if index is not None and not self._is_stale(index):
+                return None
+
+            # Don't hammer the backend when the master isn't available
+            if time.time() - self._failed_at.get(exchange, 0) < 300:
+                return None
+
+            future = self._loading.get(exchange)
+            if future is None:
+                future = self._loading[exchange] = self._executor.submit(self._download, exchange)
+            return future
+
+    def preload(self, exchanges) -> List[Future]:
+        """Start downloads for several exchanges, e.g. ahead of the day's scans"""
+        return [future for future in map(self.load, exchanges) if future is not None]
+
+    def _download(self, exchange: str) -> Optional[ExchangeIndex]:
+        try:
+            instruments = self.loader(exchange)
+            loaded = ExchangeIndex(instruments) if instruments else None
+        except Exception as e:
+            logger.error(f"Instrument master download failed for {exchange}: {e}")
+            loaded = None
+
+        with self._lock:
+            if loaded is None:
+                self._failed_at[exchange] = time.time()
+            else:
+                self.indexes[exchange] = loaded
+            self._loading.pop(exchange, None)
+            index = self.indexes.get(exchange)
+
+        if loaded is not None:
+            logger.info(f"Loaded {len(loaded)} instruments for {exchange}")
+        return index
+
+    def contains(self, symbol: str, exchange: str) -> Optional[bool]:
+        index = self.get_index(exchange)
+        if index is None:
+            return None
+        return symbol in index
+
+    def search(self, query: str, exchange: str, limit: int = 50) -> Optional[List[Dict[str, Any]]]:
+        index = self.get_index(exchange)
+        if index is None:
+            return None
+
+        positions = index.prefix(query.strip(), limit)
+        if len(positions) < limit:
+            seen = set(positions)
+            positions += [p for p in index.fuzzy(query, limit) if p not in seen][:limit - len(positions)]
+
+        return [index.record(pos) for pos in positions]
+
+    def invalidate(self, exchange: str = None):
+        with self._lock:
+            if exchange:
+                self.indexes.pop(exchange, None)
+                self._failed_at.pop(exchange, None)
+            else:
+                self.indexes.clear()
+                self._failed_at.clear()
+
+    def _is_stale(self, index: ExchangeIndex) -> bool:
+        return time.time() - index.loaded_at > self.max_age
@@ -7,13 +7,13 @@ class WatchlistService:
     def __init__(self, data_service):
         self.data_service = data_service
 
-    def create_watchlist(self, name: str, symbols: List[str],
+    def create_watchlist(self, name: str, symbols: List,
                         exchange: str = 'NSE', description: str = None) -> Watchlist:
-        # Validate symbols
-        valid_symbols = []
-        for symbol in symbols:
-            if self.data_service.validate_symbol(symbol, exchange):
-                valid_symbols.append(symbol)
+        # Validate symbols; {'symbol', 'exchange'} dicts are checked on their own exchange
+        valid_symbols = [
+            item for item in Watchlist.normalize_symbols(symbols, exchange)
+            if self.data_service.validate_symbol(item['symbol'], item['exchange'])
+        ]
 
         if not valid_symbols:
             raise ValueError("No valid symbols found")
@@ -36,10 +36,9 @@ class WatchlistService:
 
         # Validate and add symbols
         added = 0
-        for symbol in symbols:
-            if self.data_service.validate_symbol(symbol, watchlist.exchange):
-                if watchlist.add_symbol(symbol):
-                    added += 1
+        for symbol in self.data_service.validate_symbols(symbols, watchlist.exchange):
+            if watchlist.add_symbol(symbol):
+                added += 1
 
         watchlist.save()
         return watchlist
@@ -87,13 +86,14 @@ class WatchlistService:
         )
 
     def merge_watchlists(self, watchlist_ids: List[int], new_name: str) -> Watchlist:
-        all_symbols = set()
+        # {'symbol', 'exchange'} dicts, in order; create_watchlist drops the duplicates
+        all_symbols = []
         exchange = None
 
         for wl_id in watchlist_ids:
             watchlist = Watchlist.get_by_id(wl_id)
             if watchlist:
-                all_symbols.update(watchlist.get_symbols())
+                all_symbols.extend(watchlist.get_symbols())
                 if not exchange:
                     exchange = watchlist.exchange
 
@@ -102,7 +102,7 @@ class WatchlistService:
 
         return self.create_watchlist(
             name=new_name,
-            symbols=list(all_symbols),
+            symbols=all_symbols,
             exchange=exchange or 'NSE',
             description=f"Merged from {len(watchlist_ids)} watchlists"
         )
@@ -112,11 +112,16 @@ class WatchlistService:
         if not watchlist:
             return []
 
+        symbols = watchlist.get_symbols()
+        snapshot = self.data_service.get_quotes(symbols)
+
         quotes = []
-        for symbol in watchlist.get_symbols():
-            quote = self.data_service.get_quote(symbol, watchlist.exchange)
+        for item in symbols:
+            quote = snapshot.get((item['symbol'], item['exchange']))
             if quote:
-                quote['symbol'] = symbol
+                quote = dict(quote)
+                quote['symbol'] = item['symbol']
+                quote['exchange'] = item['exchange']
                 quotes.append(quote)
 
         return quotes
\ No newline at end of file
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Analytics archive checks
+Completed runs are exported once to partitioned Parquet, past partitions are
+compacted to a single file without losing or duplicating rows, and the
+queries read back what was written
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pyarrow.parquet as pq
+from flask import Flask
+from config import Config
+from models import db, Scanner, ScanHistory, ScanResult
+from models.storage import configure_storage, engine_options
+from services.analytics_service import AnalyticsService
+
+def create_app():
+    # A file, so the writer connection and the session see the same database
+    path = os.path.join(tempfile.mkdtemp(prefix='fluxscan_test_'), 'test.db')
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    configure_storage(app)
+    return app
+
+def add_run(scanner, started, results, status='completed'):
+    history = ScanHistory(scanner_id=scanner.id)
+    history.start()
+    db.session.add(history)
+    db.session.flush()
+    ScanResult.bulk_create(scanner.id, 'NSE', results, scan_history_id=history.id, timestamp=started)
+    if status == 'completed':
+        history.complete(symbols_scanned=10, signals_found=len(results))
+    history.started_at = started
+    history.completed_at = started + timedelta(seconds=30) if status == 'completed' else None
+    return history
+
+def seed():
+    """Two scanners, three runs on each of three past days; metrics differ from run to run"""
+    scanners = [Scanner(name=f'analytics {i}', code='pass') for i in range(2)]
+    db.session.add_all(scanners)
+    db.session.flush()
+
+    today = datetime.combine(date.today(), datetime.min.time())
+    for days in (3, 2, 1):
+        for n in range(3):
+            started = today - timedelta(days=days) + timedelta(hours=10, minutes=n)
+            for scanner in scanners:
+                add_run(scanner, started, [
+                    {'symbol': f'SYM{i}', 'signal': 'BUY' if i < 3 else 'SELL',
+                     # rsi is text in one run, so the compacted file must widen it
+                     'metrics': {'rsi': 'n/a' if (days, n, i) == (2, 1, 0) else float(i * 10),
+                                 **({'breakout': i % 2 == 0} if n else {'atr': i / 2})}}
+                    for i in range(4)
+                ])
+    # Never exported: still running
+    add_run(scanners[0], today - timedelta(days=1), [{'symbol': 'LIVE', 'signal': 'BUY', 'metrics': {}}],
+            status='running')
+    db.session.commit()
+    return scanners
+
+def part_files(root):
+    found = {}
+    for directory, _, files in os.walk(root):
+        parts = [f for f in files if f.endswith('.parquet')]
+        if parts:
+            found[os.path.relpath(directory, root)] = parts
+    return found
+
+def test_export_and_compaction():
+    app = create_app()
+    archive_dir = tempfile.mkdtemp(prefix='fluxscan_analytics_')
+    with app.app_context():
+        db.create_all()
+        seed()
+        service = AnalyticsService(app=app, archive_dir=archive_dir, batch_size=2)
+        status = service.export()
+
+        assert status['state'] == 'completed', status['error']
+        assert status['runs_exported'] == 18 and status['results_exported'] == 72
+        assert status['batches'] == 9 and status['files_compacted'] > 0
+        db.session.expire_all()
+        assert ScanHistory.query.filter(ScanHistory.exported_at.is_(None)).count() == 1
+
+        # Each past partition ends as one file holding every row once
+        results = part_files(os.path.join(archive_dir, 'scan_results'))
+        runs = part_files(os.path.join(archive_dir, 'scan_runs'))
+        assert len(results) == 6 and all(len(parts) == 1 for parts in results.values())
+        assert len(runs) == 3 and all(len(parts) == 1 for parts in runs.values())
+        # Files differ in their metric columns, so only the ids are read from each
+        ids = [
+            result_id
+            for directory, parts in results.items()
+            for result_id in pq.read_table(os.path.join(archive_dir, 'scan_results', directory, parts[0]),
+                                           columns=['result_id']).column('result_id').to_pylist()
+        ]
+        assert len(ids) == 72 and len(set(ids)) == 72
+        print(f"OK   18 runs exported in {status['batches']} batches, "
+              f"{status['files_compacted']} files compacted into {len(results) + len(runs)}")
+
+        again = service.export()
+        assert again['runs_exported'] == 0 and again['files'] == 0
+        print("OK   a second export finds nothing new")
+
+def test_compaction_drops_duplicates():
+    app = create_app()
+    archive_dir = tempfile.mkdtemp(prefix='fluxscan_analytics_')
+    with app.app_context():
+        db.create_all()
+        seed()
+        service = AnalyticsService(app=app, archive_dir=archive_dir, batch_size=50)
+        service.export()
+
+        # An interrupted compaction leaves an input next to the merged file
+        day = (date.today() - timedelta(days=2)).isoformat()
+        directory = os.path.join(archive_dir, 'scan_results', f'date={day}', 'scanner_id=1')
+        [merged] = os.listdir(directory)
+        shutil.copy(os.path.join(directory, merged), os.path.join(directory, 'part-0-0.parquet'))
+
+        assert service.compact([day]) == 2
+        [left] = os.listdir(directory)
+        table = pq.read_table(os.path.join(directory, left))
+        assert table.num_rows == 12 and len(set(table.column('result_id').to_pylist())) == 12
+        print("OK   compaction drops rows duplicated by an interrupted run")
+
+def test_queries():
+    app = create_app()
+    archive_dir = tempfile.mkdtemp(prefix='fluxscan_analytics_')
+    with app.app_context():
+        db.create_all()
+        scanners = seed()
+        service = AnalyticsService(app=app, archive_dir=archive_dir, batch_size=4)
+        service.export()
+
+        counts = service.signal_counts()
+        assert counts[0]['signals'] == 18 and len(counts) == 4
+        assert {c['symbol']: c['by_signal'] for c in counts}['SYM3'] == {'SELL': 18}
+        assert service.signal_counts(signal='SELL', limit=5) == [
+            {'symbol': 'SYM3', 'signals': 18, 'by_signal': {'SELL': 18}}
+        ]
+
+        # Date ranges only read their partitions
+        yesterday = date.today() - timedelta(days=1)
+        recent = service.signal_counts(start=yesterday, scanner_id=scanners[0].id)
+        assert sum(c['signals'] for c in recent) == 12
+
+        rate = service.hit_rate(period='day')
+        assert rate['runs'] == 18 and rate['symbols_scanned'] == 180 and rate['signals_found'] == 72
+        assert [p['runs'] for p in rate['periods']] == [6, 6, 6] and rate['hit_rate'] == 40
+
+        # The text value of rsi is skipped, numbers from every file are kept
+        stats = {s['signal']: s for s in service.metric_stats('rsi')}
+        assert stats['SELL']['count'] == 18 and stats['SELL']['mean'] == 30
+        # 54 BUY results, less the one 'n/a' of each scanner
+        assert stats['BUY']['count'] == 52 and stats['BUY']['max'] == 20
+        # atr is only in the first run of each day: 6 runs of 3 BUY and 1 SELL
+        assert [s['count'] for s in service.metric_stats('atr')] == [18, 6]
+        try:
+            service.metric_stats('missing')
+            assert False, 'expected ValueError'
+        except ValueError:
+            pass
+        print("OK   signal counts, hit rate and metric stats read back from the archive")
+
+if __name__ == '__main__':
+    test_export_and_compaction()
+    test_compaction_drops_duplicates()
+    test_queries()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+In-memory cache checks
+Byte budgets hold across all shards, least recently used entries go first,
+and entries disappear once their TTL has passed
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from services.cache_service import CacheService, MB
+
+def block(mb):
+    return np.zeros(int(mb * MB), dtype=np.uint8)
+
+def namespace_stats(cache, namespace='hist'):
+    return cache.get_stats()['namespaces'][namespace]
+
+def test_lru_eviction_within_budget():
+    cache = CacheService(budgets={'hist': 10 * MB}, num_shards=1)
+    for i in range(10):
+        cache.set(f'hist_{i}', block(1))
+    # Reading hist_0 makes hist_1 the least recently used
+    assert cache.get('hist_0') is not None
+    cache.set('hist_10', block(1))
+
+    assert cache.get('hist_1') is None
+    assert all(cache.get(f'hist_{i}') is not None for i in (0, 2, 9, 10))
+    stats = namespace_stats(cache)
+    assert stats['evictions'] == 1 and stats['size_bytes'] <= 10 * MB
+    print(f"OK   LRU eviction: {stats['keys']} keys, {stats['size_bytes'] // MB} MB of 10 MB")
+
+def test_budget_is_shared_by_shards():
+    cache = CacheService(budgets={'hist': 16 * MB}, num_shards=16)
+
+    # Far larger than a 1/16 slice of the budget, yet within the whole of it
+    cache.set('hist_large', block(12))
+    assert cache.get('hist_large') is not None
+    cache.set('hist_too_large', block(17))
+    assert cache.get('hist_too_large') is None
+
+    for i in range(40):
+        cache.set(f'hist_{i}', block(0.5))
+    stats = namespace_stats(cache)
+    assert stats['size_bytes'] <= 16 * MB
+    assert stats['size_bytes'] == cache.usage.used['hist']
+    assert cache.get('hist_39') is not None
+
+    # Other namespaces have budgets of their own
+    cache.set('quote_x', {'ltp': 1.0})
+    assert cache.get('quote_x') == {'ltp': 1.0}
+    print(f"OK   one budget across 16 shards: {stats['size_bytes'] / MB:.1f} MB after {stats['evictions']} evictions")
+
+def test_budget_under_concurrent_writers():
+    cache = CacheService(budgets={'hist': 8 * MB}, num_shards=8)
+
+    def write(worker):
+        for i in range(200):
+            cache.set(f'hist_{worker}_{i}', block(0.25))
+            cache.delete(f'hist_{worker}_{i - 3}')
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = namespace_stats(cache)
+    assert stats['size_bytes'] == cache.usage.used['hist'] <= 8 * MB
+    cache.clear()
+    assert cache.usage.used['hist'] == 0 and cache.get_stats()['cache_size_bytes'] == 0
+    print(f"OK   byte accounting consistent after {stats['sets']} concurrent writes")
+
+def test_expiry():
+    cache = CacheService(num_shards=4)
+    cache.set('quote_short', 1, ttl=1)
+    cache.set('quote_long', 2, ttl=60)
+    cache.set('quote_forever', 3, ttl=0)
+    assert cache.get('quote_short') == 1
+
+    time.sleep(1.1)
+    # Read path: an expired entry is a miss
+    assert cache.get('quote_short') is None
+    assert cache.get('quote_long') == 2 and cache.get('quote_forever') == 3
+
+    # Sweep path: expired entries go without being read
+    for i in range(100):
+        cache.set(f'hist_{i}', i, ttl=1)
+    time.sleep(1.1)
+    assert cache.cleanup_expired(budget=10) <= 40
+    cache.cleanup_expired()
+    stats = namespace_stats(cache)
+    assert stats['keys'] == 0 and stats['expirations'] == 100 and stats['size_bytes'] == 0
+    assert namespace_stats(cache, 'quote')['keys'] == 2
+    print("OK   expired entries removed on read and by bounded sweeps")
+
+def test_get_or_compute_runs_once():
+    cache = CacheService()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'value': 42}
+
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(cache.get_or_compute('hist_key', compute)))
+               for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and values == [{'value': 42}] * 16
+
+    # Failures reach every waiter and are not cached
+    def fail():
+        raise RuntimeError('backend down')
+    try:
+        cache.get_or_compute('hist_failing', fail)
+        assert False, 'expected RuntimeError'
+    except RuntimeError:
+        pass
+    assert cache.get_or_compute('hist_failing', lambda: 1) == 1
+    print("OK   16 concurrent misses ran the callback once")
+
+def test_stats_counters():
+    cache = CacheService(num_shards=4)
+    # Stats never serialize values, so unpicklable ones are fine
+    cache.set('quote_lock', threading.Lock())
+    cache.set('quote_a', {'ltp': 1.0})
+    cache.get('quote_a')
+    cache.get('quote_a')
+    cache.get('quote_missing')
+    cache.get('hist_missing')
+
+    stats = cache.get_stats()
+    quote = stats['namespaces']['quote']
+    assert (quote['sets'], quote['hits'], quote['misses'], quote['keys']) == (2, 2, 1, 2)
+    assert quote['size_bytes'] > 0 and quote['budget_bytes'] == 32 * MB
+    assert stats['total_keys'] == 2 and stats['hits'] == 2 and stats['misses'] == 2
+    assert stats['hit_rate'] == 50 and stats['tiers']['l1']['hit_rate'] == 50
+    print(f"OK   stats: {stats['total_keys']} keys, {stats['hit_rate']:.0f}% hit rate")
+
+if __name__ == '__main__':
+    test_lru_eviction_within_budget()
+    test_budget_is_shared_by_shards()
+    test_budget_under_concurrent_writers()
+    test_expiry()
+    test_get_or_compute_runs_once()
+    test_stats_counters()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Cache warm-up checks against a recording broker client
+The warm-up plans the series that schedules due soon will read, fetches the
+ones not cached yet, and keeps daily bars alive through the window
+"""
+
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from models import db, Scanner, Watchlist, ScanSchedule
+from services.cache_warmer import CacheWarmer
+from test_data_service import RecordingBroker, create_service
+
+class FailingBroker(RecordingBroker):
+    """Has no history for INFY"""
+
+    def history(self, symbol, exchange, interval, start_date, end_date):
+        data = super().history(symbol, exchange, interval, start_date, end_date)
+        return data.iloc[:0] if symbol == 'INFY' else data
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['TESTING'] = True
+    db.init_app(app)
+    return app
+
+def seed():
+    def scanner(name, interval, lookback_days):
+        # Parameters come both as plain values and as definitions with a default
+        return Scanner(name=name, code='pass', parameters=json.dumps({
+            'interval': {'type': 'select', 'default': interval}, 'lookback_days': lookback_days
+        }))
+
+    def watchlist(name, symbols):
+        watchlist = Watchlist(name=name, exchange='NSE')
+        watchlist.set_symbols(symbols)
+        return watchlist
+
+    daily, daily_long, intraday = scanner('daily', 'D', 60), scanner('daily long', 'D', 100), scanner('5m', '5m', 5)
+    large_caps, mixed = watchlist('large caps', ['RELIANCE', 'TCS']), watchlist('mixed', ['TCS', ('INFY', 'BSE')])
+    db.session.add_all([daily, daily_long, intraday, large_caps, mixed])
+    db.session.flush()
+
+    soon = datetime.utcnow() + timedelta(minutes=10)
+    later = datetime.utcnow() + timedelta(hours=5)
+    db.session.add_all([
+        ScanSchedule(scanner_id=daily.id, watchlist_id=large_caps.id, schedule_type='daily', next_run=soon),
+        ScanSchedule(scanner_id=daily_long.id, watchlist_id=large_caps.id, schedule_type='daily', next_run=soon),
+        ScanSchedule(scanner_id=intraday.id, watchlist_id=mixed.id, schedule_type='daily', next_run=soon),
+        # Interval schedules count whenever they next fire
+        ScanSchedule(scanner_id=intraday.id, watchlist_id=large_caps.id, schedule_type='interval',
+                     interval_minutes=15, next_run=later),
+        # Due after the window, or inactive: not planned
+        ScanSchedule(scanner_id=daily.id, watchlist_id=mixed.id, schedule_type='daily', next_run=later),
+        ScanSchedule(scanner_id=daily_long.id, watchlist_id=mixed.id, schedule_type='daily', next_run=soon,
+                     is_active=False)
+    ])
+    db.session.commit()
+
+def test_plan():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        service = create_service()
+        try:
+            plan = CacheWarmer(service).plan(window_minutes=45)
+            assert sorted((t['symbol'], t['exchange'], t['interval'], t['lookback_days']) for t in plan) == [
+                ('INFY', 'BSE', '5m', 5),
+                ('RELIANCE', 'NSE', '5m', 5),
+                ('RELIANCE', 'NSE', 'D', 100),
+                ('TCS', 'NSE', '5m', 5),
+                ('TCS', 'NSE', 'D', 100)
+            ]
+            print(f"OK   warm-up plans {len(plan)} series with the widest lookback of each")
+        finally:
+            service._refresh_executor.shutdown()
+
+def test_run():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        service = create_service()
+        broker = service.client = FailingBroker()
+        try:
+            warmer = CacheWarmer(service, max_workers=2)
+            assert warmer.get_status()['state'] == 'idle'
+            service.get_historical_data('RELIANCE', 'NSE', 'D', lookback_days=100)
+
+            status = warmer.run(window_minutes=45)
+            assert status['state'] == 'completed' and status['total'] == 5
+            assert (status['already_cached'], status['fetched'], status['failed']) == (1, 3, 1)
+            assert status['coverage'] == 80 and status['progress'] == 100
+            assert len(broker.history_calls) == 5
+            assert warmer.get_status() == status
+
+            # Daily bars stay cached for the window; intraday ones keep their normal TTL
+            assert service.cache.get('hist_TCS_NSE_D')['ttl'] == 45 * 60
+            assert service.cache.get('hist_TCS_NSE_5m')['ttl'] == 300
+            assert service.cache.get('hist_INFY_BSE_5m') is None
+
+            # A second run only retries what is still missing
+            again = warmer.run(window_minutes=45)
+            assert (again['already_cached'], again['fetched'], again['failed']) == (4, 0, 1)
+            assert len(broker.history_calls) == 6
+            print("OK   warm-up fetches only uncached series and reports coverage")
+        finally:
+            service._refresh_executor.shutdown()
+
+if __name__ == '__main__':
+    test_plan()
+    test_run()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+DataService cache reuse checks against a recording broker client
+One history entry per series serves every shorter lookback, and a longer
+lookback only fetches the older range the entry doesn't cover yet
+"""
+
+import sys
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from services import compact_frame
+from services.compact_frame import CompactFrame
+from services.data_service import DataService
+
+class RecordingBroker:
+    """Answers history requests with one bar per calendar day and records each request"""
+
+    def __init__(self):
+        self.history_calls = []
+
+    def history(self, symbol, exchange, interval, start_date, end_date):
+        self.history_calls.append((symbol, start_date, end_date))
+        index = pd.date_range(start_date, end_date, freq='D', name='timestamp')
+        close = np.array([float(day.toordinal() % 1000) + 0.25 for day in index])
+        return pd.DataFrame({
+            'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+            'volume': np.full(len(index), 1000, dtype=np.int64)
+        }, index=index)
+
+class GatedBroker(RecordingBroker):
+    """RecordingBroker whose next history request, once held, waits until released"""
+
+    def __init__(self):
+        super().__init__()
+        self.held = False
+        self.waiting = threading.Event()
+        self.released = threading.Event()
+
+    def hold(self):
+        self.held = True
+
+    def history(self, *args, **kwargs):
+        if self.held:
+            self.held = False
+            self.waiting.set()
+            self.released.wait(5)
+        return super().history(*args, **kwargs)
+
+class Clock:
+    """Wall clock shifted by a settable offset, to patch in for time.time"""
+
+    def __init__(self):
+        self.real = time.time
+        self.offset = 0
+
+    def __call__(self):
+        return self.real() + self.offset
+
+class QuoteBroker:
+    """Per-symbol quote endpoint only, like clients without multiquotes"""
+
+    def __init__(self):
+        self.multiquote_batches = []
+        self.single_quotes = []
+
+    def quotes(self, symbol, exchange):
+        self.single_quotes.append(symbol)
+        if symbol == 'DELISTED':
+            return {'status': 'error', 'message': 'not found'}
+        return {'status': 'success', 'data': {'ltp': float(len(symbol))}}
+
+class MultiQuoteBroker(QuoteBroker):
+    def multiquotes(self, symbols):
+        self.multiquote_batches.append(len(symbols))
+        return {'status': 'success', 'results': [
+            {'symbol': s['symbol'], 'exchange': s['exchange'], 'data': {'ltp': float(len(s['symbol']))}}
+            for s in symbols if s['symbol'] != 'DELISTED'
+        ]}
+
+def create_service(**kwargs):
+    service = DataService(api_key='test-key', host='http://127.0.0.1:5000', **kwargs)
+    service.client = RecordingBroker()
+    service.api_valid = True
+    return service
+
+def wait_for_refreshes(service):
+    for _ in range(500):
+        with service._refresh_lock:
+            if not service._refreshing:
+                return
+        time.sleep(0.01)
+    raise AssertionError('background refresh did not finish')
+
+def check_window_reuse(service):
+    broker = service.client
+    today = datetime.now().date()
+
+    wide = service.get_historical_data('RELIANCE', lookback_days=30, ttl=300)
+    assert len(broker.history_calls) == 1
+    assert wide.index[0].date() == today - timedelta(days=30)
+
+    # Shorter lookbacks are slices of the cached window
+    narrow = service.get_historical_data('RELIANCE', lookback_days=10, ttl=300)
+    assert len(broker.history_calls) == 1
+    assert narrow.index[0].date() == today - timedelta(days=10)
+    pd.testing.assert_frame_equal(narrow, wide.iloc[-len(narrow):])
+
+    # A longer one fetches only the missing older days, then extends the entry
+    longer = service.get_historical_data('RELIANCE', lookback_days=60, ttl=300)
+    assert len(broker.history_calls) == 2
+    _, start, end = broker.history_calls[1]
+    assert (start, end) == (str(today - timedelta(days=60)), str(today - timedelta(days=31)))
+    assert len(longer) == 61 and longer.index.is_monotonic_increasing and longer.index.is_unique
+
+    service.get_historical_data('RELIANCE', lookback_days=45, ttl=300)
+    service.get_historical_data('TCS', lookback_days=10, ttl=300)
+    assert len(broker.history_calls) == 3
+    return longer
+
+def test_lookback_windows_share_one_entry():
+    service = create_service()
+    try:
+        data = check_window_reuse(service)
+        assert data['close'].dtype == np.float64
+        print("OK   shorter lookbacks sliced from the cached window, longer ones fetch only the gap")
+    finally:
+        service._refresh_executor.shutdown()
+
+def test_lookback_windows_with_compact_cache():
+    service = create_service(compact_cache=True)
+    try:
+        data = check_window_reuse(service)
+        # Prices round-trip through float32 and come back as float64
+        assert data['close'].dtype == np.float64 and data['volume'].dtype == np.int64
+        expected = RecordingBroker().history('RELIANCE', 'NSE', 'D', str(data.index[0].date()),
+                                             str(data.index[-1].date()))
+        np.testing.assert_allclose(data['close'].to_numpy(), expected['close'].to_numpy(), rtol=1e-6)
+        print("OK   window reuse also holds for compact cached frames")
+    finally:
+        service._refresh_executor.shutdown()
+
+def test_compact_frame_memory():
+    index = pd.date_range('2020-01-01', periods=100_000, freq='min', name='timestamp')
+    prices = np.linspace(100, 200, len(index))
+    frame = pd.DataFrame({'open': prices, 'high': prices, 'low': prices, 'close': prices,
+                          'volume': np.arange(len(index), dtype=np.int64)}, index=index)
+    compact = CompactFrame(frame)
+    full = int(frame.memory_usage(index=True).sum())
+    assert (compact.nbytes, full) == (2_800_000, 4_800_000)
+
+    # Expanded copies are capped by bytes, and the cap comes off the hist budget
+    with mock.patch.object(compact_frame, 'EXPANDED_MAX_BYTES', 2 * full):
+        frames = [CompactFrame(frame) for _ in range(3)]
+        for f in frames:
+            f.to_frame()
+        assert compact_frame._expanded_bytes <= 2 * full and id(frames[0]) not in compact_frame._expanded
+        assert frames[2].to_frame() is frames[2].to_frame()
+    # A frame larger than the cap is rebuilt each time rather than held
+    with mock.patch.object(compact_frame, 'EXPANDED_MAX_BYTES', full - 1):
+        assert compact.to_frame() is not compact.to_frame()
+    service = create_service(compact_cache=True, cache_budgets={'hist': 256 * 1024 * 1024})
+    try:
+        assert service.cache.budgets['hist'] == 256 * 1024 * 1024 - compact_frame.EXPANDED_MAX_BYTES
+        print(f"OK   compact frame is {1 - compact.nbytes / full:.0%} smaller, expanded copies bounded by bytes")
+    finally:
+        service._refresh_executor.shutdown()
+
+def test_stale_history_served_while_refreshing():
+    service = create_service()
+    broker = service.client = GatedBroker()
+    clock = Clock()
+    try:
+        with mock.patch('time.time', clock):
+            fresh = service.get_historical_data('RELIANCE', lookback_days=30, ttl=300)
+            assert len(broker.history_calls) == 1
+
+            # Past the TTL but within MAX_STALENESS: the old frame comes back at once
+            clock.offset = 310
+            broker.hold()
+            stale = service.get_historical_data('RELIANCE', lookback_days=30, ttl=300)
+            pd.testing.assert_frame_equal(stale, fresh)
+            assert broker.waiting.wait(5) and len(broker.history_calls) == 1
+
+            # A refresh is already running for this key, so no second one starts
+            service.get_historical_data('RELIANCE', lookback_days=30, ttl=300)
+            broker.released.set()
+            wait_for_refreshes(service)
+            assert len(broker.history_calls) == 2
+
+            # The refreshed entry is fresh again
+            service.get_historical_data('RELIANCE', lookback_days=30, ttl=300)
+            assert len(broker.history_calls) == 2
+
+            # Past TTL plus MAX_STALENESS the entry is gone and is fetched before returning
+            clock.offset += 300 + DataService.MAX_STALENESS['D'] + 1
+            service.get_historical_data('RELIANCE', lookback_days=30, ttl=300)
+            assert len(broker.history_calls) == 3 and not service._refreshing
+            print("OK   stale history served once past TTL, one refresh per key, refetched past MAX_STALENESS")
+    finally:
+        broker.released.set()
+        service._refresh_executor.shutdown()
+
+def test_refresh_keeps_older_history():
+    service = create_service()
+    broker = service.client = GatedBroker()
+    clock = Clock()
+    today = datetime.now().date()
+    try:
+        with mock.patch('time.time', clock):
+            service.get_historical_data('RELIANCE', lookback_days=30, ttl=300)
+
+            # The refresh of the 30-day window waits while a 60-day request extends the entry
+            clock.offset = 310
+            broker.hold()
+            service.get_historical_data('RELIANCE', lookback_days=30, ttl=300)
+            assert broker.waiting.wait(5)
+            longer = service.get_historical_data('RELIANCE', lookback_days=60, ttl=300)
+            assert len(longer) == 61 and len(broker.history_calls) == 2
+
+            broker.released.set()
+            wait_for_refreshes(service)
+            assert len(broker.history_calls) == 3
+
+            # The refreshed entry still reaches back 60 days, so nothing is fetched again
+            assert service.has_cached_history('RELIANCE', lookback_days=60)
+            again = service.get_historical_data('RELIANCE', lookback_days=60, ttl=300)
+            assert len(broker.history_calls) == 3
+            assert again.index[0].date() == today - timedelta(days=60) and again.index.is_unique
+            pd.testing.assert_frame_equal(again, longer)
+            print("OK   a background refresh keeps older history added while it ran")
+    finally:
+        broker.released.set()
+        service._refresh_executor.shutdown()
+
+def test_quote_snapshot_batches():
+    service = create_service()
+    try:
+        broker = service.client = MultiQuoteBroker()
+        symbols = [{'symbol': f'SYM{i}', 'exchange': 'NSE'} for i in range(250)]
+        symbols.append({'symbol': 'DELISTED', 'exchange': 'NSE'})
+
+        quotes = service.get_quotes(symbols)
+        assert broker.multiquote_batches == [100, 100, 51]
+        assert len(quotes) == 251 and quotes[('SYM7', 'NSE')] == {'ltp': 4.0}
+        # Symbols the broker doesn't return still get an entry, but aren't cached
+        assert ('DELISTED', 'NSE') in quotes
+
+        # Fresh quotes come from the cache; only the missing one is asked for again
+        service.get_quotes(symbols)
+        assert broker.multiquote_batches == [100, 100, 51, 1]
+        print(f"OK   {len(symbols)} quotes in {len(broker.multiquote_batches) - 1} batched requests")
+
+        broker = service.client = QuoteBroker()
+        service.cache.clear()
+        quotes = service.get_quotes(symbols[:20])
+        assert sorted(broker.single_quotes) == sorted(s['symbol'] for s in symbols[:20])
+        assert quotes[('SYM3', 'NSE')] == {'ltp': 4.0}
+        print("OK   per-symbol quotes fetched concurrently without multiquotes")
+    finally:
+        service._refresh_executor.shutdown()
+
+if __name__ == '__main__':
+    test_lookback_windows_share_one_entry()
+    test_lookback_windows_with_compact_cache()
+    test_compact_frame_memory()
+    test_stale_history_served_while_refreshing()
+    test_refresh_keeps_older_history()
+    test_quote_snapshot_batches()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Result export checks
+Every export format must round-trip: reading the file back gives the rows
+and metrics that were stored, however many rows there are
+"""
+
+import sys
+import os
+import csv
+import io
+import json
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import Flask
+from models import db, Scanner, ScanHistory, ScanResult
+from routes import api_routes, results_routes
+from services import ExportService
+
+ROWS = 1234
+
+def create_app():
+    app = Flask(__name__, template_folder=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['TESTING'] = True
+    app.config['MAX_EXPORT_ROWS'] = 0
+    db.init_app(app)
+    app.register_blueprint(api_routes.bp)
+    app.register_blueprint(results_routes.bp)
+    return app
+
+def seed(rows=ROWS):
+    scanner = Scanner(name='export test', code='pass')
+    db.session.add(scanner)
+    db.session.flush()
+    history = ScanHistory(scanner_id=scanner.id)
+    history.start()
+    db.session.add(history)
+    db.session.flush()
+    ScanResult.bulk_create(scanner.id, 'NSE', [
+        {'symbol': f'SYM{i}', 'signal': 'BUY' if i % 3 else 'SELL', 'metrics': {
+            'price': 100 + i / 4, 'rsi': float(i % 100), 'note': 'a, "quoted" value', 'levels': [i, i + 1],
+            # Only on the oldest rows, which come last in the export and miss any sample of the first
+            **({'late_score': i * 2, 'late_tag': f'tag{i}'} if i < 100 else {})
+        }}
+        for i in range(rows)
+    ], scan_history_id=history.id, timestamp=datetime(2024, 1, 2, 9, 15, 30))
+    history.complete(symbols_scanned=rows, signals_found=rows)
+    db.session.commit()
+    return history
+
+def streamed(response):
+    """Body chunks of a streamed response, as sent"""
+    assert response.is_streamed
+    return [chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in response.response]
+
+def read_xlsx(data):
+    """Rows of the first worksheet as {column: value}; numbers as floats, text as str"""
+    ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        shared = []
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            root = ET.fromstring(archive.read('xl/sharedStrings.xml'))
+            shared = [''.join(t.text or '' for t in si.iter(f"{{{ns['x']}}}t")) for si in root.findall('x:si', ns)]
+        sheet = ET.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+
+    rows = []
+    for row in sheet.find('x:sheetData', ns).findall('x:row', ns):
+        cells = {}
+        for cell in row.findall('x:c', ns):
+            column = re.match(r'[A-Z]+', cell.get('r')).group()
+            kind = cell.get('t')
+            if kind == 'inlineStr':
+                cells[column] = ''.join(t.text or '' for t in cell.iter(f"{{{ns['x']}}}t"))
+            elif kind == 's':
+                cells[column] = shared[int(cell.find('x:v', ns).text)]
+            elif kind == 'b':
+                cells[column] = cell.find('x:v', ns).text == '1'
+            elif cell.find('x:v', ns) is not None:
+                cells[column] = float(cell.find('x:v', ns).text)
+        rows.append(cells)
+    return rows
+
+def test_streamed_csv():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        history = seed()
+        client = app.test_client()
+
+        chunks = streamed(client.post('/api/results/export', json={'format': 'csv'}))
+        assert len(chunks) == ROWS // ExportService.STREAM_CHUNK_ROWS + 1
+        rows = list(csv.reader(io.StringIO(''.join(chunks))))
+        assert rows[0] == ['Timestamp', 'Symbol', 'Exchange', 'Signal', 'Scanner', 'Metrics']
+        assert len(rows) == ROWS + 1
+        # Newest first, ties by id descending
+        assert rows[1][1] == f'SYM{ROWS - 1}' and rows[-1][1] == 'SYM0'
+        assert rows[-1][:5] == ['2024-01-02T09:15:30', 'SYM0', 'NSE', 'SELL', 'export test']
+
+        chunks = streamed(client.post('/results/api/results/export', json={'format': 'csv', 'scan_id': history.id}))
+        rows = list(csv.reader(io.StringIO(''.join(chunks))))
+        assert len(rows) == ROWS + 1 and rows[1][:3] == ['2024-01-02 09:15:30', 'SYM0', 'SELL']
+        assert rows[5][3] == '101.0' and rows[5][10] == '4.0'
+        print(f"OK   CSV exports of {ROWS} rows streamed in {len(chunks)} chunks")
+
+def test_streamed_json():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        client = app.test_client()
+
+        chunks = streamed(client.post('/api/results/export', json={'format': 'json'}))
+        assert len(chunks) > 1
+        items = json.loads(''.join(chunks))
+        assert len(items) == ROWS
+
+        # Each item is what the results API returns for that row
+        expected = {
+            r.id: json.loads(app.json.dumps(r.to_dict()))
+            for r in ScanResult.with_scanner().all()
+        }
+        for item in items:
+            assert item == expected[item['id']]
+        assert items[0]['metrics']['note'] == 'a, "quoted" value'
+        print(f"OK   JSON export of {ROWS} rows streamed in {len(chunks)} chunks, items match to_dict()")
+
+def test_export_row_limit():
+    app = create_app()
+    app.config['MAX_EXPORT_ROWS'] = 100
+    with app.app_context():
+        db.create_all()
+        seed()
+        client = app.test_client()
+
+        rows = list(csv.reader(io.StringIO(''.join(streamed(client.post('/api/results/export', json={'format': 'csv'}))))))
+        assert len(rows) == 101
+        assert len(json.loads(client.post('/api/results/export', json={'format': 'json'}).get_data(as_text=True))) == 100
+        print("OK   MAX_EXPORT_ROWS caps streamed exports")
+
+def test_excel_export():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        history = seed()
+        client = app.test_client()
+
+        response = client.post('/api/results/export', json={'format': 'xlsx'})
+        assert response.status_code == 200
+        rows = read_xlsx(response.get_data())
+        headers = [rows[0][column] for column in sorted(rows[0], key=lambda c: (len(c), c))]
+        # late_score is past the sample but numeric, so metric_names() gives it a column;
+        # late_tag is text and only found while writing, so it goes to Other_Metrics
+        assert headers == ['Timestamp', 'Symbol', 'Exchange', 'Signal', 'Scanner', 'Price', 'Volume', 'RSI',
+                           'MACD', 'Signal_Strength', 'note', 'levels', 'late_score', 'Other_Metrics']
+        column = {header: chr(ord('A') + i) for i, header in enumerate(headers)}
+        assert len(rows) == ROWS + 1
+
+        first, last = rows[1], rows[-1]
+        assert first[column['Symbol']] == f'SYM{ROWS - 1}' and first[column['Scanner']] == 'export test'
+        assert column['late_score'] not in first and column['Other_Metrics'] not in first
+        assert first[column['note']] == 'a, "quoted" value'
+        assert last[column['Symbol']] == 'SYM0' and last[column['Signal']] == 'SELL'
+        assert last[column['Price']] == 100.0 and last[column['levels']] == '[0, 1]'
+        assert rows[-3][column['late_score']] == 4.0
+        assert json.loads(last[column['Other_Metrics']]) == {'late_tag': 'tag0'}
+        # Timestamps are date cells: days since 1899-12-30
+        assert abs(last[column['Timestamp']] - (45293 + (9 * 3600 + 15 * 60 + 30) / 86400)) < 1e-6
+
+        rows = read_xlsx(client.post('/results/api/results/export',
+                                     json={'format': 'xlsx', 'scan_id': history.id}).get_data())
+        assert len(rows) == ROWS + 1 and rows[1][column['Symbol']] == 'SYM0'
+        print(f"OK   xlsx export of {ROWS} rows, late metrics in their own column or Other_Metrics")
+
+def read_arrow(client, format):
+    data = client.post('/api/results/export', json={'format': format}).get_data()
+    if format == 'parquet':
+        return pq.read_table(pa.BufferReader(data))
+    return pa.ipc.open_file(pa.BufferReader(data)).read_all()
+
+def test_arrow_exports():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        client = app.test_client()
+        stored = ScanResult.query.order_by(ScanResult.timestamp.desc(), ScanResult.id.desc()).all()
+
+        for format in ('parquet', 'arrow'):
+            table = read_arrow(client, format)
+            assert table.num_rows == ROWS
+            assert table.column('id').to_pylist() == [r.id for r in stored]
+            assert table.column('symbol').to_pylist() == [r.symbol for r in stored]
+            assert set(table.column('scanner').to_pylist()) == {'export test'}
+            assert table.schema.field('metric_price').type == pa.float64()
+            assert table.schema.field('metric_late_score').type == pa.float64()
+            assert table.schema.field('metric_note').type == pa.string()
+            assert table.column('metric_price').to_pylist() == [r.get_metrics()['price'] for r in stored]
+            assert table.column('metric_late_score').to_pylist() == \
+                [r.get_metrics().get('late_score') for r in stored]
+            assert json.loads(table.column('metric_levels')[0].as_py()) == stored[0].get_metrics()['levels']
+            assert table.column('metrics_other').null_count == ROWS
+            print(f"OK   {format} export of {ROWS} rows reads back with typed metric columns")
+
+def test_arrow_schema_fallback():
+    app = create_app()
+    batch_rows = ExportService.ARROW_BATCH_ROWS
+    ExportService.ARROW_BATCH_ROWS = 500
+    try:
+        with app.app_context():
+            db.create_all()
+            history = seed()
+            # Oldest, so exported last: rsi is text here but a number in the first batch
+            ScanResult.bulk_create(history.scanner_id, 'NSE', [{'symbol': 'ODD', 'signal': 'BUY',
+                                                                'metrics': {'rsi': 'n/a', 'price': 1}}],
+                                   scan_history_id=history.id, timestamp=datetime(2024, 1, 1))
+            db.session.commit()
+            client = app.test_client()
+
+            for format in ('parquet', 'arrow'):
+                table = read_arrow(client, format)
+                assert table.num_rows == ROWS + 1
+                # The first batch has none of the late metrics, so they have no column
+                assert 'metric_late_score' not in table.schema.names
+                rows = table.to_pylist()
+                assert rows[-1]['symbol'] == 'ODD' and rows[-1]['metric_rsi'] is None
+                assert json.loads(rows[-1]['metrics_other']) == {'rsi': 'n/a'}
+                assert json.loads(rows[-2]['metrics_other']) == {'late_score': 0, 'late_tag': 'tag0'}
+                assert rows[-2]['metric_rsi'] == 0.0
+                assert sum(row['metrics_other'] is not None for row in rows) == 101
+            print("OK   metrics missing from the first batch, or of another type, land in metrics_other")
+    finally:
+        ExportService.ARROW_BATCH_ROWS = batch_rows
+
+if __name__ == '__main__':
+    test_streamed_csv()
+    test_streamed_json()
+    test_export_row_limit()
+    test_excel_export()
+    test_arrow_exports()
+    test_arrow_schema_fallback()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Queryable metrics checks
+Numeric metrics are copied to scan_result_metrics on write and by the
+migration, and the results API filters and sorts on them in SQL
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from models import db, Scanner, ScanHistory, ScanResult, ScanResultMetric
+from models.migrations import upgrade_database
+from routes import api_routes
+
+def create_app(uri='sqlite://'):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['TESTING'] = True
+    db.init_app(app)
+    app.register_blueprint(api_routes.bp)
+    return app
+
+def seed():
+    scanner = Scanner(name='metrics test', code='pass')
+    db.session.add(scanner)
+    db.session.flush()
+    history = ScanHistory(scanner_id=scanner.id)
+    history.start()
+    db.session.add(history)
+    db.session.flush()
+    ScanResult.bulk_create(scanner.id, 'NSE', [
+        {'symbol': f'SYM{i}', 'signal': 'BUY', 'metrics': {
+            'rsi': float(i * 10), 'volume_ratio': i % 3, 'trend': 'up', 'breakout': True
+        }}
+        for i in range(10)
+    ], scan_history_id=history.id)
+    history.complete(symbols_scanned=10, signals_found=10)
+    db.session.commit()
+    return scanner, history
+
+def symbols(response):
+    return [result['symbol'] for result in response.get_json()['results']]
+
+def test_numeric_metrics_are_indexed():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        # Strings and flags stay only in the JSON
+        assert {m.name for m in ScanResultMetric.query} == {'rsi', 'volume_ratio'}
+        assert ScanResultMetric.query.count() == 20
+        assert ScanResult.metric_names() == ['rsi', 'volume_ratio']
+        assert ScanResult.query.first().get_metrics()['trend'] == 'up'
+        print("OK   numeric metrics copied to scan_result_metrics")
+
+def test_filter_and_sort_by_metric():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        client = app.test_client()
+
+        assert sorted(symbols(client.get('/api/results?metric=rsi:lt:30'))) == ['SYM0', 'SYM1', 'SYM2']
+        assert sorted(symbols(client.get('/api/results?metric=rsi:gte:50&metric=volume_ratio:eq:0'))) == \
+            ['SYM6', 'SYM9']
+        assert symbols(client.get('/api/results?sort_metric=rsi&order=asc&per_page=3')) == ['SYM0', 'SYM1', 'SYM2']
+        assert symbols(client.get('/api/results/top?metric=rsi&limit=2')) == ['SYM9', 'SYM8']
+        assert symbols(client.get('/api/results/top?metric=missing')) == []
+        # Out-of-range limits are clamped to 1..500
+        assert symbols(client.get('/api/results/top?metric=rsi&limit=-1')) == ['SYM9']
+        assert symbols(client.get('/api/results/top?metric=rsi&limit=0')) == ['SYM9']
+        assert len(symbols(client.get('/api/results/top?metric=rsi&limit=100000'))) == 10
+
+        assert client.get('/api/results?metric=rsi:between:3').status_code == 400
+        assert client.get('/api/results?metric=rsi').status_code == 400
+        assert client.get('/api/results/top').status_code == 400
+        print("OK   results filtered and sorted by metric in SQL")
+
+def test_migration_backfills_metrics():
+    path = os.path.join(tempfile.mkdtemp(prefix='fluxscan_test_'), 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE scanners (id INTEGER PRIMARY KEY, name TEXT, code TEXT, description TEXT, parameters TEXT,
+                               category TEXT, is_active BOOLEAN, created_at DATETIME, updated_at DATETIME);
+        CREATE TABLE scan_history (id INTEGER PRIMARY KEY, scanner_id INTEGER, watchlist_id INTEGER, status TEXT,
+                                   symbols_scanned INT, signals_found INT, execution_time_ms INT,
+                                   error_message TEXT, started_at DATETIME, completed_at DATETIME,
+                                   created_at DATETIME, updated_at DATETIME);
+        CREATE TABLE scan_results (id INTEGER PRIMARY KEY, scanner_id INTEGER NOT NULL, symbol TEXT, exchange TEXT,
+                                   signal TEXT, metrics TEXT, timestamp DATETIME,
+                                   created_at DATETIME, updated_at DATETIME);
+        INSERT INTO scanners (id, name, code) VALUES (1, 'legacy', 'pass');
+        INSERT INTO scan_history (id, scanner_id, status, symbols_scanned, signals_found, started_at, completed_at)
+            VALUES (1, 1, 'completed', 3, 3, '2024-01-01 10:00:00.000000', '2024-01-01 10:01:00.000000');
+        INSERT INTO scan_results (scanner_id, symbol, exchange, signal, metrics, timestamp) VALUES
+            (1, 'A', 'NSE', 'BUY', '{"rsi": 25, "ok": true, "note": "x"}', '2024-01-01 10:00:05.000000'),
+            (1, 'B', 'NSE', 'SELL', '{"rsi": 75.5, "atr": NaN}', '2024-01-01 10:00:06.000000'),
+            (1, 'C', 'NSE', 'BUY', 'not json', '2024-01-01 10:00:07.000000');
+    """)
+    conn.commit()
+    conn.close()
+
+    app = create_app(f'sqlite:///{path}')
+    with app.app_context():
+        upgrade_database()
+        # Running it again must not copy anything twice
+        upgrade_database()
+
+        metrics = [(m.name, m.value) for m in ScanResultMetric.query.order_by(ScanResultMetric.result_id)]
+        assert metrics == [('rsi', 25.0), ('rsi', 75.5)]
+        assert [r.scan_history_id for r in ScanResult.query] == [1, 1, 1]
+        top = ScanResult.get_top_by_metric('rsi', limit=1)
+        assert [r.symbol for r in top] == ['B']
+        print(f"OK   migration copied {len(metrics)} numeric metrics out of legacy JSON")
+
+if __name__ == '__main__':
+    test_numeric_metrics_are_indexed()
+    test_filter_and_sort_by_metric()
+    test_migration_backfills_metrics()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Cursor pagination checks for /api/results
+Walking next_cursor must visit every row exactly once, in order, even when
+many rows share a sort value; prev_cursor must walk back to the same pages
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from models import db, Scanner, ScanHistory, ScanResult
+from routes import api_routes
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['TESTING'] = True
+    db.init_app(app)
+    app.register_blueprint(api_routes.bp)
+    return app
+
+def seed():
+    """Three runs of 20 results; each run shares one timestamp and rsi repeats every 4 rows"""
+    scanner = Scanner(name='pagination test', code='pass')
+    db.session.add(scanner)
+    db.session.flush()
+
+    started = datetime(2024, 1, 1, 9, 15)
+    for run in range(3):
+        history = ScanHistory(scanner_id=scanner.id)
+        history.start()
+        db.session.add(history)
+        db.session.flush()
+        ScanResult.bulk_create(scanner.id, 'NSE', [
+            {'symbol': f'R{run}S{i}', 'signal': 'BUY' if i % 2 else 'SELL', 'metrics': {'rsi': float(i % 4)}}
+            for i in range(20)
+        ], scan_history_id=history.id, timestamp=started + timedelta(minutes=run))
+        history.complete(symbols_scanned=20, signals_found=20)
+    db.session.commit()
+
+def walk(client, url):
+    """Pages from following next_cursor, then the same pages again following prev_cursor back"""
+    pages = []
+    response = client.get(url).get_json()
+    pages.append(response)
+    while response['next_cursor']:
+        response = client.get(f"{url}&cursor={response['next_cursor']}").get_json()
+        pages.append(response)
+
+    back = [response]
+    while response['prev_cursor']:
+        response = client.get(f"{url}&cursor={response['prev_cursor']}").get_json()
+        back.append(response)
+    back.reverse()
+    return pages, back
+
+def ids(page):
+    return [result['id'] for result in page['results']]
+
+def test_cursor_pages_by_timestamp():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        client = app.test_client()
+
+        expected = [r.id for r in ScanResult.query.order_by(ScanResult.timestamp.desc(), ScanResult.id.desc())]
+        pages, back = walk(client, '/api/results?paginate=cursor&per_page=7')
+        assert [i for page in pages for i in ids(page)] == expected
+        assert [len(ids(page)) for page in pages] == [7] * 8 + [4]
+        assert pages[0]['prev_cursor'] is None and pages[-1]['next_cursor'] is None
+        # Walking back from the last page visits the same pages
+        assert [ids(page) for page in back] == [ids(page) for page in pages]
+        print(f"OK   {len(expected)} results over {len(pages)} timestamp-ordered cursor pages")
+
+def test_cursor_pages_by_metric_with_ties():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        client = app.test_client()
+
+        for order, descending in (('desc', True), ('asc', False)):
+            results = sorted(ScanResult.query.all(), key=lambda r: (
+                -r.get_metrics()['rsi'] if descending else r.get_metrics()['rsi'], r.id
+            ))
+            pages, back = walk(client, f'/api/results?paginate=cursor&per_page=6&sort_metric=rsi&order={order}')
+            walked = [i for page in pages for i in ids(page)]
+            assert walked == [r.id for r in results], f'{order} walk skipped or repeated tied rows'
+            assert [i for page in back for i in ids(page)] == walked
+            print(f"OK   rsi {order}: {len(walked)} results, 15 per tied value, none skipped or repeated")
+
+        # Odd i with i % 4 >= 2: five per run
+        filtered, _ = walk(client, '/api/results?paginate=cursor&per_page=4&signal=BUY&metric=rsi:gte:2')
+        assert sum(len(ids(page)) for page in filtered) == 15
+        print("OK   filters apply to every cursor page")
+
+def test_default_and_invalid_requests():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        client = app.test_client()
+
+        # Without paginate=cursor the response keeps its numbered-page shape
+        page = client.get('/api/results?per_page=25&page=3').get_json()
+        assert page['total'] == 60 and page['total_pages'] == 3 and len(page['results']) == 10
+        assert 'next_cursor' not in client.get('/api/results').get_json()
+
+        response = client.get('/api/results?cursor=not-a-cursor')
+        assert response.status_code == 400
+        estimate = client.get('/api/results?paginate=cursor&total=approx').get_json()
+        assert estimate['total'] == 60
+        print("OK   numbered pages by default, bad cursors rejected")
+
+if __name__ == '__main__':
+    test_cursor_pages_by_timestamp()
+    test_cursor_pages_by_metric_with_ties()
+    test_default_and_invalid_requests()
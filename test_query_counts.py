@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Query-count checks for list endpoints
+Each endpoint must run the same number of queries whatever the page size
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from models import db, Scanner, Watchlist, ScanHistory, ScanResult, ScanSchedule
+from routes import api_routes, scanner_routes, schedule_routes, watchlist_routes
+from utils.query_counter import QueryCounter, assert_max_queries
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['TESTING'] = True
+    db.init_app(app)
+    for module in (api_routes, scanner_routes, schedule_routes, watchlist_routes):
+        app.register_blueprint(module.bp)
+    return app
+
+def seed(num_scanners=20, results_per_scanner=30, start=0):
+    for i in range(start, start + num_scanners):
+        scanner = Scanner(name=f'Scanner {i}', code='pass', is_active=True)
+        watchlist = Watchlist(name=f'Watchlist {i}', exchange='NSE')
+        watchlist.set_symbols([f'SYM{j}' for j in range(5)])
+        db.session.add_all([scanner, watchlist])
+        db.session.flush()
+
+        db.session.add(ScanSchedule(scanner_id=scanner.id, watchlist_id=watchlist.id,
+                                    schedule_type='interval', interval_minutes=5))
+        history = ScanHistory(scanner_id=scanner.id, watchlist_id=watchlist.id)
+        history.start()
+        db.session.add(history)
+        db.session.flush()
+
+        ScanResult.bulk_create(scanner.id, 'NSE', [
+            {'symbol': f'SYM{j}', 'signal': 'BUY', 'metrics': {'rsi': j}}
+            for j in range(results_per_scanner)
+        ], scan_history_id=history.id)
+        history.complete(symbols_scanned=results_per_scanner, signals_found=results_per_scanner)
+    db.session.commit()
+
+def count_queries(client, url):
+    with QueryCounter(db.engine) as counter:
+        response = client.get(url)
+    assert response.status_code == 200, f'{url} returned {response.status_code}'
+    return counter.count
+
+def check_no_more_queries(client, url, limit):
+    """Request url, failing with the statements that ran if it takes more than limit queries"""
+    with assert_max_queries(db.engine, limit) as counter:
+        response = client.get(url)
+    assert response.status_code == 200, f'{url} returned {response.status_code}'
+    return counter.count
+
+def check_constant(client, small_url, large_url):
+    small = count_queries(client, small_url)
+    large = check_no_more_queries(client, large_url, small)
+    print(f'OK   {large_url}: {small} queries small, {large} queries large')
+
+def test_list_endpoints_use_constant_queries():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        client = app.test_client()
+
+        check_constant(client, '/api/results?per_page=5', '/api/results?per_page=500')
+        check_constant(client, '/api/results/top?metric=rsi&limit=5', '/api/results/top?metric=rsi&limit=500')
+
+        # Same endpoints with more rows behind them
+        scanners = count_queries(client, '/scanners/api/scanners')
+        schedules = count_queries(client, '/schedules/api/schedules')
+        watchlists = count_queries(client, '/watchlists/api/watchlists')
+        seed(num_scanners=20, start=20)
+        db.session.expunge_all()
+
+        for url, before in (('/scanners/api/scanners', scanners),
+                            ('/schedules/api/schedules', schedules),
+                            ('/watchlists/api/watchlists', watchlists)):
+            after = check_no_more_queries(client, url, before)
+            print(f'OK   {url}: {before} queries for 20 rows, {after} for 40')
+
+if __name__ == '__main__':
+    test_list_endpoints_use_constant_queries()
+    print('All list endpoints run a constant number of queries')
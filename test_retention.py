@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Retention checks
+Expired results are archived to Parquet, deleted in id-range batches with
+their metric rows, and taken off the daily rollup, which must keep matching
+the live table. Runs left without results follow them
+"""
+
+import sys
+import os
+import json
+import tempfile
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+from flask import Flask
+from sqlalchemy import func
+from config import Config
+from models import db, Scanner, ScanHistory, ScanResult, ScanResultMetric, ScanStatsDaily
+from models.storage import configure_storage, engine_options
+from services.retention_service import RetentionService
+from routes import api_routes, scanner_routes
+
+def create_app():
+    # A file, so the writer connection and the session see the same database
+    path = os.path.join(tempfile.mkdtemp(prefix='fluxscan_test_'), 'test.db')
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    configure_storage(app)
+    return app
+
+def seed(days_ago=(60, 45, 1), per_run=30, name='retention test'):
+    scanner = Scanner(name=name, code='pass')
+    db.session.add(scanner)
+    db.session.flush()
+
+    runs = []
+    for days in days_ago:
+        history = ScanHistory(scanner_id=scanner.id)
+        history.start()
+        db.session.add(history)
+        db.session.flush()
+        ScanResult.bulk_create(scanner.id, 'NSE', [
+            {'symbol': f'D{days}S{i}', 'signal': 'BUY', 'metrics': {'rsi': float(i), 'note': 'x' * 50}}
+            for i in range(per_run)
+        ], scan_history_id=history.id, timestamp=datetime.utcnow() - timedelta(days=days))
+        history.complete(symbols_scanned=per_run, signals_found=per_run)
+        runs.append(history)
+    db.session.commit()
+    return scanner, runs
+
+def add_run(scanner, days, status='completed', exported=False, results=10):
+    """A run that finished days ago, counted on the rollup as complete() would have"""
+    finished = datetime.utcnow() - timedelta(days=days)
+    history = ScanHistory(scanner_id=scanner.id, status=status, started_at=finished - timedelta(minutes=1),
+                          completed_at=finished, symbols_scanned=results, signals_found=results,
+                          execution_time_ms=60000, exported_at=finished if exported else None)
+    db.session.add(history)
+    db.session.flush()
+    ScanStatsDaily.record_scan(history)
+    ScanResult.bulk_create(scanner.id, 'NSE', [
+        {'symbol': f'R{history.id}S{i}', 'signal': 'BUY', 'metrics': {'rsi': float(i)}} for i in range(results)
+    ], scan_history_id=history.id, timestamp=finished)
+    return history
+
+class StalledAnalytics:
+    """An analytics service whose export never gets anywhere"""
+
+    def export(self):
+        return {'state': 'failed'}
+
+def rollup_matches_table():
+    """Per-day result counts in scan_stats_daily equal a count over scan_results"""
+    day = func.date(ScanResult.timestamp)
+    live = {str(d): n for d, n in db.session.query(day, func.count()).group_by(day)}
+    rolled = {str(row.day): row.results for row in ScanStatsDaily.query if row.results}
+    return live == rolled
+
+def test_purge_archives_and_updates_rollup():
+    app = create_app()
+    archive_dir = tempfile.mkdtemp(prefix='fluxscan_archive_')
+    with app.app_context():
+        db.create_all()
+        _, runs = seed()
+        old_ids = [r.id for r in ScanResult.query.filter(ScanResult.scan_history_id != runs[-1].id)]
+        old_metrics = {r.id: r.get_metrics() for r in ScanResult.query.filter(ScanResult.id.in_(old_ids))}
+        assert rollup_matches_table()
+
+        service = RetentionService(app=app, retention_days=30, archive_dir=archive_dir, batch_size=25)
+        status = service.run()
+        db.session.expire_all()
+
+        assert status['state'] == 'completed', status['error']
+        assert status['rows_deleted'] == 60 and status['metric_rows_deleted'] == 60
+        assert status['batches'] == 3 and status['archive_files'] >= 3
+        assert ScanResult.query.count() == 30 and ScanResultMetric.query.count() == 30
+        assert {r.scan_history_id for r in ScanResult.query} == {runs[-1].id}
+
+        assert rollup_matches_table()
+        assert ScanStatsDaily.totals()['results'] == 30
+        # Run counts are history, not results, and stay as they were
+        assert ScanStatsDaily.totals()['scans_completed'] == 3
+
+        # Purged runs lose their stored summary; the kept run still has one
+        assert [db.session.get(ScanHistory, run.id).summary is None for run in runs] == [True, True, False]
+
+        archived = pd.read_parquet(os.path.join(archive_dir, 'scan_results'))
+        assert sorted(archived['id']) == sorted(old_ids)
+        for row in archived.itertuples():
+            assert json.loads(row.metrics) == old_metrics[row.id]
+        print(f"OK   {status['rows_deleted']} results archived and purged in {status['batches']} batches, "
+              f"rollup matches the table")
+
+        again = service.run()
+        assert again['rows_deleted'] == 0 and again['batches'] == 0
+        print("OK   a second run finds nothing to purge")
+
+def test_purge_without_archive():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed(days_ago=(90, 10))
+        status = RetentionService(app=app, retention_days=7, archive_dir=None, batch_size=1000).run()
+        db.session.expire_all()
+        assert status['rows_deleted'] == 60 and status['archive_files'] == 0
+        assert ScanResult.query.count() == 0 and ScanStatsDaily.totals()['results'] == 0
+        assert rollup_matches_table()
+        print("OK   purge without an archive directory")
+
+def test_purge_runs_and_export_hold():
+    app = create_app()
+    archive_dir = tempfile.mkdtemp(prefix='fluxscan_archive_')
+    with app.app_context():
+        db.create_all()
+        scanner = Scanner(name='runs', code='pass')
+        db.session.add(scanner)
+        db.session.flush()
+        runs = {
+            'exported': add_run(scanner, 60, exported=True),
+            # Completed but not exported yet: held back for the grace period...
+            'awaiting export': add_run(scanner, 33),
+            # ...and purged once past it
+            'export overdue': add_run(scanner, 60),
+            # Failed runs are never exported, so nothing waits for them
+            'failed': add_run(scanner, 50, status='failed'),
+            'recent': add_run(scanner, 1)
+        }
+        db.session.commit()
+        ids = {name: run.id for name, run in runs.items()}
+
+        service = RetentionService(app=app, retention_days=30, archive_dir=archive_dir, batch_size=2,
+                                   analytics_service=StalledAnalytics(), export_grace_days=7)
+        status = service.run()
+        db.session.expire_all()
+
+        assert status['state'] == 'completed', status['error']
+        assert status['rows_deleted'] == 30 and status['runs_deleted'] == 3 and status['rows_held'] == 10
+        assert {r.id for r in ScanHistory.query} == {ids['awaiting export'], ids['recent']}
+        assert {r.scan_history_id for r in ScanResult.query} == {ids['awaiting export'], ids['recent']}
+
+        # Run counters come off the rollup with the runs
+        totals = ScanStatsDaily.totals()
+        assert (totals['scans_completed'], totals['scans_failed'], totals['results']) == (2, 0, 20)
+        assert rollup_matches_table()
+
+        archived = pd.read_parquet(os.path.join(archive_dir, 'scan_history'))
+        assert sorted(archived['id']) == sorted([ids['exported'], ids['export overdue'], ids['failed']])
+        assert set(archived['status']) == {'completed', 'failed'}
+        print(f"OK   {status['runs_deleted']} expired runs archived and purged, "
+              f"{status['rows_held']} results held for the analytics export")
+
+        # Without an analytics service nothing is held back
+        status = RetentionService(app=app, retention_days=30, archive_dir=None).run()
+        db.session.expire_all()
+        assert (status['rows_deleted'], status['runs_deleted'], status['rows_held']) == (10, 1, 0)
+        assert [r.id for r in ScanHistory.query] == [ids['recent']]
+        print("OK   held results and their run are purged once nothing waits for the export")
+
+def test_retention_days_validation():
+    app = create_app()
+    app.register_blueprint(api_routes.bp)
+    with app.app_context():
+        db.create_all()
+        app.retention_service = RetentionService(app=app, archive_dir=None)
+        client = app.test_client()
+
+        for value in (0, -5, 1.5, '30', True, None):
+            response = client.post('/api/retention', json={'retention_days': value})
+            if value is None:
+                assert response.status_code == 202
+            else:
+                assert response.status_code == 400, value
+                assert response.get_json()['error'] == 'retention_days must be a positive integer'
+        assert client.post('/api/retention', json={'retention_days': 30}).status_code in (202, 409)
+        print("OK   POST /api/retention rejects retention_days that aren't positive integers")
+
+def test_deletes_update_rollup():
+    app = create_app()
+    for module in (api_routes, scanner_routes):
+        app.register_blueprint(module.bp)
+    with app.app_context():
+        db.create_all()
+        kept, _ = seed(days_ago=(3, 1))
+        removed, runs = seed(days_ago=(2,), name='deleted scanner')
+        removed_run = runs[0].id
+        client = app.test_client()
+
+        result = ScanResult.query.filter_by(scanner_id=kept.id).first()
+        run_id = result.scan_history_id
+        assert client.delete(f'/api/results/{result.id}').status_code == 200
+        db.session.expire_all()
+        assert rollup_matches_table() and ScanStatsDaily.totals()['results'] == 89
+
+        # The cleared summary is rebuilt from the remaining rows on first read, and saved
+        run = db.session.get(ScanHistory, run_id)
+        assert run.summary is None
+        assert run.get_summary()['total_scanned'] == 29
+        db.session.expire_all()
+        assert json.loads(db.session.get(ScanHistory, run.id).summary)['total_scanned'] == 29
+
+        assert client.delete(f'/scanners/api/scanners/{removed.id}').status_code == 200
+        db.session.expire_all()
+        assert rollup_matches_table() and ScanStatsDaily.totals()['results'] == 59
+        totals = ScanStatsDaily.totals()
+        # The deleted scanner's run comes off the scan counters as well
+        assert totals['scans_completed'] == 2 and totals['symbols_scanned'] == 60
+        assert db.session.get(ScanHistory, removed_run) is None
+        print("OK   result and scanner deletes keep the rollup in step")
+
+if __name__ == '__main__':
+    test_purge_archives_and_updates_rollup()
+    test_purge_without_archive()
+    test_purge_runs_and_export_hold()
+    test_retention_days_validation()
+    test_deletes_update_rollup()
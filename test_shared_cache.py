@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Shared (L2) cache checks
+Two CacheService instances on one SharedCache file stand in for two worker
+processes: what one stores the other reads, expiry and budgets hold on disk,
+and database errors degrade to misses instead of failing the request
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from services.cache_service import CacheService
+from services.shared_cache import SharedCache
+
+def cache_path():
+    return os.path.join(tempfile.mkdtemp(prefix='fluxscan_test_'), 'cache.db')
+
+def frame(rows=500):
+    index = pd.date_range('2024-01-01 09:15', periods=rows, freq='min', tz='Asia/Kolkata')
+    return pd.DataFrame({'close': np.arange(rows, dtype=float), 'volume': np.arange(rows)}, index=index)
+
+def test_processes_share_entries():
+    path = cache_path()
+    first = CacheService(l2=SharedCache(path))
+    second = CacheService(l2=SharedCache(path))
+
+    data = frame()
+    first.set('hist_RELIANCE_NSE_D', data, ttl=60)
+    served = second.get('hist_RELIANCE_NSE_D')
+    pd.testing.assert_frame_equal(served, data)
+    assert second.l2.get_stats()['hits'] == 1
+
+    # Promoted into the second in-memory tier, so the next read skips the file
+    second.get('hist_RELIANCE_NSE_D')
+    assert second.l2.get_stats()['hits'] == 1
+
+    # Only the listed namespaces go to disk
+    first.set('quote_RELIANCE_NSE', {'ltp': 1.0})
+    assert second.get('quote_RELIANCE_NSE') is None
+
+    # A computed value is found by the other process instead of recomputed
+    first.get_or_compute('hist_TCS_NSE_D', lambda: frame(10), ttl=60)
+    assert second.get_or_compute('hist_TCS_NSE_D', lambda: None, ttl=60) is not None
+
+    second.delete('hist_RELIANCE_NSE_D')
+    assert first.l2.get('hist_RELIANCE_NSE_D') is None
+    print("OK   entries written by one process are read by another")
+
+def test_expiry_and_budget():
+    path = cache_path()
+    shared = SharedCache(path, max_bytes=64 * 1024)
+    shared.set('hist_expired', b'x', time.time() - 1)
+    shared.set('hist_forever', b'y', None)
+    assert shared.get('hist_expired') is None
+    assert shared.get('hist_forever') == (b'y', None)
+
+    # Expiry read back from disk carries over to the in-memory tier
+    expires_at = time.time() + 1
+    shared.set('hist_soon', b'z', expires_at)
+    cache = CacheService(l2=shared)
+    assert cache.get('hist_soon') == b'z'
+    time.sleep(1.1)
+    assert cache.get('hist_soon') is None
+
+    for i in range(20):
+        shared.set(f'hist_{i}', bytes(8 * 1024), time.time() + 60 + i)
+    shared.cleanup()
+    stats = shared.get_stats()
+    assert stats['size_bytes'] <= 64 * 1024
+    # Soonest to expire go first; entries without expiry last
+    assert shared.get('hist_0') is None and shared.get('hist_19') is not None
+    assert shared.get('hist_forever') is not None
+    print(f"OK   expired rows ignored, pruned to {stats['size_bytes']} of {stats['budget_bytes']} bytes")
+
+def test_errors_are_misses():
+    shared = SharedCache(cache_path())
+    shared.set('hist_a', 1, None)
+    conn = shared._connection()
+    conn.execute("UPDATE cache_entries SET value = ? WHERE key = 'hist_a'", (b'not a pickle',))
+    conn.commit()
+    assert shared.get('hist_a') is None
+
+    # A closed connection makes every statement fail
+    conn.close()
+    assert shared.get('hist_a') is None
+    shared.set('hist_b', 2, None)
+    shared.delete('hist_b')
+    shared.clear()
+    assert shared.get_stats()['errors'] == 5
+
+    cache = CacheService(l2=shared)
+    cache.set('hist_c', 3)
+    cache.delete('hist_c')
+    cache.clear()
+    print(f"OK   {shared.get_stats()['errors']} storage errors logged and treated as misses")
+
+if __name__ == '__main__':
+    test_processes_share_entries()
+    test_expiry_and_budget()
+    test_errors_are_misses()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Storage profile checks
+The PostgreSQL checks run against TEST_DATABASE_URL=postgresql://... if set,
+otherwise against a throwaway local server when pgserver and psycopg2 are
+installed (pip install pgserver psycopg2-binary)
+"""
+
+import sys
+import os
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from sqlalchemy import event
+from config import Config
+from models import db, Scanner, ScanHistory, ScanResult, ScanResultMetric, ScanStatsDaily
+from models.storage import configure_storage, engine_options, writer_engine, writer_session
+
+def create_app(uri):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    configure_storage(app)
+    return app
+
+def check_writes(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        scanner = Scanner(name='storage test', code='pass')
+        db.session.add(scanner)
+        db.session.flush()
+        history = ScanHistory(scanner_id=scanner.id)
+        history.start()
+        db.session.add(history)
+        db.session.commit()
+
+        results = [
+            {'symbol': f'SYM{i}', 'signal': 'BUY', 'metrics': {'rsi': float(i), 'note': 'a, "quoted" value'}}
+            for i in range(250)
+        ]
+        # Characters COPY's text format has to escape
+        results[3] = {'symbol': 'A\tB\\C', 'signal': None, 'metrics': {'note': 'line\nbreak\r\\N'}}
+
+        statements = []
+        for engine in {db.engine, writer_engine()}:
+            event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+        # Nothing of a run is visible or counted until it commits with its history
+        try:
+            with writer_session():
+                ScanResult.bulk_create(scanner.id, 'NSE', results, scan_history_id=history.id)
+                raise RuntimeError('scan failed')
+        except RuntimeError:
+            pass
+        assert ScanResult.query.count() == 0 and ScanStatsDaily.totals()['results'] == 0
+        db.session.refresh(history)
+        assert history.status == 'running' and history.summary is None
+
+        with writer_session():
+            record = db.session.get(ScanHistory, history.id)
+            assert ScanResult.bulk_create(scanner.id, 'NSE', results, scan_history_id=history.id) == 250
+            record.complete(symbols_scanned=250, signals_found=250)
+
+        stored = ScanResult.get_by_history(history.id)
+        assert [r.symbol for r in stored] == [res['symbol'] for res in results]
+        assert stored[7].get_metrics() == results[7]['metrics']
+        assert stored[3].signal is None and stored[3].get_metrics() == results[3]['metrics']
+        assert ScanResultMetric.query.count() == 249
+        assert ScanStatsDaily.totals()['results'] == 250 and ScanStatsDaily.totals()['scans_completed'] == 1
+        db.session.refresh(history)
+        summary = history.get_summary()
+        assert history.status == 'completed'
+        assert summary['buy_signals'] == 249 and len(summary['top_buy_signals']) == 5
+        assert ScanResult.get_derived_rows(history.id)[7]['strength'] == 1
+        top = ScanResult.get_top_by_metric('rsi', limit=3)
+        assert [r.symbol for r in top] == ['SYM249', 'SYM248', 'SYM247']
+
+        # A run written in batches gets the summary of all of them
+        batched = ScanHistory(scanner_id=scanner.id)
+        batched.start()
+        db.session.add(batched)
+        db.session.commit()
+        rows = [
+            {'symbol': f'B{i}', 'signal': ('BUY', 'SELL', 'WATCH')[i % 3], 'metrics': {
+                'price': 100.0, 'target': 100.0 + i, 'stop_loss': 95.0, 'risk_reward': i % 4, 'volume': 10 * i,
+                'note': 'kept out of derived'
+            }}
+            for i in range(40)
+        ]
+        for start in range(0, 40, 15):
+            with writer_session():
+                ScanResult.bulk_create(scanner.id, 'NSE', rows[start:start + 15], scan_history_id=batched.id)
+        db.session.refresh(batched)
+        merged = batched.get_summary()
+        whole = ScanHistory.summarize(ScanResult.get_derived_rows(batched.id))
+        assert merged['total_scanned'] == 40 and merged['buy_signals'] == 14 and merged['sell_signals'] == 13
+        for key, value in whole.items():
+            if key.startswith('top_'):
+                assert [r['symbol'] for r in merged[key]] == [r['symbol'] for r in value]
+            elif isinstance(value, float):
+                assert abs(merged[key] - value) < 1e-9
+            else:
+                assert merged[key] == value
+        # Other signals store their display fields, not a copy of the metrics
+        watch = ScanResult.get_derived_rows(batched.id)[2]
+        assert {k: v for k, v in watch.items() if k != 'timestamp'} == {
+            'volume': 20, 'target': 102.0, 'stop_loss': 95.0, 'risk_reward': 2, 'close_price': 100.0,
+            'potential_gain': 0, 'risk': 0, 'strength': 0, 'symbol': 'B2', 'signal': 'WATCH'
+        }
+
+        inserts = [sql for sql in statements if sql.lstrip().upper().startswith('INSERT INTO SCAN_RESULT')]
+        copies = [sql for sql in statements if 'nextval' in sql]
+        if db.engine.dialect.name == 'postgresql':
+            assert not inserts and copies
+        else:
+            assert inserts and not copies
+        print(f"OK   result writes on {db.engine.dialect.name}")
+
+def check_concurrent_writes(app, writers=6, scans=5):
+    """Scan threads committing runs at once all succeed, with every result counted"""
+    with app.app_context():
+        scanner = Scanner(name='concurrent writes', code='pass')
+        db.session.add(scanner)
+        db.session.flush()
+        history_ids = []
+        for _ in range(writers * scans):
+            history = ScanHistory(scanner_id=scanner.id)
+            history.start()
+            db.session.add(history)
+            db.session.flush()
+            history_ids.append(history.id)
+        db.session.commit()
+        scanner_id = scanner.id
+        before = ScanStatsDaily.totals()['results']
+
+    errors = []
+
+    def write(idx):
+        with app.app_context():
+            for history_id in history_ids[idx::writers]:
+                try:
+                    with writer_session():
+                        ScanResult.bulk_create(scanner_id, 'NSE', [
+                            {'symbol': f'W{idx}S{i}', 'signal': 'SELL', 'metrics': {'rsi': float(i)}} for i in range(40)
+                        ], scan_history_id=history_id)
+                        db.session.get(ScanHistory, history_id).complete(symbols_scanned=40, signals_found=40)
+                except Exception as e:
+                    errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with app.app_context():
+        assert not errors, errors
+        assert ScanResult.query.filter_by(scanner_id=scanner_id).count() == writers * scans * 40
+        assert ScanStatsDaily.totals()['results'] - before == writers * scans * 40
+        assert ScanHistory.query.filter_by(scanner_id=scanner_id, status='completed').count() == writers * scans
+        print(f"OK   {writers} concurrent writers on {db.engine.dialect.name}")
+
+def test_sqlite_profile():
+    path = os.path.join(tempfile.mkdtemp(prefix='fluxscan_test_'), 'test.db')
+    app = create_app(f'sqlite:///{path}')
+    with app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+            assert conn.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+            assert conn.exec_driver_sql('PRAGMA mmap_size').scalar() == Config.SQLITE_MMAP_SIZE_MB * 1024 * 1024
+        writer = writer_engine()
+        assert writer is not db.engine and writer.pool.size() == 1
+        with writer_session() as session:
+            assert session.connection().engine is writer and db.session() is session
+        assert db.session().get_bind() is db.engine
+        print("OK   sqlite WAL profile and single-connection writer")
+    check_writes(app)
+    check_concurrent_writes(app)
+
+def test_postgresql_writes():
+    uri = os.environ.get('TEST_DATABASE_URL', '')
+    server = None
+    if not uri.startswith('postgresql'):
+        try:
+            import pgserver
+            import psycopg2  # noqa: F401
+        except ImportError:
+            print("SKIP postgresql writes (set TEST_DATABASE_URL, or install pgserver and psycopg2-binary)")
+            return
+        server = pgserver.get_server(tempfile.mkdtemp(prefix='fluxscan_pg_'), cleanup_mode='stop')
+        uri = server.get_uri()
+
+    app = create_app(uri)
+    try:
+        check_writes(app)
+        check_concurrent_writes(app)
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if server is not None:
+            server.cleanup()
+
+if __name__ == '__main__':
+    test_sqlite_profile()
+    test_postgresql_writes()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Instrument master checks against a stub instrument list
+Prefix search bisects the sorted symbols, fuzzy search ranks by shared
+trigrams, and downloads run in the background so lookups never wait on one
+"""
+
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.data_service import DataService
+from services.symbol_master import ExchangeIndex, SymbolMaster
+
+INSTRUMENTS = [
+    {'symbol': symbol, 'name': f'{symbol} LTD', 'exchange': 'NSE', 'instrumenttype': 'EQ', 'lotsize': 1, 'token': i}
+    for i, symbol in enumerate([
+        'RELIANCE', 'RELAXO', 'REC', 'RECLTD', 'TCS', 'TATAMOTORS', 'TATASTEEL', 'TATAPOWER',
+        'INFY', 'HDFCBANK', 'HDFCLIFE', 'ICICIBANK', 'SBIN', 'sbicard', ''
+    ])
+]
+
+class GatedLoader:
+    """Returns the stub list once released, counting calls per exchange"""
+
+    def __init__(self, instruments=INSTRUMENTS):
+        self.instruments = instruments
+        self.calls = []
+        self.released = threading.Event()
+
+    def __call__(self, exchange):
+        self.calls.append(exchange)
+        self.released.wait(5)
+        return self.instruments if exchange == 'NSE' else None
+
+def symbols(records):
+    return [record['symbol'] for record in records]
+
+def test_prefix_and_fuzzy_search():
+    index = ExchangeIndex(INSTRUMENTS)
+    assert len(index) == 14 and 'sbicard' in index and 'SBICARD' in index and 'NOPE' not in index
+
+    assert [index.symbols[pos] for pos in index.prefix('tata', 2)] == ['TATAMOTORS', 'TATAPOWER']
+    assert [index.symbols[pos] for pos in index.prefix('REC', 10)] == ['REC', 'RECLTD']
+    assert index.prefix('X', 10) == []
+    assert index.record(index.prefix('TCS', 1)[0]) == {
+        'symbol': 'TCS', 'name': 'TCS LTD', 'exchange': 'NSE', 'instrumenttype': 'EQ',
+        'expiry': None, 'strike': None, 'lotsize': 1, 'tick_size': None, 'token': 4
+    }
+
+    # A misspelling shares most trigrams with the right symbol
+    assert [index.symbols[pos] for pos in index.fuzzy('relaince', 2)] == ['RELIANCE', 'RELAXO']
+    assert index.symbols[index.fuzzy('ICICI BANK', 1)[0]] == 'ICICIBANK'
+    assert index.fuzzy('ZZZZ', 5) == []
+
+    master = SymbolMaster(lambda exchange: INSTRUMENTS)
+    master.get_index('NSE', wait=True)
+    # Prefix matches first, then fuzzy ones without repeats, up to the limit
+    assert symbols(master.search('REC', 'NSE', limit=3)) == ['REC', 'RECLTD', 'RELAXO']
+    assert symbols(master.search('HDFCBNK', 'NSE')) == ['HDFCBANK', 'HDFCLIFE']
+    assert symbols(master.search('relaince', 'NSE', limit=1)) == ['RELIANCE']
+    assert master.contains('infy', 'NSE') and master.contains('NOPE', 'NSE') is False
+    print("OK   prefix and trigram search over the instrument master")
+
+def test_background_download():
+    loader = GatedLoader()
+    master = SymbolMaster(loader)
+    try:
+        # Lookups don't wait for the first download
+        assert master.search('TCS', 'NSE') is None and master.contains('TCS', 'NSE') is None
+        threads = [threading.Thread(target=master.get_index, args=('NSE',)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        loader.released.set()
+        assert len(master.get_index('NSE', wait=True)) == 14
+        assert loader.calls == ['NSE']
+
+        # A stale index keeps answering while its replacement downloads
+        loader.released.clear()
+        master.max_age = 0
+        stale = master.get_index('NSE')
+        assert stale is not None and master.contains('TCS', 'NSE')
+        loader.released.set()
+        for future in master.preload(['NSE']):
+            future.result()
+        master.max_age = 86400
+        assert master.get_index('NSE') is not stale and loader.calls == ['NSE', 'NSE']
+
+        # A failed download isn't retried for a while
+        assert master.get_index('BSE', wait=True) is None
+        assert master.get_index('BSE', wait=True) is None and loader.calls.count('BSE') == 1
+
+        def broken(exchange):
+            raise ConnectionError('master unavailable')
+        failing = SymbolMaster(broken)
+        assert failing.get_index('NSE', wait=True) is None and failing.search('TCS', 'NSE') is None
+        print("OK   instrument masters download once, in the background, and back off after failures")
+    finally:
+        loader.released.set()
+
+def test_search_falls_back_until_loaded():
+    class Client:
+        def __init__(self):
+            self.searches = []
+            self.loader = GatedLoader()
+
+        def instruments(self, exchange):
+            return self.loader(exchange)
+
+        def search(self, query, exchange):
+            self.searches.append(query)
+            return {'status': 'success', 'data': [{'symbol': 'TCS', 'exchange': exchange}]}
+
+    service = DataService(api_key='test-key', host='http://127.0.0.1:5000')
+    client = service.client = Client()
+    try:
+        assert service.search_symbols('TC') == [{'symbol': 'TCS', 'exchange': 'NSE'}]
+        assert client.searches == ['TC']
+
+        client.loader.released.set()
+        service.symbol_master.get_index('NSE', wait=True)
+        assert symbols(service.search_symbols('TC'))[0] == 'TCS'
+        assert client.searches == ['TC']
+        print("OK   symbol search uses the broker API until the master has loaded")
+    finally:
+        client.loader.released.set()
+        service._refresh_executor.shutdown()
+
+if __name__ == '__main__':
+    test_prefix_and_fuzzy_search()
+    test_background_download()
+    test_search_falls_back_until_loaded()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Watchlist symbol checks
+Symbols live one per row in watchlist_symbols: the migration moves legacy
+JSON lists there, duplicates are dropped, and membership is answered in SQL
+"""
+
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from models import db, Watchlist, WatchlistSymbol
+from models.migrations import upgrade_database
+
+def create_app(uri='sqlite://'):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['TESTING'] = True
+    db.init_app(app)
+    return app
+
+def test_new_watchlist_symbols():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        # No exchange given: the column default isn't applied until INSERT
+        watchlist = Watchlist(name='new')
+        watchlist.set_symbols(['reliance', 'TCS', ('infy', 'bse'), {'symbol': 'tcs'}, 'Reliance'])
+        assert watchlist.add_symbol('hdfcbank') and not watchlist.add_symbol('HDFCBANK', 'nse')
+        db.session.add(watchlist)
+        db.session.commit()
+
+        assert watchlist.exchange == 'NSE'
+        assert watchlist.get_symbols() == [
+            {'symbol': 'RELIANCE', 'exchange': 'NSE'}, {'symbol': 'TCS', 'exchange': 'NSE'},
+            {'symbol': 'INFY', 'exchange': 'BSE'}, {'symbol': 'HDFCBANK', 'exchange': 'NSE'}
+        ]
+        print("OK   new watchlist stores upper-cased symbols once each, on NSE by default")
+
+def test_membership():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        watchlist = Watchlist(name='members', exchange='NSE')
+        watchlist.set_symbols(['RELIANCE', 'TCS', ('INFY', 'BSE')])
+        other = Watchlist(name='other', exchange='MCX')
+        other.set_symbols(['GOLD'])
+        db.session.add_all([watchlist, other])
+        db.session.commit()
+
+        assert watchlist.has_symbol('reliance') and watchlist.has_symbol('INFY', 'BSE')
+        assert not watchlist.has_symbol('INFY') and not watchlist.has_symbol('GOLD', 'MCX')
+        assert watchlist.symbol_count() == 3 and Watchlist.total_symbol_count() == 4
+        assert [w.name for w in Watchlist.get_by_exchange('BSE')] == ['members']
+
+        assert watchlist.add_symbol('sbin') and not watchlist.add_symbol('TCS')
+        db.session.commit()
+        assert watchlist.get_symbol_list() == ['RELIANCE', 'TCS', 'INFY', 'SBIN']
+
+        assert not watchlist.remove_symbol('TCS', 'BSE')
+        assert watchlist.remove_symbol('tcs')
+        assert not watchlist.remove_symbol('TCS')
+        db.session.commit()
+        assert watchlist.get_symbol_list() == ['RELIANCE', 'INFY', 'SBIN']
+
+        # Replacing the list rewrites the rows
+        watchlist.set_symbols(['ITC', 'ITC', 'RELIANCE'])
+        db.session.commit()
+        assert watchlist.get_symbol_list() == ['ITC', 'RELIANCE']
+        assert [w['symbol_count'] for w in Watchlist.to_dict_many([watchlist, other])] == [2, 1]
+        print("OK   has/add/remove symbol and counts answered from watchlist_symbols")
+
+def test_migration_moves_json_symbols():
+    path = os.path.join(tempfile.mkdtemp(prefix='fluxscan_test_'), 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE watchlists (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, description TEXT,
+                                 symbols TEXT NOT NULL, exchange TEXT, created_at DATETIME, updated_at DATETIME);
+    """)
+    conn.executemany("INSERT INTO watchlists (id, name, symbols, exchange) VALUES (?, ?, ?, ?)", [
+        (1, 'strings', json.dumps(['reliance', 'TCS', 'RELIANCE']), 'NSE'),
+        (2, 'dicts', json.dumps([{'symbol': 'gold', 'exchange': 'mcx'}, {'symbol': 'SILVER'}]), 'MCX'),
+        (3, 'no exchange', json.dumps([['INFY', 'BSE'], ['SBIN']]), None),
+        (4, 'broken', 'not json', 'NSE')
+    ])
+    conn.commit()
+    conn.close()
+
+    app = create_app(f'sqlite:///{path}')
+    with app.app_context():
+        upgrade_database()
+        # Running it again must not copy anything twice
+        upgrade_database()
+
+        symbols = {w.name: w.get_symbols() for w in Watchlist.query}
+        assert symbols['strings'] == [{'symbol': 'RELIANCE', 'exchange': 'NSE'}, {'symbol': 'TCS', 'exchange': 'NSE'}]
+        assert symbols['dicts'] == [{'symbol': 'GOLD', 'exchange': 'MCX'}, {'symbol': 'SILVER', 'exchange': 'MCX'}]
+        assert symbols['no exchange'] == [{'symbol': 'INFY', 'exchange': 'BSE'}, {'symbol': 'SBIN', 'exchange': 'NSE'}]
+        assert symbols['broken'] == []
+        assert WatchlistSymbol.query.count() == 6
+        # Moved lists are blanked; the unreadable one is left for inspection
+        assert {w.name: w.symbols_json for w in Watchlist.query} == {
+            'strings': '[]', 'dicts': '[]', 'no exchange': '[]', 'broken': 'not json'
+        }
+        print("OK   migration moved 6 legacy JSON symbols into watchlist_symbols")
+
+if __name__ == '__main__':
+    test_new_watchlist_symbols()
+    test_membership()
+    test_migration_moves_json_symbols()
@@ -0,0 +1,42 @@
+"""
+Count the SQL statements an engine executes, to catch N+1 query patterns
+"""
+
+from contextlib import contextmanager
+from sqlalchemy import event
+
+class QueryCounter:
+    """Records every statement executed on an engine while active
+
+        with QueryCounter(db.engine) as counter:
+            client.get('/api/results')
+        print(counter.count)
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        return False
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    """Fail if the block runs more than limit statements, listing what ran"""
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = '\n'.join(f'  {i + 1}. {statement}' for i, statement in enumerate(counter.statements))
+        raise AssertionError(f'Expected at most {limit} queries, got {counter.count}:\n{listing}')